@@ -0,0 +1,538 @@
+import argparse
+import gc
+import io
+import json
+import pickle
+import platform
+import random
+import string
+import sys
+import threading
+import timeit
+from utils import HashFunction, numpy
+from hash_map import HashMap, RobinHoodHashMap, IncrementalHashMap
+from compact import CompactHashMap
+from concurrent_map import ConcurrentHashMap
+from swiss import SwissHashMap
+
+
+class HashFunctionBenchmark(object):
+    """
+    throughput (keys hashed per second) of every function in the HashFunction
+    family, next to the uniformity measure used in tests.py:
+        - average of HASH mod BOUND should approach BOUND / 2
+        - chi-squared of bucket counts should approach BOUND - 1
+    """
+    BOUND = 100
+    NUM_KEYS = 10000
+    REPEAT = 3
+
+    def __init__(self, key_length=8, seed=0):
+        generator = random.Random(seed)
+        self.keys = [
+            ''.join(generator.choice(string.printable) for x in range(key_length))
+            for test in range(self.NUM_KEYS)
+        ]
+
+    def throughput(self, hash_function):
+        """best-of-REPEAT keys per second"""
+        keys = self.keys
+        best = min(timeit.repeat(lambda: [hash_function(key) for key in keys],
+                                 number=1, repeat=self.REPEAT))
+        return len(keys) / best
+
+    def uniformity(self, hash_function):
+        """average bucket and chi-squared statistic over BOUND buckets"""
+        counts = [0] * self.BOUND
+        for key in self.keys:
+            counts[hash_function(key) % self.BOUND] += 1
+        expected = len(self.keys) / self.BOUND
+        average = sum(bucket * count for bucket, count in enumerate(counts)) \
+            / len(self.keys)
+        chi_squared = sum((count - expected) ** 2 / expected for count in counts)
+        return average, chi_squared
+
+    def __call__(self):
+        results = []
+        for name in HashFunction.FUNCTIONS:
+            hash_function = HashFunction.get(name)
+            average, chi_squared = self.uniformity(hash_function)
+            results.append((name, self.throughput(hash_function),
+                            average, chi_squared))
+        return results
+
+    def __repr__(self):
+        lines = ['{:<16}{:>14}{:>10}{:>10}'.format(
+            'hash', 'keys/sec', 'average', 'chi^2')]
+        for name, throughput, average, chi_squared in self():
+            lines.append('{:<16}{:>14,.0f}{:>10.2f}{:>10.1f}'.format(
+                name, throughput, average, chi_squared))
+        return '\n'.join(lines)
+
+
+class MemoryFootprintBenchmark(object):
+    """
+    bytes per entry held by each table layout (sys.getsizeof, which
+    excludes the keys & values themselves, as those are shared)
+    """
+    LAYOUTS = (HashMap, RobinHoodHashMap, CompactHashMap)
+    SIZES = (100, 10000, 100000)
+
+    def __call__(self):
+        results = []
+        for num_keys in self.SIZES:
+            keys = [str(x) for x in range(num_keys)]
+            for layout in self.LAYOUTS:
+                hash_map = layout()
+                for key in keys:
+                    hash_map[key] = key
+                results.append((layout.__name__, num_keys,
+                                sys.getsizeof(hash_map) / num_keys))
+        return results
+
+    def __repr__(self):
+        lines = ['{:<18}{:>10}{:>16}'.format('layout', 'entries', 'bytes/entry')]
+        for name, num_keys, per_entry in self():
+            lines.append('{:<18}{:>10,}{:>16.1f}'.format(name, num_keys, per_entry))
+        return '\n'.join(lines)
+
+
+class ResizeLatencyBenchmark(object):
+    """
+    per-insert latency while growing a map from empty:
+    a stop-the-world resize shows up as the worst single insert
+    """
+    LAYOUTS = (HashMap, IncrementalHashMap)
+    NUM_KEYS = 200000
+
+    def __call__(self):
+        keys = [str(x) for x in range(self.NUM_KEYS)]
+        results = []
+        for layout in self.LAYOUTS:
+            hash_map = layout()
+            timings = []
+            gc.disable()  # collector pauses would hide the resize pauses
+            for key in keys:
+                start = timeit.default_timer()
+                hash_map[key] = key
+                timings.append(timeit.default_timer() - start)
+            gc.enable()
+            timings.sort()
+            results.append((layout.__name__,
+                            timings[int(len(timings) * 0.99)], timings[-1]))
+        return results
+
+    def __repr__(self):
+        lines = ['{:<20}{:>14}{:>14}'.format('layout', 'p99 (us)', 'max (us)')]
+        for name, p99, worst in self():
+            lines.append('{:<20}{:>14.1f}{:>14.1f}'.format(
+                name, p99 * 1e6, worst * 1e6))
+        return '\n'.join(lines)
+
+
+class ConcurrencyBenchmark(object):
+    """
+    operations per second of THREADS threads on one ConcurrentHashMap,
+    by number of segments (80% reads, 20% writes, shared key space)
+        - on a GIL build threads never run python code in parallel, so
+          this mostly measures lock overhead & contention; segments only
+          scale throughput on a free-threaded interpreter
+    """
+    SEGMENTS = (1, 4, 16, 64)
+    THREADS = 4
+    OPERATIONS = 20000
+
+    def run(self, num_segments):
+        hash_map = ConcurrentHashMap.with_segments(num_segments)
+        hash_map.update((str(x), x) for x in range(10000))
+
+        def worker(seed):
+            generator = random.Random(seed)
+            for test in range(self.OPERATIONS):
+                key = str(generator.randrange(10000))
+                if generator.random() < 0.2:
+                    hash_map[key] = test
+                else:
+                    hash_map.get(key)
+
+        threads = [threading.Thread(target=worker, args=(seed,))
+                   for seed in range(self.THREADS)]
+        start = timeit.default_timer()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return self.THREADS * self.OPERATIONS / (timeit.default_timer() - start)
+
+    def __repr__(self):
+        lines = ['{:<12}{:>14}'.format('segments', 'ops/sec')]
+        for num_segments in self.SEGMENTS:
+            lines.append('{:<12}{:>14,.0f}'.format(
+                num_segments, self.run(num_segments)))
+        return '\n'.join(lines)
+
+
+class LoadFactorBenchmark(object):
+    """
+    lookups per second in a table of SIZE slots filled to each load factor
+    (growth disabled): single hits, single misses, and hits resolved in one
+    get_many batch (vectorized by SwissHashMap when NumPy is installed)
+    """
+    LAYOUTS = (HashMap, SwissHashMap)
+    LOADS = (0.5, 0.75, 0.9)
+    SIZE = 1 << 14
+
+    def run(self, layout, load):
+        hash_map = layout()
+        hash_map.MAX_LOAD_FACTOR = 0.95
+        hash_map.resize(hash_map.table_size(self.SIZE))
+        keys = [str(x) for x in range(int(load * hash_map.size))]
+        for key in keys:
+            hash_map[key] = key
+        missing = ['missing' + key for key in keys]
+
+        def per_second(function):
+            return len(keys) / min(timeit.repeat(function, number=1, repeat=3))
+        return (per_second(lambda: [hash_map.get(key) for key in keys]),
+                per_second(lambda: [hash_map.get(key) for key in missing]),
+                per_second(lambda: hash_map.get_many(keys)))
+
+    def __repr__(self):
+        lines = ['{:<14}{:>6}{:>14}{:>14}{:>14}'.format(
+            'layout', 'load', 'hits/sec', 'misses/sec', 'batch/sec')]
+        for layout in self.LAYOUTS:
+            for load in self.LOADS:
+                lines.append('{:<14}{:>6.2f}{:>14,.0f}{:>14,.0f}{:>14,.0f}'.format(
+                    layout.__name__, load, *self.run(layout, load)))
+        return '\n'.join(lines)
+
+
+class SnapshotBenchmark(object):
+    """
+    seconds to warm up a map of NUM_KEYS entries: reinserting every pair,
+    unpickling it, or loading a binary snapshot
+    """
+    NUM_KEYS = 100000
+
+    def __call__(self):
+        pairs = [(str(x), x) for x in range(self.NUM_KEYS)]
+        hash_map = HashMap.from_items(pairs)
+        pickled = pickle.dumps(hash_map, pickle.HIGHEST_PROTOCOL)
+        snapshot = io.BytesIO()
+        hash_map.dump(snapshot)
+        snapshot = snapshot.getvalue()
+        return [
+            ('reinsert', timeit.timeit(lambda: HashMap.from_items(pairs), number=1)),
+            ('pickle', timeit.timeit(lambda: pickle.loads(pickled), number=1)),
+            ('snapshot', timeit.timeit(
+                lambda: HashMap.load(io.BytesIO(snapshot)), number=1)),
+        ]
+
+    def __repr__(self):
+        lines = ['{:<12}{:>14}'.format('warm up', 'seconds')]
+        for name, seconds in self():
+            lines.append('{:<12}{:>14.3f}'.format(name, seconds))
+        return '\n'.join(lines)
+
+
+class WorkloadBenchmark(object):
+    """
+    operations per second of each map configuration next to dict, for every
+    workload x key distribution x key length x key count
+
+    1. workloads: insert (from empty, resizes included), hit, miss, delete,
+       iterate, resize (rebuild a full table at twice the size; dict is
+       copied instead) & mixed (80% get, 15% set, 5% delete)
+
+    2. key distributions
+        - uniform: every key as likely
+        - zipfian: lookups & updates follow Zipf's law (ZIPF_EXPONENT)
+        - adversarial: keys chosen so their home slots fall into the first
+          1 / ADVERSARIAL_SPREAD of the table, i.e. one long cluster
+
+    3. every number is the best of REPEAT runs with the collector off;
+       ratio = ops/sec of the configuration / ops/sec of dict, which
+       cancels out the speed of the machine
+
+    results are plain dicts (see to_json), so runs can be stored and
+    compared: compare() flags every ratio that fell more than `tolerance`
+    below the same measurement of a baseline run
+    """
+    CONFIGURATIONS = (
+        ('dict', dict, None),
+        ('HashMap', HashMap, None),
+        ('HashMap/fnv1a', HashMap, 'fnv1a'),
+        ('RobinHoodHashMap', RobinHoodHashMap, None),
+        ('CompactHashMap', CompactHashMap, None),
+        ('SwissHashMap', SwissHashMap, None),
+    )
+    WORKLOADS = ('insert', 'hit', 'miss', 'delete', 'iterate', 'resize',
+                 'mixed')
+    DISTRIBUTIONS = ('uniform', 'zipfian', 'adversarial')
+    KEY_LENGTHS = (8, 64)
+    KEY_COUNTS = (1000, 10000)
+    ZIPF_EXPONENT = 1.1
+    ADVERSARIAL_SPREAD = 8
+    REPEAT = 3
+    SEED = 0
+
+    def __init__(self, key_counts=None, key_lengths=None, configurations=None):
+        self.key_counts = key_counts or self.KEY_COUNTS
+        self.key_lengths = key_lengths or self.KEY_LENGTHS
+        self.configurations = [
+            configuration for configuration in self.CONFIGURATIONS
+            if configuration[0] == 'dict' or configurations is None or
+            configuration[0] in configurations]
+
+    @staticmethod
+    def new_map(layout, hash_function):
+        hash_map = layout()
+        if hash_function is not None:
+            hash_map.set_hash_function(hash_function)
+        return hash_map
+
+    def random_keys(self, generator, count, length, prefix=''):
+        alphabet = string.ascii_letters + string.digits
+        keys = set()
+        while len(keys) < count:
+            keys.add(prefix + ''.join(generator.choice(alphabet)
+                                      for x in range(length - len(prefix))))
+        return sorted(keys)
+
+    def adversarial_keys(self, generator, layout, hash_function, count, length):
+        """keys whose home slots all fall into the start of the final table"""
+        probe = self.new_map(HashMap if layout is dict else layout,
+                             hash_function)
+        probe.reserve(count)
+        limit = probe.size // self.ADVERSARIAL_SPREAD
+        keys = []
+        while len(keys) < count:
+            for key in self.random_keys(generator, count, length):
+                if probe.home_index(key) < limit:
+                    keys.append(key)
+        return keys[:count]
+
+    def workloads(self, new_map, generator, keys, missing, distribution):
+        """{workload: (prepare, run)}, prepare builds the untimed input"""
+        count = len(keys)
+        if distribution == 'zipfian':
+            weights = [1 / rank ** self.ZIPF_EXPONENT
+                       for rank in range(1, count + 1)]
+            queries = generator.choices(keys, weights, k=count)
+            misses = generator.choices(missing, weights, k=count)
+        else:
+            queries = generator.sample(keys, count)
+            misses = missing
+        operations = []
+        for key in queries:
+            draw = generator.random()
+            operations.append((0 if draw < 0.8 else 1 if draw < 0.95 else 2,
+                               key))
+
+        def filled():
+            hash_map = new_map()
+            hash_map.update((key, key) for key in keys)
+            return hash_map
+
+        def insert(hash_map):
+            for key in keys:
+                hash_map[key] = key
+
+        def hit(hash_map):
+            for key in queries:
+                hash_map[key]
+
+        def miss(hash_map):
+            for key in misses:
+                hash_map.get(key)
+
+        def delete(hash_map):
+            # every key once, in random order
+            for key in queries if distribution != 'zipfian' else keys:
+                del hash_map[key]
+
+        def iterate(hash_map):
+            for key, value in hash_map.items():
+                pass
+
+        def resize(hash_map):
+            if type(hash_map) is dict:
+                dict(hash_map)
+            else:
+                hash_map.resize(hash_map.table_size(hash_map.size * 2))
+
+        def mixed(hash_map):
+            for operation, key in operations:
+                if operation == 0:
+                    hash_map.get(key)
+                elif operation == 1:
+                    hash_map[key] = key
+                else:
+                    hash_map.pop(key, None)
+
+        return {
+            'insert': (new_map, insert),
+            'hit': (filled, hit),
+            'miss': (filled, miss),
+            'delete': (filled, delete),
+            'iterate': (filled, iterate),
+            'resize': (filled, resize),
+            'mixed': (filled, mixed),
+        }
+
+    def measure(self, prepare, run):
+        """best of REPEAT runs, each on a freshly prepared input"""
+        best = None
+        for repeat in range(self.REPEAT):
+            state = prepare()
+            gc.disable()
+            start = timeit.default_timer()
+            run(state)
+            seconds = timeit.default_timer() - start
+            gc.enable()
+            best = seconds if best is None else min(best, seconds)
+        return best
+
+    def __call__(self):
+        results = []
+        for count in self.key_counts:
+            for length in self.key_lengths:
+                for distribution in self.DISTRIBUTIONS:
+                    results.extend(self.run(count, length, distribution))
+        return results
+
+    def run(self, count, length, distribution):
+        """every workload on every configuration, dict first"""
+        results = []
+        dict_seconds = {}
+        for name, layout, hash_function in self.configurations:
+            # same seed for every configuration: same keys & queries
+            generator = random.Random(
+                '%s/%d/%d/%s' % (self.SEED, count, length, distribution))
+            if distribution == 'adversarial':
+                keys = self.adversarial_keys(generator, layout, hash_function,
+                                             count, length)
+            else:
+                keys = self.random_keys(generator, count, length)
+            missing = self.random_keys(generator, count, length, 'm')
+            workloads = self.workloads(
+                lambda: self.new_map(layout, hash_function),
+                generator, keys, missing, distribution)
+            for workload in self.WORKLOADS:
+                seconds = self.measure(*workloads[workload])
+                dict_seconds.setdefault(workload, seconds)
+                results.append({
+                    'configuration': name,
+                    'workload': workload,
+                    'distribution': distribution,
+                    'key_length': length,
+                    'num_keys': count,
+                    'ops_per_sec': count / seconds,
+                    'ratio': dict_seconds[workload] / seconds,
+                })
+        return results
+
+    @classmethod
+    def to_json(cls, results):
+        return json.dumps({
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'numpy': numpy is not None,
+            'seed': cls.SEED,
+            'results': results,
+        }, indent=2)
+
+    @staticmethod
+    def compare(results, baseline, tolerance=0.2):
+        """results whose ratio to dict fell by more than tolerance"""
+        def measurement(result):
+            return (result['configuration'], result['workload'],
+                    result['distribution'], result['key_length'],
+                    result['num_keys'])
+
+        before = {measurement(result): result['ratio']
+                  for result in baseline['results']}
+        regressions = []
+        for result in results:
+            ratio = before.get(measurement(result))
+            if ratio is not None and result['ratio'] < ratio * (1 - tolerance):
+                regressions.append(dict(result, baseline_ratio=ratio))
+        return regressions
+
+    @staticmethod
+    def format(results):
+        lines = ['{:<18}{:<10}{:<13}{:>5}{:>8}{:>14}{:>9}'.format(
+            'configuration', 'workload', 'keys', 'len', 'count', 'ops/sec',
+            'x dict')]
+        for result in results:
+            lines.append('{:<18}{:<10}{:<13}{:>5}{:>8,}{:>14,.0f}{:>9.3f}'.format(
+                result['configuration'], result['workload'],
+                result['distribution'], result['key_length'],
+                result['num_keys'], result['ops_per_sec'], result['ratio']))
+        return '\n'.join(lines)
+
+    def __repr__(self):
+        return self.format(self())
+
+
+def report():
+    for key_length in (8, 64):
+        print('key length: %d' % key_length)
+        print(HashFunctionBenchmark(key_length=key_length))
+        print()
+
+    print(MemoryFootprintBenchmark())
+    print()
+    print(ResizeLatencyBenchmark())
+    print()
+    print(ConcurrencyBenchmark())
+    print()
+    print(SnapshotBenchmark())
+    print()
+    print(LoadFactorBenchmark())
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(
+        description='hash map benchmarks: without --suite, prints the '
+                    'hash, memory, resize, concurrency, snapshot & load '
+                    'factor reports')
+    parser.add_argument('--suite', action='store_true',
+                        help='run the workload suite against dict')
+    parser.add_argument('--num-keys', type=int, nargs='+',
+                        help='key counts (default: %s)' % (WorkloadBenchmark.KEY_COUNTS,))
+    parser.add_argument('--key-lengths', type=int, nargs='+',
+                        help='key lengths (default: %s)' % (WorkloadBenchmark.KEY_LENGTHS,))
+    parser.add_argument('--configurations', nargs='+',
+                        help='configurations to run next to dict')
+    parser.add_argument('--output', help='write results as json')
+    parser.add_argument('--baseline', help='json results to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='flag ratios that fell more than this fraction')
+    arguments = parser.parse_args(arguments)
+    if not arguments.suite:
+        report()
+        return 0
+
+    results = WorkloadBenchmark(arguments.num_keys, arguments.key_lengths,
+                                arguments.configurations)()
+    print(WorkloadBenchmark.format(results))
+    if arguments.output:
+        with open(arguments.output, 'w') as output:
+            output.write(WorkloadBenchmark.to_json(results))
+    if arguments.baseline:
+        with open(arguments.baseline) as baseline:
+            regressions = WorkloadBenchmark.compare(
+                results, json.load(baseline), arguments.tolerance)
+        if regressions:
+            print('\nregressions (ratio to dict vs baseline):')
+            for regression in regressions:
+                print('{configuration} {workload} {distribution} '
+                      'len={key_length} count={num_keys}: '
+                      '{ratio:.3f} < {baseline_ratio:.3f}'.format(**regression))
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,302 @@
+import random
+import sys
+import time
+from hash_map import HashMap
+from utils import HashFunction, KeyValuePair, TOMBSTONE, MISSING
+
+
+class CacheEntry(KeyValuePair):
+    """ key-value pair with the bookkeeping of the eviction policies """
+
+    def __init__(self, key, value, hash=None, distance=0):
+        super(CacheEntry, self).__init__(key, value, hash, distance)
+        self.prev = self.next = None  # intrusive LRU list
+        self.frequency = 0  # LFU counter
+        self.expires = None  # deadline on the cache clock, None: never
+        self.bytes = 0
+
+
+class LRUPolicy(object):
+    """
+    least recently used: entries are linked into a list through their own
+    prev / next attributes, most recently used at the tail
+        - access, insert & victim are O(1) pointer updates
+    """
+
+    def __init__(self, cache):
+        self.root = CacheEntry.__new__(CacheEntry)
+        self.root.prev = self.root.next = self.root
+
+    def insert(self, entry):
+        last = self.root.prev
+        entry.prev, entry.next = last, self.root
+        last.next = self.root.prev = entry
+
+    def access(self, entry):
+        self.remove(entry)
+        self.insert(entry)
+
+    def remove(self, entry):
+        entry.prev.next = entry.next
+        entry.next.prev = entry.prev
+        entry.prev = entry.next = None
+
+    def victim(self):
+        return None if self.root.next is self.root else self.root.next
+
+
+class LFUPolicy(object):
+    """
+    approximate least frequently used, as Redis does:
+        - every entry counts its accesses, saturating at MAX_FREQUENCY
+        - new entries start at INITIAL_FREQUENCY, so they are not the
+          first victims before they had a chance to be used
+        - the victim is the least used of SAMPLES randomly sampled entries,
+          instead of keeping all entries ordered by frequency
+    """
+    SAMPLES = 5
+    SAMPLE_ATTEMPTS = 16
+    INITIAL_FREQUENCY = 5
+    MAX_FREQUENCY = 255
+
+    def __init__(self, cache):
+        self.cache = cache
+        self.random = random.Random()
+
+    def insert(self, entry):
+        entry.frequency = self.INITIAL_FREQUENCY
+
+    def access(self, entry):
+        if entry.frequency < self.MAX_FREQUENCY:
+            entry.frequency += 1
+
+    def remove(self, entry):
+        pass
+
+    def sample(self):
+        """entry at a random slot, else the first one after the last try"""
+        array, size = self.cache.array, self.cache.size
+        for attempt in range(self.SAMPLE_ATTEMPTS):
+            index = self.random.randrange(size)
+            if array[index]:
+                return array[index]
+        while not array[index]:
+            index = (index + 1) % size
+        return array[index]
+
+    def victim(self):
+        if not len(self.cache):
+            return None
+        return min((self.sample() for x in range(self.SAMPLES)),
+                   key=lambda entry: entry.frequency)
+
+
+class CacheHashMap(HashMap):
+    """
+    bounded HashMap for memoization
+
+    1. at most MAX_ENTRIES entries and / or MAX_BYTES bytes of keys & values
+       (sys.getsizeof), POLICY picks what to evict once either is exceeded
+        - eviction is a plain O(1) tombstone delete
+
+    2. optional time to live per entry (set(key, value, ttl=...)), or
+       DEFAULT_TTL for all: expired entries met while probing are removed
+       on the spot, there is no background sweep
+        - until then len() & iteration still count them, expire() sweeps
+          the whole table on demand
+
+    3. hits, misses, evictions & expirations are counted, see stats()
+    """
+    MAX_ENTRIES = 1024
+    MAX_BYTES = None
+    POLICY = LRUPolicy
+    DEFAULT_TTL = None  # seconds
+    CLOCK = time.monotonic
+
+    def __init__(self, **kwargs):
+        self.policy = self.POLICY(self)
+        self.bytes = 0
+        self.expiring = 0  # entries with a deadline
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        super(CacheHashMap, self).__init__(**kwargs)
+
+    @classmethod
+    def with_limits(cls, max_entries=MISSING, max_bytes=MISSING,
+                    ttl=MISSING, **kwargs):
+        """cache with its own limits, defaults from the class attributes"""
+        cache = cls.__new__(cls)
+        if max_entries is not MISSING:
+            cache.MAX_ENTRIES = max_entries
+        if max_bytes is not MISSING:
+            cache.MAX_BYTES = max_bytes
+        if ttl is not MISSING:
+            cache.DEFAULT_TTL = ttl
+        cache.__init__(**kwargs)
+        return cache
+
+    def expired(self, entry):
+        return entry.expires is not None and entry.expires <= self.CLOCK()
+
+    def get_index(self, key, key_hash=None):
+        """sequential probing that drops expired entries on its way"""
+        if key_hash is None:
+            key_hash = self.key_hash(key)
+        index = key_hash % self.size
+        first_tombstone = None
+        while self.array[index] is not None:
+            entry = self.array[index]
+            if entry is not TOMBSTONE and self.expiring and self.expired(entry):
+                self.forget(entry)
+                self.expirations += 1
+                self.delete_index(index, compact=False)
+                entry = self.array[index]
+                if entry is None:
+                    break
+
+            if entry is TOMBSTONE:
+                if first_tombstone is None:
+                    first_tombstone = index
+            elif entry.hash == key_hash and entry.key == key:
+                return index
+
+            index = self.increment_index(index)
+
+        return index if first_tombstone is None else first_tombstone
+
+    def expire(self):
+        """remove every expired entry, returns how many"""
+        expired = [entry for entry in filter(None, self.array)
+                   if self.expired(entry)]
+        for entry in expired:
+            self.remove(entry.key, entry.hash)
+        return len(expired)
+
+    @classmethod
+    def load(cls, source):
+        """
+        a snapshot holds no recency, frequency or expiry: its items go into
+        a fresh cache (empty policy state, DEFAULT_TTL) in slot order, by
+        their cached hashes, and are evicted as usual past the limits
+        """
+        snapshot = HashMap.load(source)
+        cache = cls()
+        cache.hash_function = snapshot.hash_function
+        cache.reserve(min(len(snapshot), cache.MAX_ENTRIES or len(snapshot)))
+        for item in filter(None, snapshot.array):
+            cache.insert(item.key, item.hash, item.value)
+            cache.check_load()
+        return cache
+
+    def set(self, key, value, ttl=MISSING):
+        """store value under key, expiring after ttl seconds if given"""
+        if self.insert(key, self.key_hash(key), value, ttl=ttl) is MISSING:
+            self.check_load()
+
+    def insert(self, key, key_hash, value, replace=True, ttl=MISSING):
+        index = self.get_index(key, key_hash)
+        entry = self.array[index]
+        if entry:
+            previous = entry.value
+            if replace:
+                self.assign(entry, value, ttl)
+            self.policy.access(entry)
+            self.evict()
+            return previous
+
+        if self.VALIDATE_KEYS:
+            HashFunction.validate(key)
+        entry = CacheEntry(key, value, key_hash)
+        entry.distance = (index - key_hash % self.size) % self.size
+        if self.array[index] is TOMBSTONE:
+            self.tombstones -= 1
+        self.array[index] = entry
+        self.used += 1
+        self.assign(entry, value, ttl)
+        self.policy.insert(entry)
+        self.evict()
+        return MISSING
+
+    def assign(self, entry, value, ttl):
+        """set value & deadline of an entry, keeping the totals in sync"""
+        if ttl is MISSING:
+            ttl = self.DEFAULT_TTL
+        self.bytes -= entry.bytes
+        entry.value = value
+        entry.bytes = sys.getsizeof(entry.key) + sys.getsizeof(value)
+        self.bytes += entry.bytes
+        self.expiring -= entry.expires is not None
+        entry.expires = None if ttl is None else self.CLOCK() + ttl
+        self.expiring += entry.expires is not None
+
+    def lookup(self, key, key_hash, default=MISSING):
+        entry = self.array[self.get_index(key, key_hash)]
+        if not entry or entry != key:
+            self.misses += 1
+            return default
+
+        self.hits += 1
+        self.policy.access(entry)
+        return entry.value
+
+    def __contains__(self, item):
+        """membership test, without counting a hit or refreshing the entry"""
+        entry = self.array[self.get_index(item, self.key_hash(item))]
+        return bool(entry) and entry == item
+
+    def remove(self, key, key_hash, default=MISSING):
+        index = self.get_index(key, key_hash)
+        entry = self.array[index]
+        if not entry or entry != key:
+            return default
+
+        self.forget(entry)
+        self.delete_index(index)
+        self.check_shrink()
+        return entry.value
+
+    def forget(self, entry):
+        """drop an entry from policy & totals, before its slot is emptied"""
+        self.policy.remove(entry)
+        self.bytes -= entry.bytes
+        self.expiring -= entry.expires is not None
+
+    def over_budget(self):
+        return (self.MAX_ENTRIES is not None and
+                len(self) > self.MAX_ENTRIES) or \
+            (self.MAX_BYTES is not None and self.bytes > self.MAX_BYTES)
+
+    def evict(self):
+        while self.over_budget():
+            entry = self.policy.victim()
+            if entry is None:
+                break
+            self.remove(entry.key, entry.hash)
+            self.evictions += 1
+
+    def clear(self):
+        super(CacheHashMap, self).clear()
+        self.policy = self.POLICY(self)
+        self.bytes = 0
+        self.expiring = 0
+
+    def stats(self):
+        snapshot = super(CacheHashMap, self).stats()
+        snapshot.update({
+            'cache_hits': self.hits,
+            'cache_misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'bytes': self.bytes,
+        })
+        return snapshot
+
+
+class LRUCache(CacheHashMap):
+    POLICY = LRUPolicy
+
+
+class LFUCache(CacheHashMap):
+    POLICY = LFUPolicy
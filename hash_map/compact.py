@@ -0,0 +1,222 @@
+import sys
+from array import array
+from hash_map import HashMap
+from utils import HashFunction, TOMBSTONE, MISSING
+
+
+class CompactHashMap(HashMap):
+    """
+    same hashing & sequential probing as HashMap, with a compact layout
+    (as dict since CPython 3.6):
+
+    1. sparse table of small ints (self.indices)
+        - array('b' / 'h' / 'l' / 'q'), narrowest type that fits the size
+        - EMPTY (-1) ends a probe, DUMMY (-2) marks a deleted entry
+
+    2. dense, insertion-ordered entries in parallel arrays
+        - self.dense_keys & self.dense_values: python lists
+        - self.dense_hashes: array('Q') of 64-bit hashes (wider ones truncated)
+        - deleted entries leave a TOMBSTONE key until the next resize
+
+    no per-entry object, and iteration only walks the dense entries
+
+    snapshots hold the live dense entries only: load rebuilds the index
+    from their cached hashes, in insertion order
+    """
+    EMPTY = -1
+    DUMMY = -2
+    SNAPSHOT_LAYOUT = 'dense'
+
+    def __init__(self, **kwargs):
+        self.hash_function = self.HASH_FUNCTION
+        self.size = self.table_size(self.NUM_SLOTS)
+        self.indices = self.new_indices(self.size)
+        self.dense_keys = []
+        self.dense_values = []
+        self.dense_hashes = array('Q')
+        self.used = 0
+        self.tombstones = 0
+        self.compactions = 0
+        for key in kwargs:
+            self.__setitem__(key, kwargs[key])
+
+    @classmethod
+    def new_indices(cls, size):
+        """narrowest signed typecode that can index `size` entries"""
+        for typecode in ('b', 'h', 'l', 'q'):
+            if size <= 2 ** (8 * array(typecode).itemsize - 1):
+                return array(typecode, [cls.EMPTY]) * size
+
+    def key_hash(self, key):
+        return self.hash_function(key) & HashFunction.MASK_64
+
+    def key_hashes(self, keys):
+        return [key_hash & HashFunction.MASK_64 for key_hash in
+                super(CompactHashMap, self).key_hashes(keys)]
+
+    def get_index(self, key, key_hash=None):
+        """returns slot of key, else the first free slot along its probe"""
+        if key_hash is None:
+            key_hash = self.key_hash(key)
+        index = key_hash % self.size
+        first_dummy = None
+        while self.indices[index] != self.EMPTY:
+            entry = self.indices[index]
+            if entry == self.DUMMY:
+                if first_dummy is None:
+                    first_dummy = index
+            elif self.dense_hashes[entry] == key_hash and self.dense_keys[entry] == key:
+                return index
+
+            index = self.increment_index(index)
+
+        return index if first_dummy is None else first_dummy
+
+    def insert(self, key, key_hash, value, replace=True):
+        index = self.get_index(key, key_hash)
+        entry = self.indices[index]
+        if entry >= 0:
+            previous = self.dense_values[entry]
+            if replace:
+                self.dense_values[entry] = value
+            return previous
+
+        if self.VALIDATE_KEYS:
+            HashFunction.validate(key)
+        if entry == self.DUMMY:
+            self.tombstones -= 1
+        self.indices[index] = len(self.dense_keys)
+        self.dense_keys.append(key)
+        self.dense_values.append(value)
+        self.dense_hashes.append(key_hash)
+        self.used += 1
+        return MISSING
+
+    def lookup(self, key, key_hash, default=MISSING):
+        entry = self.indices[self.get_index(key, key_hash)]
+        if entry < 0 or self.dense_keys[entry] != key:
+            return default
+
+        return self.dense_values[entry]
+
+    def remove(self, key, key_hash, default=MISSING):
+        index = self.get_index(key, key_hash)
+        entry = self.indices[index]
+        if entry < 0 or self.dense_keys[entry] != key:
+            return default
+
+        value = self.dense_values[entry]
+        self.indices[index] = self.DUMMY
+        self.dense_keys[entry] = TOMBSTONE
+        self.dense_values[entry] = None
+        self.tombstones += 1
+        self.used -= 1
+        if entry == len(self.dense_keys) - 1:
+            # trailing deleted entries can go right away
+            while self.dense_keys and self.dense_keys[-1] is TOMBSTONE:
+                self.dense_keys.pop()
+                self.dense_values.pop()
+                self.dense_hashes.pop()
+        if self.tombstones > self.TOMBSTONE_THRESHOLD * self.size:
+            self.compact()
+        self.check_shrink()
+        return value
+
+    def popitem(self):
+        """remove and return the last inserted (key, value) pair, as dict"""
+        if not self.used:
+            raise KeyError('popitem(): hash map is empty')
+
+        key, value = self.dense_keys[-1], self.dense_values[-1]
+        self.remove(key, self.dense_hashes[-1])
+        return key, value
+
+    def clear(self):
+        self.size = self.table_size(self.NUM_SLOTS)
+        self.indices = self.new_indices(self.size)
+        self.dense_keys = []
+        self.dense_values = []
+        self.dense_hashes = array('Q')
+        self.used = 0
+        self.tombstones = 0
+
+    def __iter__(self):
+        """iterate through keys in insertion order"""
+        for key in self.dense_keys:
+            if key is not TOMBSTONE:
+                yield key
+
+    def iteritems(self):
+        for key, value in zip(self.dense_keys, self.dense_values):
+            if key is not TOMBSTONE:
+                yield key, value
+
+    def __len__(self):
+        return self.used
+
+    def filled(self):
+        """
+        load of the table, the larger of
+            - non-EMPTY index slots: live entries plus DUMMY slots, which
+              outlive the trailing dense entries popped on delete
+            - dense entries, live or deleted: an insert into a reused DUMMY
+              slot still appends one, and entries must fit the index type
+        """
+        return max(self.used + self.tombstones, len(self.dense_keys))
+
+    def __sizeof__(self):
+        """bytes held by the table itself, excluding keys & values"""
+        return object.__sizeof__(self) + sum(
+            sys.getsizeof(column) for column in (
+                self.indices, self.dense_keys, self.dense_values,
+                self.dense_hashes))
+
+    def max_probe_length(self):
+        return max((
+            (index - self.dense_hashes[entry] % self.size) % self.size
+            for index, entry in enumerate(self.indices) if entry >= 0),
+            default=0)
+
+    def count_probes(self, key, key_hash):
+        index = key_hash % self.size
+        probes = 1
+        while self.indices[index] != self.EMPTY:
+            entry = self.indices[index]
+            if entry >= 0 and self.dense_hashes[entry] == key_hash \
+                    and self.dense_keys[entry] == key:
+                return True, probes
+
+            index = self.increment_index(index)
+            probes += 1
+
+        return False, probes
+
+    def occupied_slots(self):
+        return [entry != self.EMPTY for entry in self.indices]
+
+    def set_hash_function(self, hash_function):
+        if isinstance(hash_function, str):
+            hash_function = HashFunction.get(hash_function)
+        self.hash_function = hash_function
+        for entry, key in enumerate(self.dense_keys):
+            if key is not TOMBSTONE:
+                self.dense_hashes[entry] = self.key_hash(key)
+        self.resize(self.table_size(self.size))
+
+    def resize(self, size):
+        """squeeze deleted entries out of the dense arrays, then reindex"""
+        if len(self.dense_keys) != self.used:
+            live = [entry for entry, key in enumerate(self.dense_keys)
+                    if key is not TOMBSTONE]
+            self.dense_keys = [self.dense_keys[entry] for entry in live]
+            self.dense_values = [self.dense_values[entry] for entry in live]
+            self.dense_hashes = array('Q', (self.dense_hashes[entry] for entry in live))
+
+        self.size = size
+        self.indices = self.new_indices(size)
+        self.tombstones = 0
+        for entry, key_hash in enumerate(self.dense_hashes):
+            index = key_hash % size
+            while self.indices[index] != self.EMPTY:
+                index = self.increment_index(index)
+            self.indices[index] = entry
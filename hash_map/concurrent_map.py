@@ -0,0 +1,277 @@
+import threading
+from collections.abc import MutableMapping
+from contextlib import ExitStack, contextmanager
+from hash_map import HashMap, HashMapValuesView, HashMapItemsView
+from utils import HashFunction, MISSING
+
+
+class ReadWriteLock(object):
+    """
+    many readers or a single writer at a time
+        - writer preferring: once a writer waits, new readers queue behind it
+    """
+
+    def __init__(self):
+        self.condition = threading.Condition(threading.Lock())
+        self.readers = 0
+        self.writing = False
+        self.waiting_writers = 0
+
+    @contextmanager
+    def read(self):
+        with self.condition:
+            while self.writing or self.waiting_writers:
+                self.condition.wait()
+            self.readers += 1
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.readers -= 1
+                if not self.readers:
+                    self.condition.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self.condition:
+            self.waiting_writers += 1
+            while self.writing or self.readers:
+                self.condition.wait()
+            self.waiting_writers -= 1
+            self.writing = True
+        try:
+            yield
+        finally:
+            with self.condition:
+                self.writing = False
+                self.condition.notify_all()
+
+
+class ConcurrentHashMap(MutableMapping):
+    """
+    thread-safe map, lock-striped over NUM_SEGMENTS independent segments
+
+    1. a key is hashed once; the (mixed) high bits of the hash pick its
+       segment, the segment probes with the same hash
+        - low bits stay uniform within each segment's own table
+
+    2. every segment is a SEGMENT_CLASS (HashMap by default) guarded by its
+       own read/write lock
+        - writers to different segments never contend
+        - readers of the same segment share its lock
+        - each segment resizes on its own, under its own write lock
+
+    3. len() and iteration visit segments one at a time: they are exact
+       only while no other thread writes
+
+    4. keys are hashed before any lock is taken, so set_hash_function
+       bumps hash_version: an operation that finds it moved once it holds
+       its segment lock hashes the key again & retries
+
+    lookups must not modify a segment, which rules out IncrementalHashMap
+    (it migrates on every operation) as SEGMENT_CLASS
+    """
+    NUM_SEGMENTS = 16
+    SEGMENT_CLASS = HashMap
+    SEGMENT_MULTIPLIER = 0x9e3779b97f4a7c15  # fibonacci hashing
+
+    def __init__(self, **kwargs):
+        self.segments = [self.SEGMENT_CLASS()
+                         for x in range(self.NUM_SEGMENTS)]
+        self.locks = [ReadWriteLock() for x in range(self.NUM_SEGMENTS)]
+        self.hash_version = 0
+        self.update(kwargs)
+
+    @classmethod
+    def with_segments(cls, num_segments, **kwargs):
+        hash_map = cls.__new__(cls)
+        hash_map.NUM_SEGMENTS = num_segments
+        hash_map.__init__(**kwargs)
+        return hash_map
+
+    def key_hash(self, key):
+        return self.segments[0].key_hash(key)
+
+    def segment_index(self, key_hash):
+        mixed = ((key_hash & HashFunction.MASK_64) * self.SEGMENT_MULTIPLIER) \
+            & HashFunction.MASK_64
+        return (mixed >> 32) % self.NUM_SEGMENTS
+
+    @contextmanager
+    def locked(self, key, write=True):
+        """(segment, hash) of key, under the segment's lock: re-hashed
+        until no set_hash_function ran in between"""
+        while True:
+            version = self.hash_version
+            key_hash = self.key_hash(key)
+            index = self.segment_index(key_hash)
+            lock = self.locks[index]
+            with lock.write() if write else lock.read():
+                if version == self.hash_version:
+                    yield self.segments[index], key_hash
+                    return
+
+    def set_hash_function(self, hash_function):
+        """
+        rehash every key, under all write locks: the new hash also picks
+        a new segment, so pairs are drained & reinserted, not rehashed in
+        place
+        """
+        with ExitStack() as stack:
+            for lock in self.locks:
+                stack.enter_context(lock.write())
+            items = []
+            for segment in self.segments:
+                items.extend(segment.iteritems())
+                segment.clear()
+                segment.set_hash_function(hash_function)
+
+            groups = self.group([key for key, value in items])
+            values = dict(items)
+            for (keys, key_hashes), segment in zip(groups, self.segments):
+                segment.reserve(len(keys))
+                for key, key_hash in zip(keys, key_hashes):
+                    segment.insert(key, key_hash, values[key])
+                segment.check_load()
+            self.hash_version += 1
+
+    def __setitem__(self, key, value):
+        with self.locked(key) as (segment, key_hash):
+            if segment.insert(key, key_hash, value) is MISSING:
+                segment.check_load()
+
+    def __getitem__(self, item):
+        value = self.get(item, MISSING)
+        if value is MISSING:
+            raise KeyError(item)
+
+        return value
+
+    def get(self, key, default=None):
+        with self.locked(key, write=False) as (segment, key_hash):
+            return segment.lookup(key, key_hash, default)
+
+    def __contains__(self, item):
+        return self.get(item, MISSING) is not MISSING
+
+    def setdefault(self, key, default=None):
+        with self.locked(key) as (segment, key_hash):
+            value = segment.insert(key, key_hash, default, replace=False)
+            if value is MISSING:
+                segment.check_load()
+                return default
+
+            return value
+
+    def pop(self, key, default=MISSING):
+        with self.locked(key) as (segment, key_hash):
+            value = segment.remove(key, key_hash, default)
+        if value is MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def __delitem__(self, key):
+        self.pop(key)
+
+    def popitem(self):
+        for segment, lock in zip(self.segments, self.locks):
+            with lock.write():
+                if len(segment):
+                    return segment.popitem()
+
+        raise KeyError('popitem(): hash map is empty')
+
+    def clear(self):
+        for segment, lock in zip(self.segments, self.locks):
+            with lock.write():
+                segment.clear()
+
+    def __len__(self):
+        return sum(len(segment) for segment in self.segments)
+
+    def __iter__(self):
+        for key, value in self.iteritems():
+            yield key
+
+    def iteritems(self):
+        """pairs of one segment are copied under its lock, then yielded"""
+        for segment, lock in zip(self.segments, self.locks):
+            with lock.read():
+                items = list(segment.iteritems())
+            for item in items:
+                yield item
+
+    def values(self):
+        return HashMapValuesView(self)
+
+    def items(self):
+        return HashMapItemsView(self)
+
+    def group(self, keys):
+        """(keys, hashes) per segment, hashing the whole batch once"""
+        groups = [([], []) for x in range(self.NUM_SEGMENTS)]
+        key_hashes = self.segments[0].key_hashes(keys)
+        for key, key_hash in zip(keys, key_hashes):
+            segment_keys, segment_hashes = groups[self.segment_index(key_hash)]
+            segment_keys.append(key)
+            segment_hashes.append(key_hash)
+        return groups
+
+    def set_many(self, pairs):
+        """insert in bulk, taking each segment's write lock once (keys
+        re-hashed by a concurrent set_hash_function are grouped again)"""
+        if hasattr(pairs, 'keys'):
+            pairs = [(key, pairs[key]) for key in pairs.keys()]
+        else:
+            pairs = list(pairs)
+        values = dict(pairs)
+        pending = list(values)
+        while pending:
+            version = self.hash_version
+            groups = self.group(pending)
+            pending = []
+            for (keys, key_hashes), segment, lock in \
+                    zip(groups, self.segments, self.locks):
+                if not keys:
+                    continue
+                with lock.write():
+                    if version != self.hash_version:
+                        pending.extend(keys)
+                        continue
+                    segment.reserve(len(segment) + len(keys))
+                    for key, key_hash in zip(keys, key_hashes):
+                        segment.insert(key, key_hash, values[key])
+                    segment.check_load()
+
+    def update(self, *args, **kwargs):
+        if len(args) > 1:
+            raise TypeError('update expected at most 1 argument')
+        for other in args + (kwargs,):
+            self.set_many(other)
+
+    def get_many(self, keys, default=None):
+        """batch lookup, taking each segment's read lock once"""
+        keys = list(keys)
+        found = {}
+        pending = keys
+        while pending:
+            version = self.hash_version
+            groups = self.group(pending)
+            pending = []
+            for (segment_keys, key_hashes), segment, lock in \
+                    zip(groups, self.segments, self.locks):
+                if not segment_keys:
+                    continue
+                with lock.read():
+                    if version != self.hash_version:
+                        pending.extend(segment_keys)
+                        continue
+                    for key, key_hash in zip(segment_keys, key_hashes):
+                        found[key] = segment.lookup(key, key_hash, default)
+        return [found[key] for key in keys]
+
+    def __repr__(self):
+        return '{%s}' % ', '.join(
+            '"{}": {}'.format(key, value)
+            for key, value in self.iteritems())
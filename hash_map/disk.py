@@ -0,0 +1,410 @@
+import mmap
+import os
+import pickle
+import struct
+from collections.abc import MutableMapping
+from hash_map import HashMap, HashMapValuesView, HashMapItemsView
+from utils import HashFunction, MISSING
+
+
+class DiskHashMap(MutableMapping):
+    """
+    HashMap whose table lives in a file, opened with mmap
+
+    1. file layout, little endian:
+        - header: MAGIC, VERSION, hash function id (index in
+          HashFunction.FUNCTIONS), size, used, tombstones, heap end,
+          dead heap bytes
+        - `size` fixed-width slots of (64-bit hash, heap offset):
+          offset EMPTY (0) ends a probe, DUMMY (1) marks a deleted entry
+        - append-only heap of records: key length, value length,
+          encoded key (see encode_key), pickled value
+
+    2. opening maps the file and reads the header only: O(1), no copy.
+       a lookup touches the pages of the slots it probes and of the
+       record it finds, nothing else
+
+    3. same hash functions & sequential probing as HashMap, with hashes
+       truncated to 64 bits (as CompactHashMap)
+
+    4. writes never move data in place
+        - a new or updated value appends a record and points its slot there
+        - records left behind by updates & deletes are counted as dead
+          bytes; once they outweigh the live heap (and the slots), the file
+          is rebuilt without them
+        - growth and rebuilds build a new file next to the old one and
+          atomically rename it over it
+        - flush() / close() make changes durable
+    """
+    MAGIC = b'YCHM'
+    VERSION = 3
+    HEADER = struct.Struct('<4sHHQQQQQ')
+    SLOT = struct.Struct('<QQ')
+    RECORD = struct.Struct('<II')
+    EMPTY = 0
+    DUMMY = 1
+
+    NUM_SLOTS = HashMap.NUM_SLOTS
+    MAX_LOAD_FACTOR = HashMap.MAX_LOAD_FACTOR
+    HASH_FUNCTION = 'blake2b'
+    VALIDATE_KEYS = HashMap.VALIDATE_KEYS
+
+    def __init__(self, path, hash_function=None, readonly=False):
+        self.path = path
+        self.readonly = readonly
+        if not readonly and (not os.path.exists(path) or
+                             not os.path.getsize(path)):
+            hash_function = hash_function or self.HASH_FUNCTION
+            self.create(path, self.table_size(self.NUM_SLOTS, hash_function),
+                        hash_function)
+        self.open()
+
+    @classmethod
+    def create(cls, path, size, hash_function, heap_capacity=0):
+        """write an empty table to path, with room for heap_capacity bytes"""
+        if not isinstance(hash_function, str):
+            hash_function = hash_function.__name__
+        with open(path, 'wb') as output:
+            output.write(cls.HEADER.pack(
+                cls.MAGIC, cls.VERSION,
+                HashFunction.FUNCTIONS.index(hash_function), size, 0, 0,
+                cls.heap_start(size), 0))
+            output.truncate(cls.heap_start(size) + max(heap_capacity, 1))
+
+    @classmethod
+    def heap_start(cls, size):
+        return cls.HEADER.size + size * cls.SLOT.size
+
+    @classmethod
+    def table_size(cls, minimum, hash_function):
+        """smallest size >= minimum under the sizing policy of HashMap"""
+        hash_map = HashMap.__new__(HashMap)
+        hash_map.hash_function = HashFunction.get(hash_function)
+        return hash_map.table_size(minimum)
+
+    def open(self):
+        self.file = open(self.path, 'rb' if self.readonly else 'r+b')
+        self.map_file()
+        try:
+            self.read_header()
+        except ValueError:
+            self.mmap.close()
+            self.file.close()
+            raise
+
+    def read_header(self):
+        if len(self.mmap) < self.HEADER.size:
+            raise ValueError('%s: not a hash map file' % self.path)
+        magic, version, function_id, self.size, self.used, self.tombstones, \
+            self.heap_end, self.dead = self.HEADER.unpack_from(self.mmap)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError('%s: not a hash map file' % self.path)
+        self.hash_function = HashFunction.get(
+            HashFunction.FUNCTIONS[function_id])
+
+    def map_file(self):
+        self.mmap = mmap.mmap(
+            self.file.fileno(), 0,
+            access=mmap.ACCESS_READ if self.readonly else mmap.ACCESS_WRITE)
+
+    def write_header(self):
+        self.HEADER.pack_into(
+            self.mmap, 0, self.MAGIC, self.VERSION,
+            HashFunction.FUNCTIONS.index(self.hash_function.__name__),
+            self.size, self.used, self.tombstones, self.heap_end, self.dead)
+
+    def flush(self):
+        if not self.readonly:
+            self.write_header()
+            self.mmap.flush()
+
+    def close(self):
+        if not self.mmap.closed:
+            self.flush()
+            self.mmap.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def key_hash(self, key):
+        return self.hash_function(key) & HashFunction.MASK_64
+
+    def slot(self, index):
+        """(hash, heap offset) of a slot"""
+        return self.SLOT.unpack_from(self.mmap,
+                                     self.HEADER.size + index * self.SLOT.size)
+
+    def set_slot(self, index, key_hash, offset):
+        self.SLOT.pack_into(self.mmap, self.HEADER.size +
+                            index * self.SLOT.size, key_hash, offset)
+
+    def increment_index(self, index):
+        index += 1
+        return 0 if index >= self.size else index
+
+    @staticmethod
+    def encode_key(key):
+        """type tag + HashFunction.encode, so that keys decode to their type"""
+        data = HashFunction.encode(key)
+        return HashFunction.KEY_TAGS[type(key)] + data
+
+    @classmethod
+    def decode_key(cls, data):
+        tag, body = data[:1], data[1:]
+        if tag == b's':
+            return body.decode()
+        if tag == b'b':
+            return body
+        if tag == b'i':
+            return int.from_bytes(body, 'little', signed=True)
+        items = []
+        offset, width = 0, HashFunction.LENGTH_BYTES
+        while offset < len(body):
+            start = offset + 1 + width
+            end = start + int.from_bytes(body[offset + 1:start], 'little')
+            items.append(cls.decode_key(body[offset:offset + 1] +
+                                        body[start:end]))
+            offset = end
+        return tuple(items)
+
+    def record_key(self, offset):
+        """encoded key stored at offset, without decoding"""
+        key_length, value_length = self.RECORD.unpack_from(self.mmap, offset)
+        start = offset + self.RECORD.size
+        return self.mmap[start:start + key_length]
+
+    def record_length(self, offset):
+        """heap bytes taken by the record at offset"""
+        key_length, value_length = self.RECORD.unpack_from(self.mmap, offset)
+        return self.RECORD.size + key_length + value_length
+
+    def record(self, offset):
+        """(key, value) stored at offset"""
+        key_length, value_length = self.RECORD.unpack_from(self.mmap, offset)
+        start = offset + self.RECORD.size
+        key = self.decode_key(bytes(self.mmap[start:start + key_length]))
+        start += key_length
+        return key, pickle.loads(self.mmap[start:start + value_length])
+
+    def get_index(self, key, key_hash=None):
+        """returns slot of key, else the first free slot along its probe"""
+        if key_hash is None:
+            key_hash = self.key_hash(key)
+        data = self.encode_key(key)
+        index = key_hash % self.size
+        first_dummy = None
+        while True:
+            slot_hash, offset = self.slot(index)
+            if offset == self.EMPTY:
+                break
+            if offset == self.DUMMY:
+                if first_dummy is None:
+                    first_dummy = index
+            elif slot_hash == key_hash and self.record_key(offset) == data:
+                return index
+
+            index = self.increment_index(index)
+
+        return index if first_dummy is None else first_dummy
+
+    def append(self, key, value):
+        """append a record to the heap, returns its offset"""
+        data = self.encode_key(key)
+        payload = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        end = self.heap_end + self.RECORD.size + len(data) + len(payload)
+        if end > len(self.mmap):
+            self.grow_file(end)
+        return self.write_record(data, payload)
+
+    def write_record(self, data, payload):
+        """write an encoded key & value at the heap end, returns their offset"""
+        offset = self.heap_end
+        self.RECORD.pack_into(self.mmap, offset, len(data), len(payload))
+        start = offset + self.RECORD.size
+        self.mmap[start:start + len(data)] = data
+        start += len(data)
+        self.mmap[start:start + len(payload)] = payload
+        self.heap_end = start + len(payload)
+        return offset
+
+    def grow_file(self, minimum):
+        """at least double the file, so appends are amortized O(1)"""
+        length = max(minimum, 2 * len(self.mmap))
+        self.mmap.close()
+        self.file.truncate(length)
+        self.map_file()
+
+    def __setitem__(self, key, value):
+        self.insert(key, self.key_hash(key), value)
+        self.check_load()
+
+    def insert(self, key, key_hash, value, replace=True):
+        """store value under key, returns the value found there, else MISSING"""
+        index = self.get_index(key, key_hash)
+        slot_hash, offset = self.slot(index)
+        if offset > self.DUMMY:
+            previous = self.record(offset)[1]
+            if replace:
+                self.dead += self.record_length(offset)
+                self.set_slot(index, key_hash, self.append(key, value))
+                self.write_header()
+            return previous
+
+        if self.VALIDATE_KEYS:
+            HashFunction.validate(key)
+        if offset == self.DUMMY:
+            self.tombstones -= 1
+        self.set_slot(index, key_hash, self.append(key, value))
+        self.used += 1
+        self.write_header()
+        return MISSING
+
+    def __getitem__(self, item):
+        value = self.lookup(item, self.key_hash(item))
+        if value is MISSING:
+            raise KeyError(item)
+
+        return value
+
+    def lookup(self, key, key_hash, default=MISSING):
+        slot_hash, offset = self.slot(self.get_index(key, key_hash))
+        if offset <= self.DUMMY:
+            return default
+
+        return self.record(offset)[1]
+
+    def __contains__(self, item):
+        slot_hash, offset = self.slot(self.get_index(item))
+        return offset > self.DUMMY
+
+    def get(self, key, default=None):
+        return self.lookup(key, self.key_hash(key), default)
+
+    def setdefault(self, key, default=None):
+        value = self.insert(key, self.key_hash(key), default, replace=False)
+        if value is MISSING:
+            self.check_load()
+            return default
+
+        return value
+
+    def pop(self, key, default=MISSING):
+        value = self.remove(key, self.key_hash(key), default)
+        if value is MISSING:
+            raise KeyError(key)
+
+        self.check_load()
+        return value
+
+    def __delitem__(self, key):
+        if self.remove(key, self.key_hash(key)) is MISSING:
+            raise KeyError(key)
+
+        self.check_load()
+
+    def remove(self, key, key_hash, default=MISSING):
+        """mark the slot deleted, the record stays in the heap as dead bytes"""
+        index = self.get_index(key, key_hash)
+        slot_hash, offset = self.slot(index)
+        if offset <= self.DUMMY:
+            return default
+
+        value = self.record(offset)[1]
+        self.dead += self.record_length(offset)
+        self.set_slot(index, 0, self.DUMMY)
+        self.used -= 1
+        self.tombstones += 1
+        self.write_header()
+        return value
+
+    def __len__(self):
+        return self.used
+
+    def __iter__(self):
+        for key, value in self.iteritems():
+            yield key
+
+    def iteritems(self):
+        """(key, value) pairs in slot order"""
+        for index in range(self.size):
+            slot_hash, offset = self.slot(index)
+            if offset > self.DUMMY:
+                yield self.record(offset)
+
+    def values(self):
+        return HashMapValuesView(self)
+
+    def items(self):
+        return HashMapItemsView(self)
+
+    def __repr__(self):
+        return '{%s}' % ', '.join(
+            '"{}": {}'.format(key, value)
+            for key, value in self.iteritems())
+
+    def check_load(self):
+        """
+        grow, or drop tombstones, once the table is too full to probe well;
+        drop dead records once they outweigh both the live heap & the slots,
+        so that a rebuild is paid for by as many bytes written
+        """
+        limit = self.MAX_LOAD_FACTOR * self.size
+        if self.used + self.tombstones > limit:
+            if self.used * 2 > limit:
+                self.rebuild(self.size * 2)
+            else:
+                self.rebuild(self.size)
+        elif self.dead > max(self.live_heap(), self.size * self.SLOT.size):
+            self.rebuild(self.size)
+
+    def live_heap(self):
+        """heap bytes of the records that slots point to"""
+        return self.heap_end - self.heap_start(self.size) - self.dead
+
+    def set_hash_function(self, hash_function):
+        """switch hash function (HashFunction name) and rehash"""
+        self.rebuild(self.size, hash_function)
+
+    def rebuild(self, minimum, hash_function=None):
+        """
+        copy live records into a new file with at least `minimum` slots,
+        then rename it over the current one
+            - readers that still map the old file keep a consistent view
+        """
+        hash_function = hash_function or self.hash_function.__name__
+        if not isinstance(hash_function, str):
+            hash_function = hash_function.__name__
+        size = self.table_size(minimum, hash_function)
+        path = self.path + '.tmp'
+        self.create(path, size, hash_function, self.live_heap())
+        with DiskHashMap(path) as rebuilt:
+            rehash = hash_function != self.hash_function.__name__
+            for index in range(self.size):
+                slot_hash, offset = self.slot(index)
+                if offset <= self.DUMMY:
+                    continue
+                key_length, value_length = \
+                    self.RECORD.unpack_from(self.mmap, offset)
+                end = offset + self.RECORD.size + key_length + value_length
+                new_offset = rebuilt.heap_end
+                rebuilt.mmap[new_offset:new_offset + end - offset] = \
+                    self.mmap[offset:end]
+                rebuilt.heap_end += end - offset
+                if rehash:
+                    slot_hash = rebuilt.key_hash(self.record(offset)[0])
+                rebuilt.place(slot_hash, new_offset)
+            rebuilt.used = self.used
+        self.close()
+        os.replace(path, self.path)
+        self.open()
+
+    def place(self, key_hash, offset):
+        """put a record known to be absent into the first empty slot"""
+        index = key_hash % self.size
+        while self.slot(index)[1] != self.EMPTY:
+            index = self.increment_index(index)
+        self.set_slot(index, key_hash, offset)
@@ -1,10 +1,17 @@
-from utils import KeyValuePair, HashFunction
+import sys
+from collections.abc import MutableMapping, ValuesView, ItemsView
+from utils import KeyValuePair, HashFunction, TOMBSTONE, MISSING, next_prime
+from stats import HashMapStats
+from snapshot import Snapshot
 
 
-class HashMap(object):
+class HashMap(MutableMapping):
     """
-    1. hash key (str) into integer
-        base-len(alphabet) => Python built-in printable characters: len == 100
+    1. hash key (str, bytes, int or tuple) into integer
+        64-bit blake2b by default; any member of the HashFunction family
+        can be selected per instance with set_hash_function
+        - VALIDATE_KEYS restricts new keys to printable str (& co), at the
+          cost of a check per character on every insert
 
     2. take hash mod len(array) => index (remainder is within range of array)
 
@@ -16,23 +23,71 @@ class HashMap(object):
         - w each lookup, check if key matches, else check adjacent cell
         - worsens lookup by O(n + m) where m is
 
-    5. double size if hash map becomes full
+    5. double size once more than MAX_LOAD_FACTOR of the slots are in use
+        - sizes are powers of two for hashes with well mixed low bits,
+          primes otherwise (see HashFunction.MIXED_LOW_BITS)
+        - optionally shrink below MIN_LOAD_FACTOR to give memory back
+        - every item caches the full hash of its key, so resizing places
+          items in a single pass without rehashing
+        - probing compares cached hashes before comparing keys
+
+    6. deletion leaves a tombstone in the slot so probing continues past it
+        - tombstones are reused by later insertions
+        - table is compacted once tombstones exceed TOMBSTONE_THRESHOLD
+
+    7. bulk operations (from_items, update, set_many, get_many) size the
+       array once and hash the whole batch in one pass
+
+    8. full MutableMapping API, where every single-key operation (get,
+       setdefault, pop, __contains__, ...) does exactly one probe sequence
+       through the insert / lookup / remove primitives of each engine
+
+    9. stats() reports the table layout; enable_stats() additionally
+       records probe lengths & resizes (see stats.HashMapStats)
+
+    10. dump() / load() save & restore the table as a binary snapshot,
+        slot for slot with cached hashes (see snapshot.Snapshot)
     """
 
-    NUM_SLOTS = 127  # 2^7-1
-    BUFFER = 5  # threshold to double size of array
-    HASH_FUNCTION = HashFunction.base_alphabet
+    NUM_SLOTS = 128  # minimum size, rounded up to the sizing policy
+    MAX_LOAD_FACTOR = 0.75  # fraction of used slots that triggers doubling
+    MIN_LOAD_FACTOR = None  # fraction of used slots that triggers shrinking
+    TOMBSTONE_THRESHOLD = 0.25  # fraction of slots that may be tombstones
+    HASH_FUNCTION = HashFunction.blake2b  # default for new instances
+    VALIDATE_KEYS = False  # check new keys with HashFunction.validate
+    SNAPSHOT_LAYOUT = 'slots'  # see Snapshot.LAYOUTS
+    statistics = None  # HashMapStats, while enabled
+    pop_cursor = None  # slot after the last popitem, None: the table end
 
-    def get_index(self, key):
-        index = self.HASH_FUNCTION(key) % self.size
+    def key_hash(self, key):
+        return self.hash_function(key)
+
+    def key_hashes(self, keys):
+        """hash a batch of keys in one pass"""
+        return HashFunction.many(self.hash_function, keys)
+
+    def home_index(self, key):
+        """index a key hashes to before any probing"""
+        return self.key_hash(key) % self.size
+
+    def get_index(self, key, key_hash=None):
+        """returns slot of key, else the first free slot along its probe"""
+        if key_hash is None:
+            key_hash = self.key_hash(key)
+        index = key_hash % self.size
+        first_tombstone = None
         while self.array[index] is not None:
             # amortized lookup (not quite O(1))
-            if self.array[index].key == key:
-                break
+            if self.array[index] is TOMBSTONE:
+                if first_tombstone is None:
+                    first_tombstone = index
+            elif self.array[index].hash == key_hash \
+                    and self.array[index].key == key:
+                return index
 
             index = self.increment_index(index)
 
-        return index
+        return index if first_tombstone is None else first_tombstone
 
     def increment_index(self, index):
         """sequential probing: cycles index within bounds of array"""
@@ -43,65 +98,622 @@ class HashMap(object):
 
     def __init__(self, **kwargs):
         """init empty array with null values w length(SIZE)"""
-        self.size = self.NUM_SLOTS
+        self.hash_function = self.HASH_FUNCTION
+        self.size = self.table_size(self.NUM_SLOTS)
         self.array = [None for x in range(self.size)]
+        self.used = 0
+        self.tombstones = 0
+        self.compactions = 0
         for key in kwargs:
             self.__setitem__(key, kwargs[key])
 
+    @classmethod
+    def from_items(cls, items, expected_size=None):
+        """build from a mapping or iterable of pairs, sizing the array once"""
+        hash_map = cls()
+        hash_map.set_many(items, expected_size)
+        return hash_map
+
+    def dump(self, target):
+        """write a binary snapshot to a path or binary file object"""
+        Snapshot.dump(self, target)
+
+    @classmethod
+    def load(cls, source):
+        """restore a map written by dump, without rehashing"""
+        return Snapshot.load(cls, source)
+
     def __setitem__(self, key, value):
         """implements sequential probing"""
-        item = KeyValuePair(key, value)
-        index = self.get_index(item.key)
-        self.array[index] = item
+        if self.insert(key, self.key_hash(key), value) is MISSING:
+            self.check_load()
 
-        # double array size if hash_map becomes full
-        if len(self) + self.BUFFER >= self.size:
-            self.double()
+    def insert(self, key, key_hash, value, replace=True):
+        """store value under key, returns the value found there, else MISSING
+            - replace=False keeps an existing value in place (setdefault)
+        """
+        index = self.get_index(key, key_hash)
+        stored_item = self.array[index]
+        if stored_item:
+            previous = stored_item.value
+            if replace:
+                stored_item.value = value
+            return previous
+
+        if self.VALIDATE_KEYS:
+            HashFunction.validate(key)
+        item = KeyValuePair(key, value, key_hash)
+        item.distance = (index - key_hash % self.size) % self.size
+        if stored_item is TOMBSTONE:
+            self.tombstones -= 1
+        self.array[index] = item
+        self.used += 1
+        return MISSING
 
     def __getitem__(self, item):
         """implement sequential probing"""
-        index = self.get_index(item)
-        stored_item = self.array[index]
-
-        if stored_item is None:
+        value = self.lookup(item, self.key_hash(item))
+        if value is MISSING:
             raise KeyError(item)
 
+        return value
+
+    def lookup(self, key, key_hash, default=MISSING):
+        """value stored under key, else default"""
+        stored_item = self.array[self.get_index(key, key_hash)]
+        if stored_item is None or stored_item != key:
+            return default
+
         return stored_item.value
 
+    def reserve(self, expected_size):
+        """grow once, so that expected_size items fit under MAX_LOAD_FACTOR"""
+        size = self.table_size(expected_size / self.MAX_LOAD_FACTOR + 1)
+        if size > self.size:
+            self.resize(size)
+
+    def set_many(self, pairs, expected_size=None):
+        """insert a mapping or iterable of pairs with a single resize"""
+        if hasattr(pairs, 'keys'):
+            pairs = [(key, pairs[key]) for key in pairs.keys()]
+        else:
+            pairs = list(pairs)
+        self.reserve(max(expected_size or 0, len(self) + len(pairs)))
+        key_hashes = self.key_hashes([key for key, value in pairs])
+        for (key, value), key_hash in zip(pairs, key_hashes):
+            self.insert(key, key_hash, value)
+        self.check_load()
+
+    def update(self, *args, **kwargs):
+        """same as dict.update, in bulk (positional, so any key is allowed)"""
+        if len(args) > 1:
+            raise TypeError('update expected at most 1 argument')
+        for other in args + (kwargs,):
+            self.set_many(other)
+
+    def get_many(self, keys, default=None):
+        """list of values for a batch of keys, default for missing ones"""
+        keys = list(keys)
+        return [self.lookup(key, key_hash, default)
+                for key, key_hash in zip(keys, self.key_hashes(keys))]
+
     def __contains__(self, item):
-        try:
-            return self[item] is not None
-        except KeyError:
-            return False
+        return self.lookup(item, self.key_hash(item)) is not MISSING
+
+    def get(self, key, default=None):
+        return self.lookup(key, self.key_hash(key), default)
+
+    def setdefault(self, key, default=None):
+        value = self.insert(key, self.key_hash(key), default, replace=False)
+        if value is MISSING:
+            self.check_load()
+            return default
+
+        return value
+
+    def pop(self, key, default=MISSING):
+        value = self.remove(key, self.key_hash(key), default)
+        if value is MISSING:
+            raise KeyError(key)
+
+        return value
+
+    def popitem(self):
+        """remove and return some (key, value) pair"""
+        for index in self.popitem_indices(len(self.array)):
+            item = self.array[index]
+            if item:
+                self.pop_cursor = index + 1
+                self.remove(item.key, item.hash)
+                return item.key, item.value
+
+        raise KeyError('popitem(): hash map is empty')
+
+    def popitem_indices(self, size):
+        """
+        slots in the order popitem scans them: down from the last popped
+        one, so that draining the map is linear, then around from the end
+        for anything inserted above it since
+            - the cursor slot itself comes first: backward-shift deletion
+              may have moved a successor into it
+        """
+        cursor = size if self.pop_cursor is None else min(self.pop_cursor,
+                                                          size)
+        yield from range(cursor - 1, -1, -1)
+        yield from range(size - 1, cursor - 1, -1)
+
+    def clear(self):
+        self.size = self.table_size(self.NUM_SLOTS)
+        self.array = [None] * self.size
+        self.used = 0
+        self.tombstones = 0
+        self.pop_cursor = None
 
     def __iter__(self):
         """iterate through keys only"""
         for item in filter(None, self.array):
             yield item.key
 
-    def __delitem__(self, key):
-        """because of sequential probing, we have to re-insert all hash-values"""
-        index = self.get_index(key)
-        self.array[index] = None
+    def iteritems(self):
+        """iterate through (key, value) pairs straight from the slots"""
         for item in filter(None, self.array):
-            self[item.key] = item.value
+            yield item.key, item.value
+
+    def values(self):
+        return HashMapValuesView(self)
+
+    def items(self):
+        return HashMapItemsView(self)
+
+    def __delitem__(self, key):
+        if self.remove(key, self.key_hash(key)) is MISSING:
+            raise KeyError(key)
+
+    def remove(self, key, key_hash, default=MISSING):
+        """because of sequential probing, leave a tombstone to keep probe chains intact
+            - returns the removed value, else default
+        """
+        index = self.get_index(key, key_hash)
+        stored_item = self.array[index]
+        if not stored_item or stored_item != key:
+            return default
+
+        self.delete_index(index)
+        self.check_shrink()
+        return stored_item.value
+
+    def delete_index(self, index, compact=True):
+        """empty a slot holding an item, compacting past the threshold"""
+        self.used -= 1
+        if self.array[self.increment_index(index)] is None:
+            # end of a probe chain, nothing relies on this slot
+            self.array[index] = None
+        else:
+            self.array[index] = TOMBSTONE
+            self.tombstones += 1
+            if compact and \
+                    self.tombstones > self.TOMBSTONE_THRESHOLD * self.size:
+                self.compact()
 
     def __repr__(self):
         """we can also use curly brackets"""
         return '{%s}' % ', '.join(
-            '"{}": {}'.format(key, self[key])
-            for key in self)
+            '"{}": {}'.format(key, value)
+            for key, value in self.iteritems())
 
     def __len__(self):
-        return self.size - self.array.count(None)
+        return self.used
+
+    def filled(self):
+        """slots that do not terminate a probe: items & tombstones"""
+        return self.used + self.tombstones
+
+    def check_load(self):
+        """grow, or drop tombstones, once the table is too full to probe well"""
+        limit = self.MAX_LOAD_FACTOR * self.size
+        if self.filled() > limit:
+            if self.used * 2 > limit:
+                self.double()
+            else:
+                self.compact()
+
+    def check_shrink(self):
+        """halve towards NUM_SLOTS while below MIN_LOAD_FACTOR"""
+        if self.MIN_LOAD_FACTOR is None or self.size <= self.NUM_SLOTS:
+            return
+        if self.used < self.MIN_LOAD_FACTOR * self.size:
+            # aim for half of the max load factor after shrinking
+            size = self.table_size(max(self.NUM_SLOTS,
+                                       2 * self.used / self.MAX_LOAD_FACTOR))
+            if size < self.size:
+                self.resize(size)
+
+    def uses_power_of_two(self):
+        name = getattr(self.hash_function, '__name__', None)
+        return name in HashFunction.MIXED_LOW_BITS
+
+    def table_size(self, minimum):
+        """smallest size >= minimum under the policy of the hash function"""
+        if self.uses_power_of_two():
+            return 1 << (int(minimum) - 1).bit_length()
+        return next_prime(minimum)
+
+    def __sizeof__(self):
+        """bytes held by the table itself, excluding keys & values"""
+        return object.__sizeof__(self) + sys.getsizeof(self.array) + sum(
+            sys.getsizeof(item) + sys.getsizeof(item.__dict__) +
+            sys.getsizeof(item.hash)
+            for item in filter(None, self.array))
+
+    def max_probe_length(self):
+        """longest distance any stored key sits from its home index"""
+        return max((item.distance for item in filter(None, self.array)),
+                   default=0)
+
+    def count_probes(self, key, key_hash):
+        """(found, slots examined) for a lookup of key"""
+        index = key_hash % self.size
+        probes = 1
+        while self.array[index] is not None:
+            stored_item = self.array[index]
+            if stored_item is not TOMBSTONE and \
+                    stored_item.hash == key_hash and stored_item.key == key:
+                return True, probes
+
+            index = self.increment_index(index)
+            probes += 1
+
+        return False, probes
+
+    def occupied_slots(self):
+        """per slot: does it continue a probe sequence"""
+        return [slot is not None for slot in self.array]
+
+    def longest_cluster(self):
+        """longest run of occupied slots, wrapping around the end"""
+        occupied = self.occupied_slots()
+        if all(occupied):
+            return len(occupied)
+
+        # rotate so the array starts on an empty slot: no run wraps around
+        start = occupied.index(False)
+        longest = run = 0
+        for slot in occupied[start:] + occupied[:start]:
+            run = run + 1 if slot else 0
+            longest = max(longest, run)
+        return longest
+
+    def load_factor(self):
+        return len(self) / self.size
+
+    def enable_stats(self, callback=None):
+        """start recording probe lengths & resizes, callback(event, payload)"""
+        self.disable_stats()
+        self.statistics = HashMapStats(self, callback)
+        self.statistics.attach()
+        return self.statistics
+
+    def disable_stats(self):
+        if self.statistics is not None:
+            self.statistics.detach()
+            del self.statistics
+
+    def stats(self):
+        """snapshot of the table layout, and of recorded stats if enabled"""
+        snapshot = {
+            'engine': self.__class__.__name__,
+            'size': self.size,
+            'used': len(self),
+            'load_factor': self.load_factor(),
+            'tombstones': self.tombstones,
+            'compactions': self.compactions,
+            'max_probe_length': self.max_probe_length(),
+            'longest_cluster': self.longest_cluster(),
+        }
+        if self.statistics is not None:
+            snapshot.update(self.statistics.snapshot())
+        return snapshot
+
+    def set_hash_function(self, hash_function):
+        """switch hash function (callable or HashFunction name) and rehash"""
+        if isinstance(hash_function, str):
+            hash_function = HashFunction.get(hash_function)
+        self.hash_function = hash_function
+        for item in filter(None, self.array):
+            item.hash = hash_function(item.key)
+        self.resize(self.table_size(self.size))
 
     def double(self):
         """double array size to make more space"""
-        new_hash_map = HashMap()
-        new_hash_map.size = self.size * 2
-        new_hash_map.array = [None for x in range(new_hash_map.size)]
-        for item in self:
-            new_hash_map[item] = self[item]
-
-        self.array = new_hash_map.array
-        self.size = new_hash_map.size
+        self.resize(self.table_size(self.size * 2))
+
+    def compact(self):
+        """rebuild array at the same size to drop all tombstones"""
+        self.resize(self.size)
+        self.compactions += 1
+
+    def resize(self, size):
+        """move all items into a fresh array of given size by cached hash"""
+        old_array = self.array
+        self.size = size
+        self.array = [None] * size
+        self.tombstones = 0
+        self.pop_cursor = None
+        for item in filter(None, old_array):
+            self.place(item)
+
+    def place(self, item):
+        """put an item known to be absent into the first empty slot"""
+        index = item.hash % self.size
+        item.distance = 0
+        while self.array[index] is not None:
+            index = self.increment_index(index)
+            item.distance += 1
+        self.array[index] = item
+
+
+class RobinHoodHashMap(HashMap):
+    """
+    same open addressing table, but insertion follows Robin Hood hashing:
+        - every slot records its distance from the home index
+        - an incoming key displaces any resident that is closer to home
+          ("richer") than the incoming key, which then continues probing
+        - a lookup stops as soon as its own distance exceeds the resident's,
+          since the key would have displaced that resident on insertion
+
+    keeps the variance of probe lengths (and the worst case) small,
+    even at high load factors
+
+    deletion uses backward shifting instead of tombstones: the items
+    following the deleted slot move one step closer to home
+    """
+    MAX_LOAD_FACTOR = 0.9  # short probes hold up at much higher load
+
+    def get_index(self, key, key_hash=None):
+        """returns slot of key, or the slot where a probe for key terminates"""
+        if key_hash is None:
+            key_hash = self.key_hash(key)
+        index = key_hash % self.size
+        distance = 0
+        while self.array[index] is not None:
+            stored_item = self.array[index]
+            if stored_item.distance < distance or \
+                    stored_item.hash == key_hash and stored_item.key == key:
+                break
+
+            index = self.increment_index(index)
+            distance += 1
+
+        return index
+
+    def insert(self, key, key_hash, value, replace=True):
+        """insert key, swapping places with richer residents along the way"""
+        index = self.get_index(key, key_hash)
+        stored_item = self.array[index]
+        if stored_item is not None and stored_item == key:
+            previous = stored_item.value
+            if replace:
+                stored_item.value = value
+            return previous
+
+        if self.VALIDATE_KEYS:
+            HashFunction.validate(key)
+        # the probe of get_index stopped where key belongs: carry on there
+        item = KeyValuePair(key, value, key_hash,
+                            (index - key_hash % self.size) % self.size)
+        self.displace(item, index)
+        self.used += 1
+        return MISSING
+
+    def count_probes(self, key, key_hash):
+        index = key_hash % self.size
+        distance = 0
+        while self.array[index] is not None:
+            stored_item = self.array[index]
+            if stored_item.hash == key_hash and stored_item.key == key:
+                return True, distance + 1
+            if stored_item.distance < distance:
+                break
+
+            index = self.increment_index(index)
+            distance += 1
+
+        return False, distance + 1
+
+    def place(self, item):
+        """robin hood insertion of an item known to be absent"""
+        item.distance = 0
+        self.displace(item, item.hash % self.size)
+
+    def displace(self, item, index):
+        """robin hood insertion, from slot index at item.distance"""
+        while self.array[index] is not None:
+            if self.array[index].distance < item.distance:
+                # rob the rich: take the slot, keep probing for the resident
+                self.array[index], item = item, self.array[index]
+
+            index = self.increment_index(index)
+            item.distance += 1
+
+        self.array[index] = item
+
+    def remove(self, key, key_hash, default=MISSING):
+        """backward-shift deletion: pull displaced successors one slot back"""
+        index = self.get_index(key, key_hash)
+        stored_item = self.array[index]
+        if stored_item is None or stored_item != key:
+            return default
+
+        next_index = self.increment_index(index)
+        while self.array[next_index] is not None \
+                and self.array[next_index].distance > 0:
+            self.array[index] = self.array[next_index]
+            self.array[index].distance -= 1
+            index, next_index = next_index, self.increment_index(next_index)
+
+        self.array[index] = None
+        self.used -= 1
+        self.check_shrink()
+        return stored_item.value
+
+
+class IncrementalHashMap(HashMap):
+    """
+    HashMap that resizes incrementally, as Redis dict rehashing does:
+        - resize only allocates the new array, old & new live side by side
+        - every operation migrates MIGRATION_BUDGET slots of the old array,
+          rounded up to the end of the current cluster so that no probe
+          chain is ever split between the two arrays
+        - lookups & deletes consult both arrays until migration finishes,
+          inserts only go to the new array
+
+    no single operation pays for rehashing the whole table
+    """
+    MIGRATION_BUDGET = 16  # old slots migrated per operation
+
+    def __init__(self, **kwargs):
+        self.old_array = None
+        self.old_size = 0
+        self.migrate_index = 0
+        self.migrated = 0
+        super(IncrementalHashMap, self).__init__(**kwargs)
+
+    @property
+    def migrating(self):
+        return self.old_array is not None
+
+    def get_old_index(self, key, key_hash):
+        """slot of key in the old array, or None"""
+        index = key_hash % self.old_size
+        while self.old_array[index] is not None:
+            if self.old_array[index] is not TOMBSTONE \
+                    and self.old_array[index].hash == key_hash \
+                    and self.old_array[index].key == key:
+                return index
+
+            index = (index + 1) % self.old_size
+
+        return None
+
+    def insert(self, key, key_hash, value, replace=True):
+        self.migrate()
+        if self.migrating:
+            index = self.get_old_index(key, key_hash)
+            if index is not None:
+                previous = self.old_array[index].value
+                if replace:
+                    self.old_array[index].value = value
+                return previous
+
+        return super(IncrementalHashMap, self).insert(
+            key, key_hash, value, replace)
+
+    def lookup(self, key, key_hash, default=MISSING):
+        self.migrate()
+        value = super(IncrementalHashMap, self).lookup(key, key_hash, MISSING)
+        if value is MISSING and self.migrating:
+            index = self.get_old_index(key, key_hash)
+            if index is not None:
+                return self.old_array[index].value
+
+        return default if value is MISSING else value
+
+    def remove(self, key, key_hash, default=MISSING):
+        self.migrate()
+        if self.migrating:
+            index = self.get_old_index(key, key_hash)
+            if index is not None:
+                value = self.old_array[index].value
+                # old array only shrinks, keep its probe chains intact
+                self.old_array[index] = TOMBSTONE
+                self.used -= 1
+                return value
+
+        return super(IncrementalHashMap, self).remove(key, key_hash, default)
+
+    def popitem(self):
+        self.finish_migration()
+        return super(IncrementalHashMap, self).popitem()
+
+    def clear(self):
+        self.old_array = None
+        self.old_size = 0
+        super(IncrementalHashMap, self).clear()
+
+    def __iter__(self):
+        for key in super(IncrementalHashMap, self).__iter__():
+            yield key
+        if self.migrating:
+            for item in filter(None, self.old_array):
+                yield item.key
+
+    def iteritems(self):
+        for item in super(IncrementalHashMap, self).iteritems():
+            yield item
+        if self.migrating:
+            for item in filter(None, self.old_array):
+                yield item.key, item.value
+
+    def set_hash_function(self, hash_function):
+        """old array is laid out by the old hashes: finish it first"""
+        self.finish_migration()
+        super(IncrementalHashMap, self).set_hash_function(hash_function)
+        self.finish_migration()
+
+    def resize(self, size):
+        """swap in an empty array of given size, items follow in migrate"""
+        self.finish_migration()
+        self.old_array = self.array
+        self.old_size = self.size
+        # start right after an empty slot: clusters never straddle it
+        self.migrate_index = self.old_array.index(None)
+        self.migrated = 0
+        self.size = size
+        self.array = [None] * size
+        self.tombstones = 0
+        self.pop_cursor = None
+
+    def migrate(self, budget=None):
+        """move at least `budget` old slots, stopping after an empty one"""
+        if not self.migrating:
+            return
+
+        budget = self.MIGRATION_BUDGET if budget is None else budget
+        moved = 0
+        while self.migrated < self.old_size:
+            item = self.old_array[self.migrate_index]
+            self.old_array[self.migrate_index] = None
+            if item:
+                self.place(item)
+
+            self.migrate_index = (self.migrate_index + 1) % self.old_size
+            self.migrated += 1
+            moved += 1
+            if moved >= budget and item is None:
+                return
+
+        self.old_array = None
+        self.old_size = 0
+
+    def finish_migration(self):
+        self.migrate(budget=self.old_size)
+
+    def dump(self, target):
+        """snapshots hold a single table: finish any migration first"""
+        self.finish_migration()
+        super(IncrementalHashMap, self).dump(target)
+
+
+class HashMapValuesView(ValuesView):
+    """values straight from the slots, without a lookup per key"""
+
+    def __iter__(self):
+        for key, value in self._mapping.iteritems():
+            yield value
+
+
+class HashMapItemsView(ItemsView):
+    """(key, value) pairs straight from the slots, without a lookup per key"""
+
+    def __iter__(self):
+        return self._mapping.iteritems()
@@ -0,0 +1,94 @@
+import pickle
+from multiprocessing.shared_memory import SharedMemory
+from disk import DiskHashMap
+from utils import HashFunction, MISSING
+
+
+class SharedHashMap(DiskHashMap):
+    """
+    read-only HashMap in multiprocessing.shared_memory, for worker pools
+
+    1. freeze(mapping) lays a built map out in a new shared memory block,
+       in the DiskHashMap format: fixed-width slots into a key/value heap
+
+    2. SharedHashMap(name) attaches to that block from any process and
+       probes it in place with DiskHashMap.get_index: nothing is copied,
+       so every additional worker costs a few pages of slots at most
+
+    3. the table is immutable, writes raise TypeError
+
+    the process that froze the map calls unlink() once no worker needs it
+    """
+
+    def __init__(self, name):
+        self.path = name
+        self.readonly = True
+        self.attach(self.shared_memory_block(name))
+        self.read_header()
+
+    @staticmethod
+    def shared_memory_block(name):
+        try:
+            # python 3.13+: only the creator's resource tracker owns the block
+            return SharedMemory(name=name, track=False)
+        except TypeError:
+            return SharedMemory(name=name)
+
+    def attach(self, shared_memory):
+        self.shared_memory = shared_memory
+        self.name = shared_memory.name
+        self.mmap = shared_memory.buf  # DiskHashMap reads any buffer
+
+    @classmethod
+    def freeze(cls, mapping, name=None, hash_function=None):
+        """copy a mapping into a new shared memory block, sized to its keys"""
+        hash_function = hash_function or getattr(
+            mapping, 'hash_function', cls.HASH_FUNCTION)
+        if not isinstance(hash_function, str):
+            hash_function = hash_function.__name__
+        keys, records = [], []
+        for key, value in mapping.items():
+            keys.append(key)
+            records.append((cls.encode_key(key),
+                            pickle.dumps(value, pickle.HIGHEST_PROTOCOL)))
+        size = cls.table_size(
+            max(cls.NUM_SLOTS, len(records) / cls.MAX_LOAD_FACTOR + 1),
+            hash_function)
+        heap_size = sum(cls.RECORD.size + len(data) + len(payload)
+                        for data, payload in records)
+        shared_memory = SharedMemory(
+            name=name, create=True, size=cls.heap_start(size) + heap_size)
+        hash_map = cls.__new__(cls)
+        hash_map.path = shared_memory.name
+        hash_map.readonly = True
+        hash_map.attach(shared_memory)
+        hash_map.hash_function = HashFunction.get(hash_function)
+        hash_map.size = size
+        hash_map.used = len(records)
+        hash_map.tombstones = 0
+        hash_map.heap_end = cls.heap_start(size)
+        hash_map.dead = 0
+        # new blocks are zero-filled: every slot starts out EMPTY
+        key_hashes = HashFunction.many(hash_map.hash_function, keys)
+        for key_hash, (data, payload) in zip(key_hashes, records):
+            hash_map.place(key_hash & HashFunction.MASK_64,
+                           hash_map.write_record(data, payload))
+        hash_map.write_header()
+        return hash_map
+
+    def insert(self, key, key_hash, value, replace=True):
+        raise TypeError('SharedHashMap is read-only')
+
+    def remove(self, key, key_hash, default=MISSING):
+        raise TypeError('SharedHashMap is read-only')
+
+    def rebuild(self, minimum, hash_function=None):
+        raise TypeError('SharedHashMap is read-only')
+
+    def close(self):
+        """detach this process, the block lives on until unlink()"""
+        self.mmap = None
+        self.shared_memory.close()
+
+    def unlink(self):
+        self.shared_memory.unlink()
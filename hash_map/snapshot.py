@@ -0,0 +1,184 @@
+import pickle
+import struct
+from utils import HashFunction, KeyValuePair, TOMBSTONE
+
+
+class Snapshot(object):
+    """
+    binary dump of a hash map table, restored without rehashing
+
+    1. header: MAGIC, VERSION, layout id (index in LAYOUTS), hash function
+       id (index in HashFunction.FUNCTIONS), size, used
+
+    2. chunks of up to CHUNK entries: byte length, then one pickled tuple
+       of columns (pickle handles whole lists of str & int in C)
+        - 'slots' (HashMap & its probing variants): occupied slots in slot
+          order, as slot indices, cached hashes, keys, values & tombstone
+          indices
+        - 'dense' (CompactHashMap): live dense entries in insertion order,
+          as cached hashes, keys & values
+        - 'swiss' (SwissHashMap): first slot & control bytes of a run of
+          slots, then cached hashes, keys & values of its full slots
+
+    3. chunks stream through a buffered file one at a time, so neither
+       dump nor load ever holds the whole snapshot in memory
+
+    loading puts every item straight back into its slot (or rebuilds the
+    index from the cached hashes): no hashing and no key validation,
+    whatever VALIDATE_KEYS says. a snapshot loads into any class of the
+    same SNAPSHOT_LAYOUT
+    """
+    MAGIC = b'YCHS'
+    VERSION = 2
+    HEADER = struct.Struct('<4sHHHQQ')
+    CHUNK_HEADER = struct.Struct('<Q')
+    CHUNK = 4096
+    BUFFER_SIZE = 1 << 20
+    LAYOUTS = ('slots', 'dense', 'swiss')
+
+    @classmethod
+    def open(cls, target, mode):
+        """(file, whether we opened it) for a path or a binary file object"""
+        if hasattr(target, 'read' if mode == 'rb' else 'write'):
+            return target, False
+        return open(target, mode, buffering=cls.BUFFER_SIZE), True
+
+    @classmethod
+    def dump(cls, hash_map, target):
+        name = getattr(hash_map.hash_function, '__name__', None)
+        if name not in HashFunction.FUNCTIONS:
+            raise ValueError('only HashFunction members can be snapshotted')
+
+        layout = hash_map.SNAPSHOT_LAYOUT
+        output, opened = cls.open(target, 'wb')
+        try:
+            output.write(cls.HEADER.pack(
+                cls.MAGIC, cls.VERSION, cls.LAYOUTS.index(layout),
+                HashFunction.FUNCTIONS.index(name), hash_map.size,
+                len(hash_map)))
+            for chunk in getattr(cls, layout + '_chunks')(hash_map):
+                data = pickle.dumps(chunk, pickle.HIGHEST_PROTOCOL)
+                output.write(cls.CHUNK_HEADER.pack(len(data)) + data)
+        finally:
+            if opened:
+                output.close()
+
+    @classmethod
+    def slots_chunks(cls, hash_map):
+        array = hash_map.array
+        for start in range(0, len(array), cls.CHUNK):
+            chunk = ([], [], [], [], [])
+            indices, hashes, keys, values, tombstones = chunk
+            for index in range(start, min(start + cls.CHUNK, len(array))):
+                item = array[index]
+                if item:
+                    indices.append(index)
+                    hashes.append(item.hash)
+                    keys.append(item.key)
+                    values.append(item.value)
+                elif item is TOMBSTONE:
+                    tombstones.append(index)
+            if indices or tombstones:
+                yield chunk
+
+    @classmethod
+    def dense_chunks(cls, hash_map):
+        keys, values = hash_map.dense_keys, hash_map.dense_values
+        hashes = hash_map.dense_hashes
+        for start in range(0, len(keys), cls.CHUNK):
+            live = [entry for entry in range(
+                start, min(start + cls.CHUNK, len(keys)))
+                if keys[entry] is not TOMBSTONE]
+            if live:
+                yield ([hashes[entry] for entry in live],
+                       [keys[entry] for entry in live],
+                       [values[entry] for entry in live])
+
+    @classmethod
+    def swiss_chunks(cls, hash_map):
+        control, empty = hash_map.control, hash_map.EMPTY
+        for start in range(0, len(control), cls.CHUNK):
+            full = [index for index in range(
+                start, min(start + cls.CHUNK, len(control)))
+                if control[index] < empty]
+            control_bytes = bytes(control[start:start + cls.CHUNK])
+            if control_bytes.count(empty) < len(control_bytes):
+                yield (start, control_bytes,
+                       [hash_map.slot_hashes[index] for index in full],
+                       [hash_map.slot_keys[index] for index in full],
+                       [hash_map.slot_values[index] for index in full])
+
+    @classmethod
+    def load(cls, hash_map_class, source):
+        source, opened = cls.open(source, 'rb')
+        try:
+            header = source.read(cls.HEADER.size)
+            if len(header) < cls.HEADER.size:
+                raise ValueError('not a hash map snapshot')
+            magic, version, layout_id, function_id, size, used = \
+                cls.HEADER.unpack(header)
+            if magic != cls.MAGIC or version != cls.VERSION:
+                raise ValueError('not a hash map snapshot')
+            layout = cls.LAYOUTS[layout_id]
+            if layout != hash_map_class.SNAPSHOT_LAYOUT:
+                raise ValueError('%s cannot load a snapshot of %s layout' %
+                                 (hash_map_class.__name__, layout))
+
+            hash_map = hash_map_class()
+            hash_map.hash_function = HashFunction.get(
+                HashFunction.FUNCTIONS[function_id])
+            getattr(cls, 'restore_' + layout)(
+                hash_map, size, used, cls.chunks(source))
+            return hash_map
+        finally:
+            if opened:
+                source.close()
+
+    @classmethod
+    def chunks(cls, source):
+        """unpickled chunks, up to the end of source"""
+        chunk_header = source.read(cls.CHUNK_HEADER.size)
+        while chunk_header:
+            length, = cls.CHUNK_HEADER.unpack(chunk_header)
+            yield pickle.loads(source.read(length))
+            chunk_header = source.read(cls.CHUNK_HEADER.size)
+
+    @staticmethod
+    def restore_slots(hash_map, size, used, chunks):
+        hash_map.size = size
+        hash_map.array = array = [None] * size
+        hash_map.tombstones = 0
+        item_class = KeyValuePair
+        for indices, hashes, keys, values, tombstones in chunks:
+            for index, key_hash, key, value in \
+                    zip(indices, hashes, keys, values):
+                array[index] = item_class(key, value, key_hash,
+                                          (index - key_hash % size) % size)
+            for index in tombstones:
+                array[index] = TOMBSTONE
+            hash_map.tombstones += len(tombstones)
+        hash_map.used = used
+
+    @staticmethod
+    def restore_dense(hash_map, size, used, chunks):
+        for hashes, keys, values in chunks:
+            hash_map.dense_hashes.extend(hashes)
+            hash_map.dense_keys.extend(keys)
+            hash_map.dense_values.extend(values)
+        hash_map.used = used
+        hash_map.resize(size)
+
+    @staticmethod
+    def restore_swiss(hash_map, size, used, chunks):
+        hash_map.new_table(size)
+        control, empty = hash_map.control, hash_map.EMPTY
+        for start, control_bytes, hashes, keys, values in chunks:
+            control[start:start + len(control_bytes)] = control_bytes
+            full = [start + offset for offset, byte in enumerate(control_bytes)
+                    if byte < empty]
+            for index, key_hash, key, value in zip(full, hashes, keys, values):
+                hash_map.slot_hashes[index] = key_hash
+                hash_map.slot_keys[index] = key
+                hash_map.slot_values[index] = value
+        hash_map.used = used
+        hash_map.tombstones = control.count(hash_map.DELETED)
@@ -0,0 +1,91 @@
+from collections import Counter
+from timeit import default_timer
+
+
+class HashMapStats(object):
+    """
+    opt-in instrumentation of a single hash map instance
+
+    attaching shadows the instance's insert / lookup / remove / resize with
+    recording wrappers, detaching removes them again: a map without stats
+    runs the plain class methods, at no cost at all
+
+    1. probe lengths: slots examined per operation, as separate histograms
+       for hits & misses (an insert of a new key is a miss)
+
+    2. resizes: count, total & worst duration
+
+    3. callbacks: called with (event, payload) on every resize, e.g. to
+       export numbers; snapshot() returns everything recorded so far
+    """
+    PROBING = ('insert', 'lookup', 'remove')
+
+    def __init__(self, hash_map, callback=None):
+        self.hash_map = hash_map
+        self.callbacks = [] if callback is None else [callback]
+        self.hits = Counter()
+        self.misses = Counter()
+        self.resizes = 0
+        self.resize_seconds = 0.0
+        self.max_resize_seconds = 0.0
+
+    def attach(self):
+        for name in self.PROBING:
+            setattr(self.hash_map, name,
+                    self.probing(getattr(self.hash_map, name)))
+        self.hash_map.resize = self.timing(self.hash_map.resize)
+
+    def detach(self):
+        for name in self.PROBING + ('resize',):
+            self.hash_map.__dict__.pop(name, None)
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+
+    def emit(self, event, payload):
+        for callback in self.callbacks:
+            callback(event, payload)
+
+    def probing(self, method):
+        """record the probe length of every operation before running it"""
+        def wrapper(key, key_hash, *args, **kwargs):
+            found, probes = self.hash_map.count_probes(key, key_hash)
+            (self.hits if found else self.misses)[probes] += 1
+            return method(key, key_hash, *args, **kwargs)
+        return wrapper
+
+    def timing(self, method):
+        def wrapper(size):
+            old_size = self.hash_map.size
+            start = default_timer()
+            method(size)
+            seconds = default_timer() - start
+            self.resizes += 1
+            self.resize_seconds += seconds
+            self.max_resize_seconds = max(self.max_resize_seconds, seconds)
+            self.emit('resize', {
+                'old_size': old_size,
+                'size': size,
+                'used': len(self.hash_map),
+                'seconds': seconds,
+            })
+        return wrapper
+
+    @staticmethod
+    def mean(histogram):
+        total = sum(histogram.values())
+        if not total:
+            return 0.0
+        return sum(probes * count for probes, count in histogram.items()) \
+            / total
+
+    def snapshot(self):
+        return {
+            'hits': dict(self.hits),
+            'misses': dict(self.misses),
+            'mean_hit_probes': self.mean(self.hits),
+            'mean_miss_probes': self.mean(self.misses),
+            'resizes': self.resizes,
+            'resize_seconds': self.resize_seconds,
+            'max_resize_seconds': self.max_resize_seconds,
+        }
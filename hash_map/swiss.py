@@ -0,0 +1,307 @@
+import sys
+from array import array
+from hash_map import HashMap
+from utils import HashFunction, MISSING, numpy
+
+
+class SwissHashMap(HashMap):
+    """
+    SwissTable layout: slots in groups of GROUP_SIZE, one control byte each
+
+    1. the 64-bit hash splits in two
+        - fibonacci-mixed high bits pick the home group (power-of-two count)
+        - the low 7 bits are the fingerprint stored in the slot's control
+          byte; EMPTY (0x80) & DELETED (0xfe) have the high bit set
+
+    2. a probe visits whole groups in triangular order, and scans the 16
+       control bytes of a group with one C-level search (bytearray.find)
+        - full keys are only compared on fingerprint & cached hash match
+        - a probe ends at the first group that still has an EMPTY slot
+
+    3. deletion empties a slot if its group has an EMPTY slot (no probe
+       ever continued past it), else leaves DELETED
+
+    4. get_many resolves a whole batch at once with NumPy, when installed:
+       the control bytes are viewed as a (groups x 16) uint8 matrix, and
+       each round compares the current group of every pending key against
+       its fingerprint in one vectorized operation
+
+    keys, values & hashes live in parallel per-slot columns, as in
+    CompactHashMap; the control bytes are a bytearray shared with NumPy.
+    snapshots copy the control bytes & columns as they are, DELETED
+    slots included
+    """
+    GROUP_SIZE = 16
+    EMPTY = 0x80
+    DELETED = 0xfe
+    FINGERPRINT_MASK = 0x7f
+    GROUP_MULTIPLIER = 0x9e3779b97f4a7c15  # fibonacci hashing
+    MAX_LOAD_FACTOR = 0.875
+    NUMPY_BATCH = HashFunction.NUMPY_BATCH
+    SNAPSHOT_LAYOUT = 'swiss'
+
+    def __init__(self, **kwargs):
+        self.hash_function = self.HASH_FUNCTION
+        self.tombstones = 0
+        self.compactions = 0
+        self.new_table(self.table_size(self.NUM_SLOTS))
+        for key in kwargs:
+            self.__setitem__(key, kwargs[key])
+
+    def new_table(self, size):
+        self.size = size
+        self.num_groups = size // self.GROUP_SIZE
+        self.group_shift = 64 - (self.num_groups.bit_length() - 1)
+        self.control = bytearray([self.EMPTY]) * size
+        self.slot_keys = [None] * size
+        self.slot_values = [None] * size
+        self.slot_hashes = array('Q', bytes(8 * size))
+        self.used = 0
+        self.tombstones = 0
+        self.pop_cursor = None
+
+    def table_size(self, minimum):
+        """power-of-two number of whole groups"""
+        groups = -(-int(minimum) // self.GROUP_SIZE)
+        return self.GROUP_SIZE << max(0, groups - 1).bit_length()
+
+    def key_hash(self, key):
+        return self.hash_function(key) & HashFunction.MASK_64
+
+    def key_hashes(self, keys):
+        return [key_hash & HashFunction.MASK_64 for key_hash in
+                super(SwissHashMap, self).key_hashes(keys)]
+
+    def home_group(self, key_hash):
+        if self.num_groups == 1:
+            return 0
+        return ((key_hash * self.GROUP_MULTIPLIER) & HashFunction.MASK_64) \
+            >> self.group_shift
+
+    def home_index(self, key):
+        """first slot of the home group"""
+        return self.home_group(self.key_hash(key)) * self.GROUP_SIZE
+
+    def get_index(self, key, key_hash=None):
+        """returns slot of key, else the first free slot along its probe"""
+        if key_hash is None:
+            key_hash = self.key_hash(key)
+        fingerprint = key_hash & self.FINGERPRINT_MASK
+        control, group_size = self.control, self.GROUP_SIZE
+        group = self.home_group(key_hash)
+        free = None
+        step = 0
+        while True:
+            start = group * group_size
+            end = start + group_size
+            index = control.find(fingerprint, start, end)
+            while index != -1:
+                if self.slot_hashes[index] == key_hash and \
+                        self.slot_keys[index] == key:
+                    return index
+                index = control.find(fingerprint, index + 1, end)
+
+            empty = control.find(self.EMPTY, start, end)
+            if free is None:
+                deleted = control.find(self.DELETED, start, end)
+                if deleted != -1 and (empty == -1 or deleted < empty):
+                    free = deleted
+                elif empty != -1:
+                    free = empty
+            if empty != -1:
+                return free
+
+            step += 1
+            group = (group + step) % self.num_groups
+
+    def insert(self, key, key_hash, value, replace=True):
+        index = self.get_index(key, key_hash)
+        if self.control[index] < self.EMPTY:
+            previous = self.slot_values[index]
+            if replace:
+                self.slot_values[index] = value
+            return previous
+
+        if self.VALIDATE_KEYS:
+            HashFunction.validate(key)
+        if self.control[index] == self.DELETED:
+            self.tombstones -= 1
+        self.control[index] = key_hash & self.FINGERPRINT_MASK
+        self.slot_keys[index] = key
+        self.slot_values[index] = value
+        self.slot_hashes[index] = key_hash
+        self.used += 1
+        return MISSING
+
+    def lookup(self, key, key_hash, default=MISSING):
+        index = self.get_index(key, key_hash)
+        if self.control[index] >= self.EMPTY:
+            return default
+
+        return self.slot_values[index]
+
+    def get_many(self, keys, default=None):
+        """batch lookup, vectorized over the batch with NumPy if installed"""
+        keys = list(keys)
+        if numpy is None or len(keys) < self.NUMPY_BATCH:
+            return super(SwissHashMap, self).get_many(keys, default)
+
+        key_hashes = numpy.array(self.key_hashes(keys), dtype=numpy.uint64)
+        fingerprints = (key_hashes & numpy.uint64(self.FINGERPRINT_MASK)) \
+            .astype(numpy.uint8)
+        if self.num_groups == 1:
+            groups = numpy.zeros(len(keys), dtype=numpy.int64)
+        else:
+            # uint64 arithmetic wraps around, i.e. is reduced mod 2^64
+            groups = ((key_hashes * numpy.uint64(self.GROUP_MULTIPLIER))
+                      >> numpy.uint64(self.group_shift)).astype(numpy.int64)
+        control = numpy.frombuffer(self.control, dtype=numpy.uint8) \
+            .reshape(self.num_groups, self.GROUP_SIZE)
+        slot_hashes = numpy.frombuffer(self.slot_hashes, dtype=numpy.uint64)
+
+        results = [default] * len(keys)
+        pending = numpy.arange(len(keys))
+        step = 0
+        while len(pending):
+            blocks = control[groups[pending]]
+            rows, columns = numpy.nonzero(
+                blocks == fingerprints[pending, None])
+            slots = groups[pending[rows]] * self.GROUP_SIZE + columns
+            hits = slot_hashes[slots] == key_hashes[pending[rows]]
+            found = numpy.zeros(len(pending), dtype=bool)
+            for row, slot in zip(rows[hits].tolist(), slots[hits].tolist()):
+                key = pending[row]
+                if self.slot_keys[slot] == keys[key]:
+                    results[key] = self.slot_values[slot]
+                    found[row] = True
+
+            # misses stop at a group with an EMPTY slot, the rest probe on
+            more = ~found & ~(blocks == self.EMPTY).any(axis=1)
+            pending = pending[more]
+            step += 1
+            groups[pending] = (groups[pending] + step) % self.num_groups
+        return results
+
+    def remove(self, key, key_hash, default=MISSING):
+        index = self.get_index(key, key_hash)
+        if self.control[index] >= self.EMPTY:
+            return default
+
+        value = self.slot_values[index]
+        start = index - index % self.GROUP_SIZE
+        if self.control.find(self.EMPTY, start,
+                             start + self.GROUP_SIZE) != -1:
+            self.control[index] = self.EMPTY
+        else:
+            self.control[index] = self.DELETED
+            self.tombstones += 1
+        self.slot_keys[index] = self.slot_values[index] = None
+        self.used -= 1
+        if self.tombstones > self.TOMBSTONE_THRESHOLD * self.size:
+            self.compact()
+        self.check_shrink()
+        return value
+
+    def popitem(self):
+        for index in self.popitem_indices(self.size):
+            if self.control[index] < self.EMPTY:
+                key, value = self.slot_keys[index], self.slot_values[index]
+                self.pop_cursor = index + 1
+                self.remove(key, self.slot_hashes[index])
+                return key, value
+
+        raise KeyError('popitem(): hash map is empty')
+
+    def clear(self):
+        self.new_table(self.table_size(self.NUM_SLOTS))
+
+    def __iter__(self):
+        for key, value in self.iteritems():
+            yield key
+
+    def iteritems(self):
+        for index, byte in enumerate(self.control):
+            if byte < self.EMPTY:
+                yield self.slot_keys[index], self.slot_values[index]
+
+    def __len__(self):
+        return self.used
+
+    def __sizeof__(self):
+        """bytes held by the table itself, excluding keys & values"""
+        return object.__sizeof__(self) + sum(
+            sys.getsizeof(column) for column in (
+                self.control, self.slot_keys, self.slot_values,
+                self.slot_hashes))
+
+    def probe_groups(self, key_hash):
+        """groups along the probe sequence of a hash"""
+        group = self.home_group(key_hash)
+        step = 0
+        while True:
+            yield group
+            step += 1
+            group = (group + step) % self.num_groups
+
+    def max_probe_length(self):
+        """most groups any stored key sits past its home group"""
+        longest = 0
+        for index, byte in enumerate(self.control):
+            if byte < self.EMPTY:
+                target = index // self.GROUP_SIZE
+                for distance, group in enumerate(
+                        self.probe_groups(self.slot_hashes[index])):
+                    if group == target:
+                        longest = max(longest, distance)
+                        break
+        return longest
+
+    def count_probes(self, key, key_hash):
+        """(found, groups examined) for a lookup of key"""
+        index = self.get_index(key, key_hash)
+        found = self.control[index] < self.EMPTY
+        target = index // self.GROUP_SIZE
+        for probes, group in enumerate(self.probe_groups(key_hash), 1):
+            if group == target:
+                if found:
+                    return True, probes
+                break
+
+        # a miss probes on to the first group with an EMPTY slot
+        for probes, group in enumerate(self.probe_groups(key_hash), 1):
+            start = group * self.GROUP_SIZE
+            if self.control.find(self.EMPTY, start,
+                                 start + self.GROUP_SIZE) != -1:
+                return False, probes
+
+    def occupied_slots(self):
+        return [byte != self.EMPTY for byte in self.control]
+
+    def set_hash_function(self, hash_function):
+        if isinstance(hash_function, str):
+            hash_function = HashFunction.get(hash_function)
+        self.hash_function = hash_function
+        for index, byte in enumerate(self.control):
+            if byte < self.EMPTY:
+                self.slot_hashes[index] = self.key_hash(self.slot_keys[index])
+        self.resize(self.size)
+
+    def resize(self, size):
+        """place every entry into a fresh table by cached hash"""
+        entries = [(self.slot_keys[index], self.slot_values[index],
+                    self.slot_hashes[index])
+                   for index, byte in enumerate(self.control)
+                   if byte < self.EMPTY]
+        self.new_table(size)
+        for key, value, key_hash in entries:
+            for group in self.probe_groups(key_hash):
+                start = group * self.GROUP_SIZE
+                index = self.control.find(self.EMPTY, start,
+                                          start + self.GROUP_SIZE)
+                if index != -1:
+                    break
+            self.control[index] = key_hash & self.FINGERPRINT_MASK
+            self.slot_keys[index] = key
+            self.slot_values[index] = value
+            self.slot_hashes[index] = key_hash
+        self.used = len(entries)
@@ -1,8 +1,22 @@
 import string
+import io
 import random
+import os
+import sys
+import tempfile
+import threading
+from collections.abc import MutableMapping
 from unittest import TestCase
-from utils import KeyValuePair, HashFunction
-from hash_map import HashMap
+from unittest import skipIf
+from utils import KeyValuePair, HashFunction, numpy
+from hash_map import HashMap, RobinHoodHashMap, IncrementalHashMap
+from compact import CompactHashMap
+from concurrent_map import ConcurrentHashMap
+from cache import LRUCache, LFUCache
+from disk import DiskHashMap
+from shared import SharedHashMap
+from swiss import SwissHashMap
+from benchmarks import WorkloadBenchmark
 
 
 class HashMapTestCase(TestCase):
@@ -34,7 +48,19 @@ class HashMapTestCase(TestCase):
         self.assertEqual(hash_map['test'], 'this')
 
     def test_index(self):
-        self.assertEqual(self.hash_map.get_index('test'), 6)
+        self.assertEqual(self.hash_map.get_index('test'), 22)
+
+    def test_set_hash_function(self):
+        """per-instance hash function, existing items are rehashed"""
+        hash_map = HashMap(test='this', other='that')
+        hash_map.set_hash_function('base_alphabet')
+        self.assertEqual(hash_map.get_index('test'), 102)
+        self.assertEqual(hash_map['test'], 'this')
+        self.assertEqual(hash_map['other'], 'that')
+        self.assertIs(HashMap().hash_function, HashMap.HASH_FUNCTION)
+        hash_map.set_hash_function(HashFunction.xxmix)
+        self.assertEqual(hash_map['test'], 'this')
+        self.assertRaises(KeyError, hash_map.set_hash_function, 'md5')
 
     def test_len(self):
         hash_map = HashMap()
@@ -48,6 +74,50 @@ class HashMapTestCase(TestCase):
         del hash_map['test']
         self.assertEqual(len(hash_map), 0)
 
+    def test__delete__missing(self):
+        hash_map = HashMap(test='this')
+        self.assertRaises(KeyError, hash_map.__delitem__, 'not_test')
+        self.assertEqual(len(hash_map), 1)
+
+    def test__delete__keeps_probe_chain(self):
+        """deleting from the middle of a cluster leaves later keys reachable"""
+        hash_map = HashMap()
+        keys = [str(x) for x in range(100)]
+        for key in keys:
+            hash_map[key] = key
+        for key in keys[::2]:
+            del hash_map[key]
+        self.assertEqual(len(hash_map), 50)
+        for key in keys[1::2]:
+            self.assertEqual(hash_map[key], key)
+        for key in keys[::2]:
+            self.assertNotIn(key, hash_map)
+
+    def test_tombstones(self):
+        """tombstones are counted, reused, and compacted past the threshold"""
+        hash_map = HashMap()
+        hash_map.TOMBSTONE_THRESHOLD = 0.05
+        keys = [str(x) for x in range(100)]
+        for key in keys:
+            hash_map[key] = key
+        # a key in the middle of a cluster must leave a tombstone behind
+        key = next(key for key in keys if hash_map.array[
+            hash_map.increment_index(hash_map.get_index(key))] is not None)
+        del hash_map[key]
+        self.assertEqual(hash_map.tombstones, 1)
+        hash_map[key] = 'again'
+        self.assertEqual(hash_map.tombstones, 0)
+        self.assertEqual(hash_map[key], 'again')
+
+        for key in keys[:40]:
+            del hash_map[key]
+        self.assertGreater(hash_map.compactions, 0)
+        self.assertLessEqual(hash_map.tombstones,
+                             hash_map.TOMBSTONE_THRESHOLD * hash_map.size)
+        self.assertEqual(len(hash_map), 60)
+        for key in keys[40:]:
+            self.assertIn(key, hash_map)
+
     def test__double__(self):
         hash_map = HashMap(test='this')
         self.assertEqual(hash_map.size, hash_map.NUM_SLOTS)
@@ -56,6 +126,202 @@ class HashMapTestCase(TestCase):
         hash_map.double()
         self.assertEqual(hash_map.size, hash_map.NUM_SLOTS * 4)
 
+    def test_cached_hash(self):
+        """items keep their full hash, resizing never calls the hash function"""
+        calls = []
+
+        def counting_hash(key):
+            calls.append(key)
+            return HashFunction.fnv1a(key)
+
+        hash_map = HashMap()
+        hash_map.set_hash_function(counting_hash)
+        for test in range(50):
+            hash_map[str(test)] = test
+        for item in filter(None, hash_map.array):
+            self.assertEqual(item.hash, HashFunction.fnv1a(item.key))
+
+        del calls[:]
+        hash_map.double()
+        hash_map.compact()
+        self.assertEqual(calls, [])
+        for test in range(50):
+            self.assertEqual(hash_map[str(test)], test)
+
+    def test_len_is_tracked(self):
+        """len never scans the table"""
+        hash_map = HashMap()
+        hash_map.array = None
+        self.assertEqual(len(hash_map), 0)
+
+    def test_sizing_policy(self):
+        """power-of-two sizes for well mixed hashes, primes otherwise"""
+        hash_map = HashMap()
+        self.assertEqual(hash_map.size, 128)
+        hash_map.set_hash_function('base_alphabet')
+        self.assertEqual(hash_map.size, 131)
+        hash_map.double()
+        self.assertEqual(hash_map.size, 263)
+        hash_map.set_hash_function('xxmix')
+        self.assertEqual(hash_map.size, 512)
+
+    def test_max_load_factor(self):
+        hash_map = HashMap()
+        hash_map.MAX_LOAD_FACTOR = 0.5
+        for test in range(65):
+            hash_map[str(test)] = test
+        self.assertEqual(hash_map.size, 256)
+        self.assertLessEqual(len(hash_map), hash_map.MAX_LOAD_FACTOR * hash_map.size)
+
+    def test_shrink(self):
+        """optional shrinking once the map empties out"""
+        hash_map = HashMap()
+        for test in range(1000):
+            hash_map[str(test)] = test
+        grown = hash_map.size
+        for test in range(990):
+            del hash_map[str(test)]
+        self.assertEqual(hash_map.size, grown)
+
+        hash_map.MIN_LOAD_FACTOR = 0.1
+        del hash_map['990']
+        self.assertEqual(hash_map.size, hash_map.NUM_SLOTS)
+        self.assertEqual(len(hash_map), 9)
+        for test in range(991, 1000):
+            self.assertEqual(hash_map[str(test)], test)
+
+    def test_from_items(self):
+        """presized once: no intermediate doubling"""
+        items = [(str(test), test) for test in range(1000)]
+        hash_map = HashMap.from_items(items)
+        self.assertEqual(len(hash_map), 1000)
+        self.assertEqual(hash_map.size, 2048)
+        self.assertEqual(hash_map['999'], 999)
+        hash_map = HashMap.from_items({'test': 'this'}, expected_size=10000)
+        self.assertEqual(hash_map['test'], 'this')
+        self.assertEqual(hash_map.size, 16384)
+
+    def test_bulk_operations(self):
+        """batch get/set on every engine"""
+        for layout in (HashMap, RobinHoodHashMap, IncrementalHashMap,
+                       CompactHashMap):
+            hash_map = layout(test='this')
+            hash_map.set_many((str(test), test) for test in range(300))
+            hash_map.update({'test': 'that'}, other='value')
+            self.assertEqual(len(hash_map), 302)
+            self.assertEqual(
+                hash_map.get_many(['test', 'other', '299', 'missing']),
+                ['that', 'value', 299, None])
+            self.assertEqual(hash_map.get_many(['missing'], default=0), [0])
+
+    def test_popitem_drain(self):
+        """popitem resumes from its last slot, and still finds later inserts"""
+        for layout in (HashMap, RobinHoodHashMap, IncrementalHashMap):
+            hash_map = layout.from_items((str(test), test) for test in range(500))
+            expected = dict(hash_map.items())
+            for test in range(400):
+                key, value = hash_map.popitem()
+                self.assertEqual(expected.pop(key), value)
+                if test % 7 == 0:
+                    hash_map[str(-test)] = expected[str(-test)] = test
+            self.assertEqual(dict(hash_map.items()), expected)
+            while hash_map:
+                key, value = hash_map.popitem()
+                self.assertEqual(expected.pop(key), value)
+            self.assertEqual(expected, {})
+            self.assertRaises(KeyError, hash_map.popitem)
+
+    def test_mutable_mapping(self):
+        hash_map = HashMap(test='this', other='that')
+        self.assertIsInstance(hash_map, MutableMapping)
+        self.assertEqual(hash_map.get('test'), 'this')
+        self.assertIsNone(hash_map.get('missing'))
+        self.assertEqual(hash_map.setdefault('test', 'new'), 'this')
+        self.assertEqual(hash_map.setdefault('new', 'value'), 'value')
+        self.assertEqual(hash_map.pop('new'), 'value')
+        self.assertEqual(hash_map.pop('new', None), None)
+        self.assertRaises(KeyError, hash_map.pop, 'new')
+        self.assertEqual(sorted(hash_map.keys()), ['other', 'test'])
+        self.assertEqual(sorted(hash_map.values()), ['that', 'this'])
+        self.assertIn(('test', 'this'), hash_map.items())
+        self.assertEqual(hash_map, {'test': 'this', 'other': 'that'})
+        key, value = hash_map.popitem()
+        self.assertNotIn(key, hash_map)
+        hash_map.clear()
+        self.assertEqual(len(hash_map), 0)
+        self.assertRaises(KeyError, hash_map.popitem)
+
+    def test_single_probe(self):
+        """every single-key operation hashes its key exactly once"""
+        calls = []
+
+        def counting_hash(key):
+            calls.append(key)
+            return HashFunction.fnv1a(key)
+
+        hash_map = HashMap(test='this')
+        hash_map.set_hash_function(counting_hash)
+        operations = (
+            lambda: hash_map['test'],
+            lambda: 'test' in hash_map,
+            lambda: hash_map.get('test'),
+            lambda: hash_map.setdefault('other', 'that'),
+            lambda: hash_map.pop('other'),
+        )
+        for operation in operations:
+            del calls[:]
+            operation()
+            self.assertEqual(len(calls), 1)
+
+        del calls[:]
+        repr(hash_map)
+        list(hash_map.items())
+        list(hash_map.values())
+        self.assertEqual(calls, [])
+
+    def test_stats_snapshot(self):
+        """layout readout needs no instrumentation"""
+        hash_map = HashMap(test='this')
+        stats = hash_map.stats()
+        self.assertEqual(stats['used'], 1)
+        self.assertEqual(stats['size'], hash_map.size)
+        self.assertEqual(stats['load_factor'], 1 / hash_map.size)
+        self.assertEqual(stats['longest_cluster'], 1)
+        self.assertNotIn('hits', stats)
+        self.assertIsNone(hash_map.statistics)
+
+    def test_longest_cluster(self):
+        hash_map = HashMap()
+        hash_map.array = [1, None, 1, 1, 1, None, 1, 1]
+        self.assertEqual(hash_map.longest_cluster(), 3)
+        hash_map.array = [1, 1, None, 1, None, 1, 1, 1]
+        self.assertEqual(hash_map.longest_cluster(), 5)
+
+    def test_enable_stats(self):
+        events = []
+        hash_map = HashMap()
+        statistics = hash_map.enable_stats(
+            lambda event, payload: events.append((event, payload)))
+        for test in range(100):
+            hash_map[str(test)] = test
+        hash_map.get('0')
+        hash_map.get('missing')
+        'also_missing' in hash_map
+
+        stats = hash_map.stats()
+        self.assertEqual(sum(stats['hits'].values()), 1)
+        self.assertEqual(sum(stats['misses'].values()), 102)
+        self.assertGreaterEqual(stats['mean_miss_probes'], 1)
+        self.assertEqual(stats['resizes'], 1)
+        self.assertEqual(events[0][0], 'resize')
+        self.assertEqual(events[0][1]['old_size'], 128)
+        self.assertEqual(events[0][1]['size'], 256)
+
+        hash_map.disable_stats()
+        self.assertNotIn('lookup', hash_map.__dict__)
+        hash_map.get('0')
+        self.assertEqual(sum(statistics.hits.values()), 1)
+
     def test__auto_double(self):
         """if reaches threshold, should scale up"""
         hash_map = HashMap()
@@ -68,6 +334,812 @@ class HashMapTestCase(TestCase):
         self.assertEqual(hash_map.size, hash_map.NUM_SLOTS * 2)
         self.assertEqual(len(hash_map), num_added)
 
+    def test_snapshot(self):
+        """dump & load restore the exact slot layout, tombstones included"""
+        for test in range(200):
+            self.hash_map[str(test)] = [test]
+        for test in range(0, 200, 3):
+            del self.hash_map[str(test)]
+        self.hash_map.set_hash_function('fnv1a')
+        for test in range(0, 200, 7):
+            self.hash_map.pop(str(test), None)
+        output = io.BytesIO()
+        self.hash_map.dump(output)
+        output.seek(0)
+        hash_map = HashMap.load(output)
+        self.assertEqual(hash_map.size, self.hash_map.size)
+        self.assertEqual(hash_map.hash_function.__name__, 'fnv1a')
+        self.assertEqual(len(hash_map), len(self.hash_map))
+        self.assertEqual(hash_map.tombstones, self.hash_map.tombstones)
+        self.assertEqual(hash_map.occupied_slots(), self.hash_map.occupied_slots())
+        self.assertEqual(dict(hash_map.items()), dict(self.hash_map.items()))
+        self.assertEqual(hash_map.max_probe_length(), self.hash_map.max_probe_length())
+        hash_map['new'] = 'value'
+        self.assertEqual(hash_map['new'], 'value')
+
+    def test_snapshot_file(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'test.snapshot')
+            HashMap.from_items((str(test), test) for test in range(1000)).dump(path)
+            hash_map = RobinHoodHashMap.load(path)
+            self.assertEqual(dict(hash_map.items()),
+                             {str(test): test for test in range(1000)})
+            with open(path, 'wb') as output:
+                output.write(b'not a snapshot')
+            self.assertRaises(ValueError, HashMap.load, path)
+
+    def test_key_types(self):
+        """int, bytes & tuple keys, on every engine, under every hash function"""
+        keys = [0, -1, 2 ** 70, b'test', b'', ('test', 1), ('test', (b'1', 2)), 'test']
+        for layout in (HashMap, RobinHoodHashMap, IncrementalHashMap,
+                       CompactHashMap, SwissHashMap, LRUCache):
+            for name in HashFunction.FUNCTIONS:
+                hash_map = layout()
+                hash_map.set_hash_function(name)
+                for value, key in enumerate(keys):
+                    hash_map[key] = value
+                self.assertEqual([hash_map[key] for key in keys],
+                                 list(range(len(keys))))
+                self.assertNotIn(1, hash_map)
+                self.assertNotIn(('test',), hash_map)
+                self.assertEqual(hash_map.pop(b'test'), 3)
+                self.assertEqual(len(hash_map), len(keys) - 1)
+
+    def test_validate_keys(self):
+        """character validation is opt-in, unsupported types always fail"""
+        self.hash_map['\x00'] = 'not printable'
+        self.assertRaises(TypeError, self.hash_map.__setitem__, 1.5, 'float')
+        self.assertRaises(TypeError, self.hash_map.__setitem__, ['list'], 'list')
+        hash_map = HashMap()
+        hash_map.VALIDATE_KEYS = True
+        hash_map['test'] = hash_map[('test', 1)] = 'valid'
+        self.assertRaises(AssertionError, hash_map.__setitem__, '\x00', 'invalid')
+        self.assertRaises(AssertionError, hash_map.__setitem__, ('\x00',), 'invalid')
+
+
+class RobinHoodHashMapTestCase(TestCase):
+
+    def setUp(self):
+        self.hash_map = RobinHoodHashMap()
+
+    def test__setitem__and__getitem__(self):
+        self.hash_map['test'] = 'Test'
+        self.assertEqual(self.hash_map['test'], 'Test')
+        self.assertRaises(KeyError, self.hash_map.__getitem__, 'not_test')
+
+    def test__set__duplicate(self):
+        self.hash_map['new'] = 12
+        self.hash_map['new'] = 13
+        self.assertEqual(self.hash_map['new'], 13)
+        self.assertEqual(len(self.hash_map), 1)
+
+    def test_displacement(self):
+        """all keys remain reachable after displacing each other"""
+        keys = [str(x) for x in range(500)]
+        for key in keys:
+            self.hash_map[key] = key
+        self.assertEqual(len(self.hash_map), len(keys))
+        for key in keys:
+            self.assertEqual(self.hash_map[key], key)
+        self.assertNotIn('not_a_key', self.hash_map)
+
+    def test__delete__(self):
+        for key in ('a', 'b', 'c'):
+            self.hash_map[key] = key
+        del self.hash_map['b']
+        self.assertNotIn('b', self.hash_map)
+        self.assertEqual(self.hash_map['c'], 'c')
+        self.assertEqual(len(self.hash_map), 2)
+        self.assertRaises(KeyError, self.hash_map.__delitem__, 'b')
+
+    def test__delete__backward_shift(self):
+        """no tombstones: displaced keys shift back towards home"""
+        keys = [str(x) for x in range(100)]
+        for key in keys:
+            self.hash_map[key] = key
+        for key in keys[::2]:
+            del self.hash_map[key]
+        self.assertEqual(self.hash_map.tombstones, 0)
+        self.assertEqual(len(self.hash_map), 50)
+        for key in keys[1::2]:
+            self.assertEqual(self.hash_map[key], key)
+        for item in filter(None, self.hash_map.array):
+            home = self.hash_map.home_index(item.key)
+            self.assertEqual(item.distance,
+                             (self.hash_map.array.index(item) - home) % self.hash_map.size)
+
+    def test_distance_invariant(self):
+        """recorded distance always matches the offset from the home index"""
+        for test in range(300):
+            self.hash_map[str(test)] = test
+        for item in filter(None, self.hash_map.array):
+            home = self.hash_map.home_index(item.key)
+            self.assertEqual(item.distance,
+                             (self.hash_map.array.index(item) - home) % self.hash_map.size)
+
+    def test_insert_single_probe(self):
+        """a new key is placed from where get_index stopped, not from home"""
+        self.hash_map.reserve(100)
+        self.hash_map.place = None  # only resizes may re-probe from home
+        for test in range(100):
+            self.hash_map[str(test)] = test
+        del self.hash_map.place
+        for item in filter(None, self.hash_map.array):
+            home = self.hash_map.home_index(item.key)
+            self.assertEqual(item.distance,
+                             (self.hash_map.array.index(item) - home) % self.hash_map.size)
+        for test in range(100):
+            self.assertEqual(self.hash_map[str(test)], test)
+
+    def test_bounded_probe_length(self):
+        """same key set: worst case probe never exceeds linear probing"""
+        linear = HashMap()
+        linear.MAX_LOAD_FACTOR = self.hash_map.MAX_LOAD_FACTOR
+        keys = [''.join(random.choice(string.ascii_letters) for x in range(6))
+                for test in range(2000)]
+        for key in keys:
+            linear[key] = key
+            self.hash_map[key] = key
+        self.assertEqual(self.hash_map.size, linear.size)
+        self.assertLessEqual(self.hash_map.max_probe_length(),
+                             linear.max_probe_length())
+
+
+class IncrementalHashMapTestCase(TestCase):
+
+    def setUp(self):
+        self.hash_map = IncrementalHashMap()
+        self.hash_map.MIGRATION_BUDGET = 4
+        self.keys = [str(x) for x in range(97)]
+        for key in self.keys:
+            self.hash_map[key] = key
+
+    def test_resize_is_deferred(self):
+        """crossing the load factor only swaps in the new array"""
+        self.assertTrue(self.hash_map.migrating)
+        self.assertEqual(self.hash_map.size, 256)
+        self.assertEqual(self.hash_map.old_size, 128)
+        self.assertLess(self.hash_map.migrated, self.hash_map.old_size)
+
+    def test_lookups_during_migration(self):
+        self.assertEqual(len(self.hash_map), len(self.keys))
+        self.assertEqual(sorted(self.hash_map), sorted(self.keys))
+        for key in self.keys:
+            self.assertEqual(self.hash_map[key], key)
+        self.assertNotIn('not_test', self.hash_map)
+
+    def test_bounded_migration(self):
+        """each operation migrates the budget, up to the end of a cluster"""
+        migrated = self.hash_map.migrated
+        self.hash_map['0']
+        self.assertGreaterEqual(self.hash_map.migrated, migrated + 4)
+        self.assertLess(self.hash_map.migrated, migrated + 4 + 128)
+
+    def test_updates_and_deletes_during_migration(self):
+        for key in self.keys[:10]:
+            self.hash_map[key] = 'updated'
+        for key in self.keys[10:20]:
+            del self.hash_map[key]
+        self.assertEqual(len(self.hash_map), len(self.keys) - 10)
+        self.hash_map.finish_migration()
+        self.assertFalse(self.hash_map.migrating)
+        for key in self.keys[:10]:
+            self.assertEqual(self.hash_map[key], 'updated')
+        for key in self.keys[10:20]:
+            self.assertNotIn(key, self.hash_map)
+        for key in self.keys[20:]:
+            self.assertEqual(self.hash_map[key], key)
+
+    def test_set_hash_function(self):
+        self.hash_map.set_hash_function('fnv1a')
+        self.assertFalse(self.hash_map.migrating)
+        for key in self.keys:
+            self.assertEqual(self.hash_map[key], key)
+
+    def test_snapshot(self):
+        """dumping finishes the migration, snapshots hold a single table"""
+        output = io.BytesIO()
+        self.hash_map.dump(output)
+        self.assertFalse(self.hash_map.migrating)
+        output.seek(0)
+        hash_map = IncrementalHashMap.load(output)
+        self.assertEqual(sorted(hash_map.items()), sorted(self.hash_map.items()))
+
+
+class CompactHashMapTestCase(TestCase):
+
+    def setUp(self):
+        self.hash_map = CompactHashMap()
+
+    def test__setitem__and__getitem__(self):
+        self.hash_map['test'] = 'Test'
+        self.assertEqual(self.hash_map['test'], 'Test')
+        self.assertRaises(KeyError, self.hash_map.__getitem__, 'not_test')
+        self.assertNotIn('not_test', self.hash_map)
+
+    def test__set__duplicate(self):
+        self.hash_map['new'] = 12
+        self.hash_map['new'] = 13
+        self.assertEqual(self.hash_map['new'], 13)
+        self.assertEqual(len(self.hash_map), 1)
+
+    def test_index_typecode(self):
+        """sparse index uses the narrowest integer type for its size"""
+        self.assertEqual(self.hash_map.indices.typecode, 'b')
+        for test in range(200):
+            self.hash_map[str(test)] = test
+        self.assertEqual(self.hash_map.indices.typecode, 'h')
+        self.assertEqual(len(self.hash_map.dense_keys), 200)
+
+    def test_insertion_order(self):
+        keys = ['c', 'a', 'b', 'z', 'y']
+        for key in keys:
+            self.hash_map[key] = key
+        del self.hash_map['a']
+        self.hash_map['a'] = 'again'
+        self.assertEqual(list(self.hash_map), ['c', 'b', 'z', 'y', 'a'])
+
+    def test__delete__and_resize(self):
+        keys = [str(x) for x in range(300)]
+        for key in keys:
+            self.hash_map[key] = key
+        for key in keys[::2]:
+            del self.hash_map[key]
+        self.assertEqual(len(self.hash_map), 150)
+        self.assertRaises(KeyError, self.hash_map.__delitem__, keys[0])
+        self.hash_map.double()
+        self.assertEqual(len(self.hash_map.dense_keys), 150)
+        self.assertEqual(list(self.hash_map), keys[1::2])
+        for key in keys[1::2]:
+            self.assertEqual(self.hash_map[key], key)
+
+    def test_set_hash_function(self):
+        self.hash_map['test'] = 'this'
+        self.hash_map.set_hash_function('base_alphabet')
+        self.assertEqual(self.hash_map.get_index('test'), 102)
+        self.assertEqual(self.hash_map['test'], 'this')
+
+    def test_delete_last_then_insert(self):
+        """DUMMY slots of popped trailing entries still count towards load,
+        so a miss always reaches an EMPTY slot"""
+        for test in range(96):
+            self.hash_map[str(test)] = test
+        for test in range(1000):
+            del self.hash_map[self.hash_map.dense_keys[-1]]
+            self.hash_map['n%d' % test] = test
+            self.assertIn(self.hash_map.EMPTY, self.hash_map.indices)
+        self.assertNotIn('missing', self.hash_map)
+        self.assertEqual(len(self.hash_map), 96)
+
+    def test_snapshot(self):
+        """dense entries round-trip in insertion order, deleted ones dropped"""
+        for test in range(300):
+            self.hash_map[str(test)] = [test]
+        for test in range(0, 300, 3):
+            del self.hash_map[str(test)]
+        self.hash_map.set_hash_function('fnv1a')
+        output = io.BytesIO()
+        self.hash_map.dump(output)
+        output.seek(0)
+        hash_map = CompactHashMap.load(output)
+        self.assertEqual(hash_map.size, self.hash_map.size)
+        self.assertEqual(hash_map.hash_function.__name__, 'fnv1a')
+        self.assertEqual(list(hash_map.items()), list(self.hash_map.items()))
+        self.assertEqual(len(hash_map.dense_keys), 200)
+        self.assertEqual(hash_map.tombstones, 0)
+        hash_map['new'] = 'value'
+        self.assertEqual(hash_map['new'], 'value')
+        self.assertNotIn('0', hash_map)
+        output.seek(0)
+        self.assertRaises(ValueError, HashMap.load, output)
+
+    def test_delete_reinsert_churn(self):
+        """reused DUMMY slots append dense entries, which count towards load"""
+        self.hash_map['a'] = self.hash_map['b'] = 0
+        for test in range(2000):
+            key = 'ab'[test % 2]
+            del self.hash_map[key]
+            self.hash_map[key] = test
+            self.assertLessEqual(len(self.hash_map.dense_keys),
+                                 self.hash_map.MAX_LOAD_FACTOR * self.hash_map.size + 1)
+        self.assertEqual(self.hash_map.size, self.hash_map.NUM_SLOTS)
+        self.assertEqual(dict(self.hash_map.items()), {'a': 1998, 'b': 1999})
+        self.assertEqual(len(self.hash_map), 2)
+        self.assertEqual(self.hash_map.used + self.hash_map.tombstones,
+                         sum(entry != CompactHashMap.EMPTY
+                             for entry in self.hash_map.indices))
+
+    def test_popitem_lifo(self):
+        for key in ('a', 'b', 'c'):
+            self.hash_map[key] = key
+        self.assertEqual(self.hash_map.popitem(), ('c', 'c'))
+        self.assertEqual(list(self.hash_map.items()), [('a', 'a'), ('b', 'b')])
+
+    def test_memory_footprint(self):
+        """compact layout holds far fewer bytes than one object per entry"""
+        hash_map = HashMap()
+        for test in range(1000):
+            hash_map[str(test)] = test
+            self.hash_map[str(test)] = test
+        self.assertLess(sys.getsizeof(self.hash_map) * 3, sys.getsizeof(hash_map))
+
+
+class ConcurrentHashMapTestCase(TestCase):
+
+    def setUp(self):
+        self.hash_map = ConcurrentHashMap(test='this')
+
+    def test_mapping(self):
+        self.assertEqual(self.hash_map['test'], 'this')
+        self.assertIn('test', self.hash_map)
+        self.assertNotIn('not_test', self.hash_map)
+        self.assertRaises(KeyError, self.hash_map.__getitem__, 'not_test')
+        self.assertEqual(self.hash_map.setdefault('test', 'that'), 'this')
+        self.assertEqual(self.hash_map.pop('test'), 'this')
+        self.assertRaises(KeyError, self.hash_map.__delitem__, 'test')
+        self.assertEqual(len(self.hash_map), 0)
+
+    def test_segments(self):
+        """keys spread over all segments, which resize independently"""
+        self.hash_map.update((str(test), test) for test in range(5000))
+        self.assertEqual(len(self.hash_map), 5001)
+        self.assertEqual(self.hash_map.get_many(['0', '4999', 'missing']),
+                         [0, 4999, None])
+        lengths = [len(segment) for segment in self.hash_map.segments]
+        self.assertGreater(min(lengths), 5001 / 16 / 2)
+        self.assertEqual(sorted(self.hash_map.items()),
+                         sorted(dict(self.hash_map).items()))
+
+    def test_set_hash_function(self):
+        """keys move to the segment their new hash picks"""
+        self.hash_map.update((str(test), test) for test in range(200))
+        self.hash_map.set_hash_function('fnv1a')
+        self.assertEqual(len(self.hash_map), 201)
+        for test in range(200):
+            self.assertEqual(self.hash_map[str(test)], test)
+        self.assertEqual(self.hash_map['test'], 'this')
+        for index, segment in enumerate(self.hash_map.segments):
+            self.assertEqual(segment.hash_function, HashFunction.fnv1a)
+            for key in segment:
+                self.assertEqual(self.hash_map.segment_index(
+                    self.hash_map.key_hash(key)), index)
+
+    def test_set_hash_function_between_hash_and_lock(self):
+        """a write hashed just before set_hash_function re-hashes & retries"""
+        self.hash_map.update((str(test), test) for test in range(200))
+        key_hash, group = self.hash_map.key_hash, self.hash_map.group
+        switches = ['fnv1a', 'base_alphabet']
+
+        def racing(switch):
+            def wrapper(*args):
+                result = switch(*args)
+                if switches:
+                    # another thread switches hash functions right now
+                    self.hash_map.set_hash_function(switches.pop(0))
+                return result
+            return wrapper
+
+        self.hash_map.key_hash = racing(key_hash)
+        self.hash_map['raced'] = 'value'
+        self.hash_map.group = racing(group)
+        self.hash_map.set_many({'batch': 1, 'more': 2})
+        self.assertEqual(switches, [])
+        self.assertEqual(self.hash_map['raced'], 'value')
+        self.assertEqual(self.hash_map.get_many(['batch', 'more', '199']),
+                         [1, 2, 199])
+        for index, segment in enumerate(self.hash_map.segments):
+            for key in segment:
+                self.assertEqual(self.hash_map.segment_index(
+                    key_hash(key)), index)
+
+    def test_with_segments(self):
+        hash_map = ConcurrentHashMap.with_segments(3, test='this')
+        self.assertEqual(len(hash_map.segments), 3)
+        self.assertEqual(hash_map['test'], 'this')
+
+    def test_threads(self):
+        """writers & readers on many threads, across segment resizes"""
+        errors = []
+
+        def writer(offset):
+            for test in range(offset, offset + 2000):
+                self.hash_map[str(test)] = test
+
+        def reader():
+            for test in range(2000):
+                value = self.hash_map.get(str(test))
+                if value is not None and value != test:
+                    errors.append(value)
+
+        threads = [threading.Thread(target=writer, args=(offset,))
+                   for offset in range(0, 8000, 2000)]
+        threads += [threading.Thread(target=reader) for x in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.hash_map), 8001)
+        for test in range(8000):
+            self.assertEqual(self.hash_map[str(test)], test)
+
+
+class CacheHashMapTestCase(TestCase):
+
+    def setUp(self):
+        self.cache = LRUCache.with_limits(max_entries=3)
+        self.now = 0.0
+        self.cache.CLOCK = lambda: self.now
+
+    def test_lru_eviction(self):
+        for test in 'abc':
+            self.cache[test] = test
+        self.cache['a']  # a is now the most recently used
+        self.cache['d'] = 'd'
+        self.assertEqual(sorted(self.cache), ['a', 'c', 'd'])
+        self.assertEqual(self.cache.evictions, 1)
+
+    def test_hits_and_misses(self):
+        self.cache['a'] = 1
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertIsNone(self.cache.get('b'))
+        self.assertIn('a', self.cache)  # membership is not counted
+        stats = self.cache.stats()
+        self.assertEqual((stats['cache_hits'], stats['cache_misses']), (1, 1))
+
+    def test_stats_keep_probe_histograms(self):
+        """cache counters sit next to, not over, the enable_stats histograms"""
+        self.cache.enable_stats()
+        self.cache['a'] = 1
+        self.cache.get('a')
+        self.cache.get('b')
+        stats = self.cache.stats()
+        self.assertEqual((stats['cache_hits'], stats['cache_misses']), (1, 1))
+        self.assertEqual(sum(stats['hits'].values()), 1)
+        self.assertEqual(sum(stats['misses'].values()), 2)  # insert, get
+
+    def test_ttl(self):
+        self.cache.set('a', 1, ttl=10)
+        self.cache['b'] = 2
+        self.now = 5
+        self.assertEqual(self.cache['a'], 1)
+        self.now = 10
+        self.assertNotIn('a', self.cache)
+        self.assertEqual(self.cache.expirations, 1)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(self.cache['b'], 2)
+
+    def test_expire(self):
+        cache = LRUCache.with_limits(max_entries=None, ttl=1)
+        cache.CLOCK = lambda: self.now
+        for test in range(100):
+            cache[str(test)] = test
+        cache.set('kept', 0, ttl=None)
+        self.now = 1
+        self.assertEqual(cache.expire(), 100)
+        self.assertEqual(list(cache.items()), [('kept', 0)])
+
+    def test_byte_budget(self):
+        cache = LRUCache.with_limits(max_entries=None, max_bytes=1000)
+        for test in range(100):
+            cache[str(test)] = str(test)
+            self.assertLessEqual(cache.bytes, 1000)
+        self.assertIn('99', cache)
+        self.assertNotIn('0', cache)
+        cache.clear()
+        self.assertEqual(cache.bytes, 0)
+
+    def test_lfu_keeps_frequent_keys(self):
+        cache = LFUCache.with_limits(max_entries=100)
+        cache.policy.random.seed(0)
+        for test in range(10):
+            cache[str(test)] = test
+            for hit in range(20):
+                cache[str(test)]
+        for test in range(10, 1000):
+            cache[str(test)] = test
+        self.assertEqual(len(cache), 100)
+        self.assertTrue(all(str(test) in cache for test in range(10)))
+
+    def test_load(self):
+        """a snapshot loads into a fresh cache, under the cache's own limits"""
+        hash_map = HashMap.from_items((str(test), test) for test in range(10))
+        hash_map.set_hash_function('fnv1a')
+        output = io.BytesIO()
+        hash_map.dump(output)
+        output.seek(0)
+        cache = LFUCache.load(output)
+        self.assertIsInstance(cache, LFUCache)
+        self.assertEqual(cache.hash_function.__name__, 'fnv1a')
+        self.assertEqual(dict(cache.items()), dict(hash_map.items()))
+        self.assertEqual(cache['3'], 3)
+        self.assertEqual(cache.hits, 1)
+
+        self.cache.update(('abc'[test], test) for test in range(3))
+        output = io.BytesIO()
+        self.cache.dump(output)
+        output.seek(0)
+        cache = LRUCache.load(output)
+        self.assertEqual(dict(cache.items()), {'a': 0, 'b': 1, 'c': 2})
+        self.assertIsNotNone(cache.policy.victim())
+
+    def test_mapping_across_resizes(self):
+        cache = LRUCache.with_limits(max_entries=500)
+        expected = {}
+        generator = random.Random(0)
+        for test in range(5000):
+            key = str(generator.randrange(800))
+            if generator.random() < 0.2:
+                self.assertEqual(cache.pop(key, None), expected.pop(key, None))
+            else:
+                expected.pop(key, None)  # to the most recently used end
+                cache[key] = expected[key] = test
+            if len(expected) > 500:
+                # the cache evicted its least recently used key already
+                del expected[next(iter(expected))]
+        self.assertEqual(dict(cache.items()), expected)
+
+
+class DiskHashMapTestCase(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'test.hm')
+        self.hash_map = DiskHashMap(self.path)
+        self.addCleanup(self.hash_map.close)
+
+    def test_mapping(self):
+        self.hash_map['test'] = {'value': 1}
+        self.assertEqual(self.hash_map['test'], {'value': 1})
+        self.assertIn('test', self.hash_map)
+        self.assertNotIn('not_test', self.hash_map)
+        self.assertEqual(self.hash_map.setdefault('test', 'that'), {'value': 1})
+        self.hash_map['test'] = 'updated'
+        self.assertEqual(self.hash_map.pop('test'), 'updated')
+        self.assertRaises(KeyError, self.hash_map.__delitem__, 'test')
+        self.assertEqual(len(self.hash_map), 0)
+
+    def test_persistence(self):
+        """reopening maps the file as it was, in any mode"""
+        expected = {str(test): test for test in range(1000)}
+        self.hash_map.update(expected)
+        self.hash_map.close()
+        with DiskHashMap(self.path, readonly=True) as hash_map:
+            self.assertEqual(len(hash_map), 1000)
+            self.assertEqual(dict(hash_map.items()), expected)
+
+    def test_same_probing_as_hash_map(self):
+        hash_map = HashMap()
+        self.hash_map['test'] = 'this'
+        self.assertEqual(self.hash_map.size, hash_map.size)
+        self.assertEqual(self.hash_map.get_index('test'),
+                         hash_map.get_index('test'))
+
+    def test_growth_and_garbage(self):
+        """rebuilding renames a fresh file over the old one, without dead records"""
+        for test in range(500):
+            self.hash_map[str(test % 50)] = 'x' * 100
+        for test in range(50, 1000):
+            self.hash_map[str(test)] = test
+        self.assertGreater(self.hash_map.size, DiskHashMap.NUM_SLOTS)
+        self.assertEqual(len(self.hash_map), 1000)
+        self.assertLess(self.hash_map.heap_end -
+                        self.hash_map.heap_start(self.hash_map.size), 30000)
+        self.assertEqual(os.listdir(os.path.dirname(self.path)), ['test.hm'])
+
+    def test_overwrites_and_deletes_stay_bounded(self):
+        """records replaced or deleted count as dead bytes, dropped by rebuilds"""
+        for test in range(20000):
+            self.hash_map['test'] = 'x' * (test % 100)
+        self.assertEqual(self.hash_map['test'], 'x' * 99)
+        for test in range(2000):
+            self.hash_map[str(test % 10)] = test
+            del self.hash_map[str(test % 10)]
+        self.assertEqual(len(self.hash_map), 1)
+        self.assertLessEqual(self.hash_map.dead, max(
+            self.hash_map.live_heap(),
+            self.hash_map.size * DiskHashMap.SLOT.size))
+        self.assertLess(os.path.getsize(self.path),
+                        4 * self.hash_map.heap_start(self.hash_map.size))
+
+    def test_set_hash_function(self):
+        self.hash_map.update((str(test), test) for test in range(50))
+        self.hash_map.set_hash_function('fnv1a')
+        self.assertEqual(self.hash_map.size, 131)
+        self.assertEqual(dict(self.hash_map.items()),
+                         {str(test): test for test in range(50)})
+
+    def test_key_types(self):
+        keys = [7, -2 ** 70, b'test', ('test', 1, (b'2', -3)), 'test', ()]
+        for value, key in enumerate(keys):
+            self.hash_map[key] = value
+        self.hash_map.close()
+        with DiskHashMap(self.path, readonly=True) as hash_map:
+            self.assertEqual(dict(hash_map.items()),
+                             {key: value for value, key in enumerate(keys)})
+            self.assertNotIn('7', hash_map)
+
+    def test_not_a_hash_map_file(self):
+        with open(self.path + '.txt', 'wb') as output:
+            output.write(b'x' * 100)
+        self.assertRaises(ValueError, DiskHashMap, self.path + '.txt')
+
+
+class SharedHashMapTestCase(TestCase):
+
+    def setUp(self):
+        self.hash_map = HashMap.from_items((str(test), [test]) for test in range(1000))
+        self.frozen = SharedHashMap.freeze(self.hash_map)
+        self.addCleanup(self.frozen.unlink)
+        self.addCleanup(self.frozen.close)
+
+    def test_attach(self):
+        """a reader attached by name sees the frozen map, without a copy"""
+        shared = SharedHashMap(self.frozen.name)
+        self.addCleanup(shared.close)
+        self.assertEqual(len(shared), 1000)
+        self.assertEqual(shared['10'], [10])
+        self.assertNotIn('not_test', shared)
+        self.assertEqual(dict(shared.items()), dict(self.hash_map.items()))
+        self.assertEqual(shared.hash_function.__name__, 'blake2b')
+
+    def test_read_only(self):
+        self.assertRaises(TypeError, self.frozen.__setitem__, 'test', 1)
+        self.assertRaises(TypeError, self.frozen.__delitem__, '10')
+        self.assertRaises(TypeError, self.frozen.pop, '10')
+        self.assertEqual(self.frozen['10'], [10])
+
+    def test_freeze_any_engine(self):
+        compact = CompactHashMap()
+        compact.update(self.hash_map)
+        compact.set_hash_function('base_alphabet')
+        frozen = SharedHashMap.freeze(compact)
+        self.addCleanup(frozen.unlink)
+        self.addCleanup(frozen.close)
+        self.assertEqual(frozen.hash_function.__name__, 'base_alphabet')
+        self.assertEqual(dict(frozen.items()), dict(self.hash_map.items()))
+
+
+class SwissHashMapTestCase(TestCase):
+
+    def setUp(self):
+        self.hash_map = SwissHashMap(test='this')
+
+    def test_mapping(self):
+        self.assertEqual(self.hash_map['test'], 'this')
+        self.assertIn('test', self.hash_map)
+        self.assertNotIn('not_test', self.hash_map)
+        self.assertEqual(self.hash_map.setdefault('test', 'that'), 'this')
+        self.assertEqual(self.hash_map.pop('test'), 'this')
+        self.assertRaises(KeyError, self.hash_map.__delitem__, 'test')
+        self.assertEqual(len(self.hash_map), 0)
+
+    def test_control_bytes(self):
+        """fingerprint in the control byte, slots grouped by 16"""
+        self.assertEqual(self.hash_map.size, 128)
+        self.assertEqual(self.hash_map.num_groups, 8)
+        index = self.hash_map.get_index('test')
+        key_hash = self.hash_map.key_hash('test')
+        self.assertEqual(self.hash_map.control[index], key_hash & 0x7f)
+        self.assertEqual(index // 16, self.hash_map.home_group(key_hash))
+
+    def test_delete_in_full_group(self):
+        """a full group keeps probes going with DELETED, others go EMPTY"""
+        self.hash_map.MAX_LOAD_FACTOR = 1.0  # 127 of 128 slots: full groups
+        for test in range(126):
+            self.hash_map[str(test)] = test
+        control = self.hash_map.control
+        full = next(group for group in range(self.hash_map.num_groups)
+                    if self.hash_map.EMPTY not in control[group * 16:group * 16 + 16])
+        index = full * 16
+        del self.hash_map[self.hash_map.slot_keys[index]]
+        self.assertEqual(control[index], SwissHashMap.DELETED)
+        self.assertEqual(self.hash_map.tombstones, 1)
+        self.assertEqual(len(self.hash_map), 126)
+        for test in range(126):
+            self.assertEqual(self.hash_map.get(str(test), test), test)
+
+    def test_snapshot(self):
+        """control bytes & slot columns round-trip, DELETED slots included"""
+        self.hash_map.MAX_LOAD_FACTOR = 1.0
+        for test in range(126):
+            self.hash_map[str(test)] = [test]
+        for test in range(0, 126, 5):
+            del self.hash_map[str(test)]
+        self.hash_map.set_hash_function('fnv1a')
+        for test in range(1, 126, 7):
+            self.hash_map.pop(str(test), None)
+        self.assertGreater(self.hash_map.tombstones, 0)
+        output = io.BytesIO()
+        self.hash_map.dump(output)
+        output.seek(0)
+        hash_map = SwissHashMap.load(output)
+        self.assertEqual(hash_map.hash_function.__name__, 'fnv1a')
+        self.assertEqual(hash_map.control, self.hash_map.control)
+        for index, byte in enumerate(hash_map.control):
+            if byte < SwissHashMap.EMPTY:
+                self.assertEqual(hash_map.slot_hashes[index],
+                                 self.hash_map.slot_hashes[index])
+        self.assertEqual(hash_map.tombstones, self.hash_map.tombstones)
+        self.assertEqual(len(hash_map), len(self.hash_map))
+        self.assertEqual(list(hash_map.items()), list(self.hash_map.items()))
+        hash_map['new'] = 'value'
+        self.assertEqual(hash_map['new'], 'value')
+        self.assertNotIn('0', hash_map)
+
+    def test_popitem_drain(self):
+        """popitem resumes from its last slot, and still finds later inserts"""
+        self.hash_map.update((str(test), test) for test in range(500))
+        expected = dict(self.hash_map.items())
+        for test in range(400):
+            key, value = self.hash_map.popitem()
+            self.assertEqual(expected.pop(key), value)
+            if test % 7 == 0:
+                self.hash_map[str(-test)] = expected[str(-test)] = test
+        self.assertEqual(dict(self.hash_map.items()), expected)
+        while self.hash_map:
+            key, value = self.hash_map.popitem()
+            self.assertEqual(expected.pop(key), value)
+        self.assertEqual(expected, {})
+        self.assertRaises(KeyError, self.hash_map.popitem)
+
+    def test_against_dict(self):
+        generator = random.Random(0)
+        expected = {'test': 'this'}
+        for test in range(5000):
+            key = str(generator.randrange(1000))
+            if generator.random() < 0.3:
+                self.assertEqual(self.hash_map.pop(key, None), expected.pop(key, None))
+            else:
+                self.hash_map[key] = expected[key] = test
+        self.assertEqual(dict(self.hash_map.items()), expected)
+        self.hash_map.set_hash_function('fnv1a')
+        self.assertEqual(dict(self.hash_map.items()), expected)
+
+    def test_get_many(self):
+        self.hash_map.update((str(test), test) for test in range(2000))
+        keys = [str(test) for test in range(-500, 2500)]
+        self.assertEqual(self.hash_map.get_many(keys),
+                         [test if 0 <= test < 2000 else None
+                          for test in range(-500, 2500)])
+
+    @skipIf(numpy is None, 'numpy is not installed')
+    def test_get_many_vectorized(self):
+        """same answers as one lookup per key, at any load"""
+        self.hash_map.MAX_LOAD_FACTOR = 0.95
+        for test in range(int(0.94 * self.hash_map.size)):
+            self.hash_map[str(test)] = test
+        self.hash_map.NUMPY_BATCH = 1
+        keys = [str(test) for test in range(-50, 200)]
+        self.assertEqual(self.hash_map.get_many(keys, 'missing'),
+                         [self.hash_map.get(key, 'missing') for key in keys])
+
+
+class WorkloadBenchmarkTestCase(TestCase):
+
+    def test_suite(self):
+        """every workload x distribution, for dict & each configuration"""
+        benchmark = WorkloadBenchmark([50], [8], ['HashMap'])
+        benchmark.REPEAT = 1
+        results = benchmark()
+        self.assertEqual(len(results), 2 * 7 * 3)
+        for result in results:
+            self.assertGreater(result['ops_per_sec'], 0)
+            if result['configuration'] == 'dict':
+                self.assertEqual(result['ratio'], 1)
+
+    def test_compare(self):
+        """regressions are ratios to dict that fell below the tolerance"""
+        result = {'configuration': 'HashMap', 'workload': 'hit',
+                  'distribution': 'uniform', 'key_length': 8, 'num_keys': 50,
+                  'ops_per_sec': 1, 'ratio': 0.5}
+        baseline = {'results': [dict(result, ratio=0.6)]}
+        self.assertEqual(WorkloadBenchmark.compare([result], baseline, 0.2), [])
+        regressions = WorkloadBenchmark.compare([result], baseline, 0.1)
+        self.assertEqual(regressions, [dict(result, baseline_ratio=0.6)])
+
 
 class HashItemTestCase(TestCase):
 
@@ -101,6 +1173,74 @@ class HashFunctionTestCase(TestCase):
         index = HashFunction.sha256('sitamet') % 100
         self.assertEqual(index, 14)
 
+    def test_fnv1a_hash(self):
+        """FNV-1a 64-bit reference vectors"""
+        self.assertEqual(HashFunction.fnv1a(''), 0xcbf29ce484222325)
+        self.assertEqual(HashFunction.fnv1a('a'), 0xaf63dc4c8601ec8c)
+        self.assertEqual(HashFunction.fnv1a('foobar'), 0x85944171f73967e8)
+
+    def test_polynomial_hash(self):
+        self.assertEqual(HashFunction.polynomial(''), 0)
+        self.assertEqual(HashFunction.polynomial('a'), 97)
+        self.assertEqual(HashFunction.polynomial('aa'),
+                         (97 * HashFunction.POLYNOMIAL_BASE + 97) % 2 ** 64)
+
+    def test_fixed_width(self):
+        """fast hashes always fit in 64 bits, regardless of key length"""
+        for name in ('fnv1a', 'polynomial', 'xxmix', 'blake2b'):
+            hash_function = HashFunction.get(name)
+            for key in ('', 'a', 'test', string.printable * 10):
+                self.assertLess(hash_function(key), 2 ** 64)
+                self.assertGreaterEqual(hash_function(key), 0)
+
+    def test_encode(self):
+        """encodings of keys that are not equal differ"""
+        keys = ['a1', b'a1', ('a', 1), ('a1',), ('a', '1'), (b'a', 1), 0, -1,
+                255, 256, (), ((),), ('',)]
+        encodings = [(type(key), HashFunction.encode(key)) for key in keys]
+        self.assertEqual(len(set(encodings)), len(keys))
+        self.assertEqual(HashFunction.encode('test'), b'test')
+        self.assertRaises(TypeError, HashFunction.encode, 1.5)
+
+    def test_int_fast_paths(self):
+        self.assertEqual(HashFunction.base_alphabet(12345), 12345)
+        buckets = {HashFunction.xxmix(key) % 64 for key in range(1000)}
+        self.assertEqual(len(buckets), 64)
+
+    def test_xxmix_avalanche(self):
+        """single character change flips roughly half the output bits"""
+        flipped = bin(HashFunction.xxmix('test-key-1') ^
+                      HashFunction.xxmix('test-key-2')).count('1')
+        self.assertTrue(16 < flipped < 48)
+
+    def test_prove_uniform_distribution_fast_hashes(self):
+        """same check as below, for each of the fixed-width hashes"""
+        BOUND = 100
+        keys = [''.join(random.choice(string.printable) for x in range(8))
+                for test in range(10000)]
+        for name in ('fnv1a', 'polynomial', 'xxmix', 'blake2b'):
+            hash_function = HashFunction.get(name)
+            values = [hash_function(key) % BOUND for key in keys]
+            average = sum(values) / len(values)
+            self.assertTrue(48 < average < 52, name)
+
+    def test_many(self):
+        keys = [str(test) for test in range(1000)]
+        for name in HashFunction.FUNCTIONS:
+            hash_function = HashFunction.get(name)
+            self.assertEqual(HashFunction.many(hash_function, keys),
+                             [hash_function(key) for key in keys])
+
+    @skipIf(numpy is None, 'numpy not installed')
+    def test_many_vectorized(self):
+        """numpy batches match the scalar hashes, across key lengths"""
+        keys = [''.join(random.choice(string.printable) for x in range(length))
+                for length in range(40) for test in range(20)]
+        for name in ('fnv1a', 'polynomial'):
+            hash_function = HashFunction.get(name)
+            self.assertEqual(getattr(HashFunction, name + '_many')(keys),
+                             [hash_function(key) for key in keys])
+
     def test_prove_uniform_distribution_sha256(self):
         """just a curiosity: show that numbers are uniformly distributed between 1 - BOUND"""
         BOUND = 100
@@ -1,37 +1,266 @@
 import string
-from hashlib import sha256
+from hashlib import sha256, blake2b
+
+try:
+    import numpy
+except ImportError:  # optional: only speeds up HashFunction.many
+    numpy = None
 
 
 class HashFunction(object):
+    """
+    family of key hash functions, selectable by name via HashFunction.get
+        - base_alphabet & sha256 return unbounded ints
+        - fnv1a, polynomial, xxmix & blake2b return fixed-width 64-bit ints
+        - blake2b runs in C, so it is the fastest of the fixed-width family
+
+    keys are str, bytes, int or tuples of those (see encode)
+        - str keys take the original per-character path, so their hashes
+          are the same as before other key types were supported
+        - int keys skip encoding where a function can use the value itself:
+          base_alphabet returns it, xxmix avalanches it
+    """
     ALPHABET = string.printable
     RANGE = len(ALPHABET)
+    FUNCTIONS = ('base_alphabet', 'sha256', 'fnv1a', 'polynomial', 'xxmix',
+                 'blake2b')
+    # low bits alone are uniform => safe to index power-of-two tables
+    MIXED_LOW_BITS = ('sha256', 'xxmix', 'blake2b')
+
+    MASK_64 = 2 ** 64 - 1
+    FNV_OFFSET = 0xcbf29ce484222325
+    FNV_PRIME = 0x100000001b3
+    POLYNOMIAL_BASE = 0x9e3779b97f4a7c15  # odd, golden ratio * 2^64
+    XX_PRIME_1 = 0x9e3779b185ebca87
+    XX_PRIME_2 = 0xc2b2ae3d27d4eb4f
+    XX_PRIME_3 = 0x165667b19e3779f9
+    XX_PRIME_4 = 0x85ebca77c2b2ae63
+    XX_PRIME_5 = 0x27d4eb2f165667c5
+
+    # batches at least this large are hashed with numpy, when installed
+    NUMPY_BATCH = 256
+
+    KEY_TAGS = {str: b's', bytes: b'b', int: b'i', tuple: b't'}
+    LENGTH_BYTES = 4
+
+    @classmethod
+    def encode(cls, value):
+        """canonical bytes of a key
+            - str as utf-8, bytes as is, int as minimal signed little endian
+            - tuple items are tagged with their type & length-prefixed, so
+              ('a', 1) and ('a1',) or (b'a', 1) never share an encoding
+        """
+        kind = type(value)
+        if kind is str:
+            return value.encode()
+        if kind is bytes:
+            return value
+        if kind is int:
+            return value.to_bytes(value.bit_length() // 8 + 1, 'little',
+                                  signed=True)
+        if kind is tuple:
+            parts = []
+            for item in value:
+                data = cls.encode(item)
+                parts.append(cls.KEY_TAGS[type(item)] +
+                             len(data).to_bytes(cls.LENGTH_BYTES, 'little') +
+                             data)
+            return b''.join(parts)
+        raise TypeError('unsupported key type: %s' % kind.__name__)
+
+    @classmethod
+    def validate(cls, key):
+        """optional check of new keys: printable str, bytes, int or tuples"""
+        kind = type(key)
+        if kind is str:
+            for c in key:
+                assert c in cls.ALPHABET
+        elif kind is tuple:
+            for item in key:
+                cls.validate(item)
+        else:
+            assert kind in cls.KEY_TAGS
+
+    @classmethod
+    def many(cls, hash_function, values):
+        """hash a batch of values, vectorized over the batch where possible"""
+        name = getattr(hash_function, '__name__', None)
+        if numpy is not None and len(values) >= cls.NUMPY_BATCH and \
+                name in ('fnv1a', 'polynomial') and \
+                all(type(value) is str for value in values):
+            return getattr(cls, name + '_many')(values)
+        return [hash_function(value) for value in values]
+
+    @classmethod
+    def fnv1a_many(cls, values):
+        """fnv1a over a (keys x bytes) numpy matrix, one column per step"""
+        data = [value.encode() for value in values]
+        lengths = numpy.array([len(value) for value in data])
+        width = max(1, int(lengths.max()))
+        matrix = numpy.array(data, dtype='S%d' % width).view(numpy.uint8) \
+            .reshape(len(data), width)
+        result = numpy.full(len(data), cls.FNV_OFFSET, dtype=numpy.uint64)
+        prime = numpy.uint64(cls.FNV_PRIME)
+        for column in range(width):
+            # uint64 arithmetic wraps around, i.e. is reduced mod 2^64
+            step = (result ^ matrix[:, column]) * prime
+            result = numpy.where(lengths > column, step, result)
+        return result.tolist()
+
+    @classmethod
+    def polynomial_many(cls, values):
+        """polynomial over a (keys x code points) numpy matrix"""
+        lengths = numpy.array([len(value) for value in values])
+        width = max(1, int(lengths.max()))
+        matrix = numpy.array(values, dtype='U%d' % width).view(numpy.uint32) \
+            .reshape(len(values), width)
+        result = numpy.zeros(len(values), dtype=numpy.uint64)
+        base = numpy.uint64(cls.POLYNOMIAL_BASE)
+        for column in range(width):
+            step = result * base + matrix[:, column]
+            result = numpy.where(lengths > column, step, result)
+        return result.tolist()
+
+    @classmethod
+    def get(cls, name):
+        """look up a hash function of the family by name"""
+        if name not in cls.FUNCTIONS:
+            raise KeyError(name)
+        return getattr(cls, name)
 
     @classmethod
     def base_alphabet(cls, value):
-        """create int of base-N (num symbols, i.e. length of alphabet)"""
-        assert type(value) is str
-        key_length = len(value)
-        return sum(
-            cls.RANGE ** (key_length - (x + 1)) * ord(value[x])
-            for x in range(key_length)
-        )
+        """create int of base-N (num symbols, i.e. length of alphabet)
+            - evaluated with Horner's rule: one multiply-add per char
+            - an int is its own hash, other keys go byte by byte
+        """
+        kind = type(value)
+        if kind is int:
+            return value
+        result = 0
+        if kind is str:
+            for c in value:
+                result = result * cls.RANGE + ord(c)
+        else:
+            for byte in cls.encode(value):
+                result = result * cls.RANGE + byte
+        return result
 
     @classmethod
     def sha256(cls, value):
         """cast sha256 to int"""
-        assert type(value) is str
-        return int(sha256(value.encode()).hexdigest(), 16)
+        data = value.encode() if type(value) is str else cls.encode(value)
+        return int.from_bytes(sha256(data).digest(), 'big')
+
+    @classmethod
+    def fnv1a(cls, value):
+        """64-bit FNV-1a over the utf-8 (or encoded) bytes"""
+        data = value.encode() if type(value) is str else cls.encode(value)
+        prime, mask = cls.FNV_PRIME, cls.MASK_64
+        result = cls.FNV_OFFSET
+        for byte in data:
+            result = ((result ^ byte) * prime) & mask
+        return result
+
+    @classmethod
+    def polynomial(cls, value):
+        """Horner-rule polynomial hash reduced mod 2^64
+            - over code points for str, over encoded bytes otherwise
+        """
+        base, mask = cls.POLYNOMIAL_BASE, cls.MASK_64
+        result = 0
+        if type(value) is str:
+            for c in value:
+                result = (result * base + ord(c)) & mask
+        else:
+            for byte in cls.encode(value):
+                result = (result * base + byte) & mask
+        return result
+
+    @classmethod
+    def xxmix(cls, value):
+        """xxhash64-style: multiply-rotate 8-byte lanes, then avalanche
+            - an int that fits 64 bits is avalanched directly
+        """
+        kind = type(value)
+        if kind is int and -cls.MASK_64 <= value <= cls.MASK_64:
+            return cls.avalanche(
+                (cls.XX_PRIME_5 ^ value * cls.XX_PRIME_1) & cls.MASK_64)
+        data = value.encode() if kind is str else cls.encode(value)
+        length = len(data)
+        result = (cls.XX_PRIME_5 + length) & cls.MASK_64
+
+        offset = 0
+        while offset + 8 <= length:
+            lane = int.from_bytes(data[offset:offset + 8], 'little')
+            lane = cls.rotate_left((lane * cls.XX_PRIME_2) & cls.MASK_64, 31)
+            result ^= (lane * cls.XX_PRIME_1) & cls.MASK_64
+            result = (cls.rotate_left(result, 27) * cls.XX_PRIME_1
+                      + cls.XX_PRIME_4) & cls.MASK_64
+            offset += 8
+
+        for byte in data[offset:]:
+            result ^= (byte * cls.XX_PRIME_5) & cls.MASK_64
+            result = (cls.rotate_left(result, 11) * cls.XX_PRIME_1) & cls.MASK_64
+
+        return cls.avalanche(result)
+
+    @classmethod
+    def avalanche(cls, result):
+        """xxhash64 finalizer: every input bit affects every output bit"""
+        result ^= result >> 33
+        result = (result * cls.XX_PRIME_2) & cls.MASK_64
+        result ^= result >> 29
+        result = (result * cls.XX_PRIME_3) & cls.MASK_64
+        result ^= result >> 32
+        return result
+
+    @classmethod
+    def blake2b(cls, value):
+        """8-byte blake2b digest cast to int"""
+        data = value.encode() if type(value) is str else cls.encode(value)
+        return int.from_bytes(blake2b(data, digest_size=8).digest(), 'little')
+
+    @classmethod
+    def rotate_left(cls, value, bits):
+        """rotate a 64-bit int"""
+        return ((value << bits) | (value >> (64 - bits))) & cls.MASK_64
+
+
+def next_prime(number):
+    """smallest prime >= number"""
+    number = max(2, int(number))
+    while any(number % divisor == 0
+              for divisor in range(2, int(number ** 0.5) + 1)):
+        number += 1
+    return number
 
 
 class KeyValuePair(object):
     """ simple key-value pair """
 
-    def __init__(self, key, value):
-        for c in key:
-            assert c in HashFunction.ALPHABET
-
+    def __init__(self, key, value, hash=None, distance=0):
         self.key = key
         self.value = value
+        self.hash = hash  # full hash of key, cached so resizing never rehashes
+        self.distance = distance  # number of probes away from home index
 
     def __eq__(self, other):
         return self.key == other
+
+
+class Tombstone(object):
+    """
+    marks a deleted slot: probing continues past it, but it holds no item
+        - falsy, so filter(None, array) skips it like an empty slot
+    """
+
+    def __bool__(self):
+        return False
+
+    def __repr__(self):
+        return 'TOMBSTONE'
+
+
+TOMBSTONE = Tombstone()
+MISSING = object()  # lookup default, distinguishes missing keys from None
@@ -0,0 +1,128 @@
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from reconciliation import Reconciliation
+
+
+def reconcile_account(path, engine=Reconciliation):
+    """(path, failures, error) of one account file; runs in the workers"""
+    try:
+        reconcile = engine(input_path=path)
+        reconcile()
+    except Exception as error:
+        message = str(error)
+        return path, [], type(error).__name__ + (': ' + message if message
+                                                 else '')
+    return path, reconcile.invalid_positions, None
+
+
+class BatchReconciliation(object):
+    """
+    reconciles many account files in one pool of long-lived workers
+
+    1. inputs are directories (every PATTERN file inside), glob patterns
+       or plain paths; the account is the file name without extension
+    2. workers import once, and are handed CHUNKSIZE files at a time
+    3. failures stream into one combined output as results come back,
+       one 'ACCOUNT failure' line each, in input order
+    4. a file that cannot be reconciled is recorded in errors, and the
+       batch carries on
+    """
+    PATTERN = '*.in'
+    CHUNKSIZE = 16
+    ENGINE = Reconciliation
+
+    def __init__(self, inputs, output_path, workers=None, executor=None):
+        self.paths = self.input_paths(inputs)
+        self.output_path = output_path
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+        self.failing = []
+        self.errors = []
+        self.wall_time = None
+
+    @classmethod
+    def input_paths(cls, inputs):
+        """unique input files, in the given order"""
+        paths = []
+        for path in inputs:
+            if os.path.isdir(path):
+                paths.extend(sorted(glob.glob(os.path.join(path,
+                                                           cls.PATTERN))))
+            elif glob.has_magic(path):
+                paths.extend(sorted(glob.glob(path)))
+            else:
+                paths.append(path)
+        return list(dict.fromkeys(paths))
+
+    @staticmethod
+    def account(path):
+        return os.path.splitext(os.path.basename(path))[0]
+
+    def results(self):
+        """(path, failures, error) per input file, in input order"""
+        engines = [self.ENGINE] * len(self.paths)
+        if self.executor is not None:
+            for result in self.executor.map(reconcile_account, self.paths,
+                                            engines,
+                                            chunksize=self.CHUNKSIZE):
+                yield result
+            return
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            for result in executor.map(reconcile_account, self.paths,
+                                       engines, chunksize=self.CHUNKSIZE):
+                yield result
+
+    def __call__(self, summary=None):
+        """reconcile every file, then print the summary"""
+        start = time.perf_counter()
+        self.failing, self.errors = [], []
+        with open(self.output_path, 'w') as output:
+            for path, failures, error in self.results():
+                account = self.account(path)
+                if error is not None:
+                    self.errors.append((account, error))
+                elif failures:
+                    self.failing.append(account)
+                    output.writelines('{} {}\n'.format(account, failure)
+                                      for failure in failures)
+                    output.flush()
+        self.wall_time = time.perf_counter() - start
+        print(self, file=summary or sys.stdout)
+
+    def __str__(self):
+        return self.__repr__()
+
+    def __repr__(self):
+        """summary of failing and unreadable accounts"""
+        lines = ['reconciled {} accounts in {:.2f}s: {} failing, '
+                 '{} errors'.format(len(self.paths), self.wall_time or 0,
+                                    len(self.failing), len(self.errors))]
+        if self.failing:
+            lines.append('failing: ' + ' '.join(self.failing))
+        lines.extend('error: {} {}'.format(account, error)
+                     for account, error in self.errors)
+        return '\n'.join(lines)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(
+        description='reconcile many account files into one output')
+    parser.add_argument('inputs', nargs='+',
+                        help='input files, directories or glob patterns')
+    parser.add_argument('--output', default='batch.out')
+    parser.add_argument('--workers', type=int, default=None)
+    options = parser.parse_args(arguments)
+
+    batch = BatchReconciliation(options.inputs, options.output,
+                                options.workers)
+    batch()
+    return 1 if batch.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,97 @@
+import argparse
+import random
+import sys
+import timeit
+from decimal import Decimal
+from portfolio import Portfolio, PortfolioItem, Transaction
+
+
+def legacy_trade(portfolio, symbol, transaction_code, shares, value):
+    """
+    Portfolio.trade before the dispatch table, kept as the baseline: a
+    Transaction and a throwaway PortfolioItem per trade, an if/elif chain
+    """
+    assert transaction_code in Transaction.TRANSACTION_CODES
+    shares = Decimal(shares)
+    value = Decimal(value)
+    item = PortfolioItem(symbol, 0)
+    if not symbol == portfolio.cash.SYMBOL:
+        item = portfolio.items.get(symbol, item)
+
+    if transaction_code == Transaction.SELL:
+        item.shares -= shares
+        portfolio.cash.value += value
+    elif transaction_code == Transaction.BUY:
+        item.shares += shares
+        portfolio.cash.value -= value
+    elif transaction_code in (Transaction.DEPOSIT, Transaction.DIVIDEND):
+        portfolio.cash.value += value
+    elif transaction_code == Transaction.FEE:
+        portfolio.cash.value -= value
+
+    if transaction_code in (Transaction.SELL, Transaction.BUY):
+        portfolio.items[symbol] = item
+
+
+class TradeBenchmark(object):
+    """
+    trades per second through Portfolio.trade, against legacy_trade
+
+    trades are split D1-TRN lines over NUM_SYMBOLS symbols, mostly BUY
+    & SELL as in a real book
+    """
+    NUM_TRADES = 100000
+    NUM_SYMBOLS = 1000
+    CODES = (Transaction.BUY,) * 4 + (Transaction.SELL,) * 4 + (
+        Transaction.DIVIDEND, Transaction.FEE)
+    REPEAT = 3
+
+    def __init__(self, num_trades=None, seed=0):
+        generator = random.Random(seed)
+        self.trades = [
+            ('S{}'.format(generator.randrange(self.NUM_SYMBOLS)),
+             generator.choice(self.CODES), str(generator.randint(1, 500)),
+             '{}.{:02d}'.format(generator.randint(1, 99999),
+                                generator.randrange(100)))
+            for trade in range(num_trades or self.NUM_TRADES)]
+
+    def throughput(self, trade):
+        """best-of-REPEAT trades per second, from an empty portfolio"""
+        trades = self.trades
+
+        def run():
+            portfolio = Portfolio()
+            for symbol, code, shares, value in trades:
+                trade(portfolio, symbol, code, shares, value)
+
+        best = min(timeit.repeat(run, number=1, repeat=self.REPEAT))
+        return len(trades) / best
+
+    def results(self):
+        return {
+            'legacy': self.throughput(legacy_trade),
+            'trade': self.throughput(Portfolio.trade),
+        }
+
+    def report(self):
+        results = self.results()
+        lines = ['{:<8} {:>14}'.format('path', 'trades/s')]
+        lines.extend('{:<8} {:>14,.0f}'.format(name, results[name])
+                     for name in ('legacy', 'trade'))
+        lines.append('speedup  {:>13.2f}x'.format(
+            results['trade'] / results['legacy']))
+        return '\n'.join(lines)
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(
+        description='trade application micro-benchmark')
+    parser.add_argument('--num-trades', type=int,
+                        default=TradeBenchmark.NUM_TRADES)
+    options = parser.parse_args(arguments)
+    print(TradeBenchmark(options.num_trades).report())
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,46 @@
+import os
+from portfolio import Cash, Portfolio, PortfolioItem
+
+
+class Checkpoint(object):
+    """
+    lossless text checkpoint of a Portfolio, at the end of a day
+
+    1. header: MAGIC, VERSION & day
+    2. 'Cash value', then one 'SYMBOL shares' line per position, sorted
+
+    Decimals are written with str(), which round-trips exactly (trailing
+    zeros & exponent included); positions are restored as items, so even
+    a 'Cash' position (see Transaction) stays apart from the cash balance
+
+    dump writes a temporary file and renames it over target, so a crash
+    never leaves half a checkpoint behind
+    """
+    MAGIC = 'RECON-CHECKPOINT'
+    VERSION = 1
+
+    @classmethod
+    def dump(cls, portfolio, day, target):
+        temporary = target + '.tmp'
+        with open(temporary, 'w') as output:
+            output.write('{} {} {}\n'.format(cls.MAGIC, cls.VERSION, day))
+            output.write('{}\n'.format(portfolio.cash))
+            output.writelines('{}\n'.format(item) for item in portfolio)
+        os.replace(temporary, target)
+
+    @classmethod
+    def load(cls, source):
+        """(day, Portfolio) of a checkpoint file"""
+        with open(source, 'r') as checkpoint:
+            header = checkpoint.readline().split()
+            if len(header) != 3 or header[0] != cls.MAGIC or \
+                    header[1] != str(cls.VERSION):
+                raise ValueError('not a portfolio checkpoint')
+
+            symbol, value = checkpoint.readline().split()
+            assert symbol == Cash.SYMBOL
+            portfolio = Portfolio(cash=value)
+            for line in checkpoint:
+                symbol, shares = line.split()
+                portfolio.items[symbol] = PortfolioItem(symbol, shares)
+        return int(header[2]), portfolio
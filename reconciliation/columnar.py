@@ -0,0 +1,280 @@
+from array import array
+from decimal import Decimal
+from itertools import groupby, islice
+from operator import itemgetter, methodcaller
+from portfolio import Cash, Portfolio, PortfolioItem, Transaction
+from parser import ReconciliationInputParser
+from reconciliation import Reconciliation
+
+try:
+    import numpy
+except ImportError:  # optional, ColumnarReconciliation falls back to Decimal
+    numpy = None
+
+
+class FixedPointError(ArithmeticError):
+    """value has no int64 fixed-point representation"""
+
+
+class FixedPoint(object):
+    """
+    exact decimals as (integer mantissa, exponent) pairs, i.e. m * 10 ** e
+
+    exponents follow Decimal: a sum takes the smallest exponent of its
+    terms, so '1.50' + '2' is (350, -2) and renders as 3.50
+    """
+    MAX_DIGITS = 18  # fits int64, and well within Decimal's 28 digits
+    DROP_POINT = methodcaller('replace', '.', '', 1)
+    FIND_POINT = methodcaller('find', '.')
+
+    @staticmethod
+    def parse(text):
+        whole, _, fraction = text.partition('.')
+        if '_' not in text:
+            try:
+                return int(whole + fraction), -len(fraction)
+            except ValueError:
+                pass
+
+        sign, digits, exponent = Decimal(text).as_tuple()
+        if not isinstance(exponent, int):
+            raise FixedPointError('{} is not finite'.format(text))
+        mantissa = int(''.join(map(str, digits)))
+        return -mantissa if sign else mantissa, exponent
+
+    @classmethod
+    def parse_column(cls, texts):
+        """
+        (mantissas, exponents) arrays of many decimal strings
+
+        plain decimals are converted with C-level maps, anything else
+        (exponents, underscores, errors) through parse one at a time
+        """
+        try:
+            if '_' in ''.join(texts):
+                raise ValueError('underscores')
+            mantissas = array('q', map(int, map(cls.DROP_POINT, texts)))
+        except ValueError:
+            mantissas, exponents = zip(*map(cls.parse, texts))
+            return array('q', mantissas), array('i', exponents)
+
+        points = numpy.fromiter(map(cls.FIND_POINT, texts), numpy.int64,
+                                len(texts))
+        lengths = numpy.fromiter(map(len, texts), numpy.int64, len(texts))
+        exponents = numpy.where(points >= 0, points - lengths + 1, 0)
+        return mantissas, array('i', exponents.astype(numpy.int32).tobytes())
+
+    @classmethod
+    def rescale(cls, mantissa, exponent, target):
+        """mantissa at a smaller exponent, bounded to MAX_DIGITS"""
+        mantissa *= 10 ** (exponent - target)
+        if abs(mantissa) >= 10 ** cls.MAX_DIGITS:
+            raise FixedPointError('{}e{} overflows'.format(mantissa, target))
+        return mantissa
+
+    @classmethod
+    def add(cls, left, right, exponent=None):
+        """
+        sum at the smallest exponent of the terms, or at exponent, which
+        the caller knows the sum to be a multiple of
+        """
+        working = min(left[1], right[1])
+        mantissa = cls.rescale(left[0], left[1], working) + \
+            cls.rescale(right[0], right[1], working)
+        if exponent is None:
+            return mantissa, working
+        return mantissa // 10 ** (exponent - working), exponent
+
+    @staticmethod
+    def to_decimal(mantissa, exponent):
+        return Decimal((int(mantissa < 0),
+                        tuple(map(int, str(abs(mantissa)))), exponent))
+
+
+class TradeColumns(object):
+    """
+    D1 transactions as parallel int columns, plus the (few) positions
+
+    1. symbols are interned to ids, transaction codes to their index in
+       Transaction.TRANSACTION_CODES
+    2. shares & value are kept as mantissa and exponent columns, and
+       only aligned to one fixed-point scale at aggregation time
+    """
+    CODE_IDS = dict((code, index) for index, code in
+                    enumerate(Transaction.TRANSACTION_CODES))
+    NO_EXPONENT = 2 ** 31 - 1  # above any int32 exponent column entry
+    BATCH = 4096  # split lines are GC-tracked, keep few alive at once
+
+    def __init__(self):
+        self.symbol_ids = {}
+        self.symbols = []
+        self.ids = array('q')
+        self.codes = array('b')
+        self.shares = array('q')
+        self.share_exponents = array('i')
+        self.values = array('q')
+        self.value_exponents = array('i')
+        self.positions = {}  # symbol: (mantissa, exponent), last one wins
+        self.cash = (0, 0)
+        self.closing_positions = {}
+        self.closing_cash = (0, 0)
+
+    def append_trades(self, trades):
+        """append a batch of split transaction lines, column by column"""
+        if set(map(len, trades)) != {4}:
+            raise ValueError('transactions are: symbol, code, shares, value')
+        symbols, codes, shares, values = zip(*trades)
+        assert set(codes).issubset(self.CODE_IDS)
+        symbol_ids = self.symbol_ids
+        for symbol in set(symbols).difference(symbol_ids):
+            symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        self.ids.extend(map(symbol_ids.__getitem__, symbols))
+        self.codes.extend(map(self.CODE_IDS.__getitem__, codes))
+        for mantissas, exponents, texts in (
+                (self.shares, self.share_exponents, shares),
+                (self.values, self.value_exponents, values)):
+            try:
+                column = FixedPoint.parse_column(texts)
+            except OverflowError as error:
+                raise FixedPointError(str(error))
+            mantissas.extend(column[0])
+            exponents.extend(column[1])
+
+    def append_position(self, line, closing=False):
+        symbol, shares_or_value = line.split()
+        amount = FixedPoint.parse(shares_or_value)
+        if symbol != Cash.SYMBOL:
+            positions = self.closing_positions if closing else self.positions
+            positions[symbol] = amount
+        elif closing:
+            self.closing_cash = FixedPoint.add(self.closing_cash, amount)
+        else:
+            self.cash = FixedPoint.add(self.cash, amount)
+
+    @classmethod
+    def from_records(cls, records):
+        """columns of a reconciliation input, BATCH transactions at a time"""
+        columns = cls()
+        for section, group in groupby(records, itemgetter(0)):
+            if section != ReconciliationInputParser.D1_TRN:
+                closing = section == ReconciliationInputParser.D1_POS
+                for _, line in group:
+                    columns.append_position(line, closing)
+                continue
+
+            trades = [line.split() for _, line in islice(group, cls.BATCH)]
+            while trades:
+                columns.append_trades(trades)
+                trades = [line.split() for _, line in
+                          islice(group, cls.BATCH)]
+        return columns
+
+    def column(self, values, dtype=None):
+        return numpy.frombuffer(values, dtype=dtype or numpy.int64)
+
+    def scaled(self, mantissas, exponents, signs):
+        """
+        (signed int64 amounts, shared exponent) of a mantissa column
+
+        raises FixedPointError rather than let int64 sums wrap around
+        """
+        if not len(mantissas):
+            return numpy.zeros(0, dtype=numpy.int64), 0
+        exponent = min(0, int(exponents.min()))
+        shifts = exponents.astype(numpy.int64) - exponent
+        if int(shifts.max()) > FixedPoint.MAX_DIGITS:
+            raise FixedPointError('exponents too far apart')
+        factors = numpy.power(10, shifts, dtype=numpy.int64)
+        bound = numpy.abs(mantissas.astype(numpy.float64)) * factors
+        if bound.sum() >= 10.0 ** FixedPoint.MAX_DIGITS:
+            raise FixedPointError('sum of transactions overflows')
+        return mantissas * factors * signs, exponent
+
+    def difference(self):
+        """closing minus the traded portfolio, as Portfolio.__sub__"""
+        # signed effect of each transaction code, per Transaction.__call__
+        share_signs = numpy.zeros(len(self.CODE_IDS), dtype=numpy.int64)
+        share_signs[self.CODE_IDS[Transaction.BUY]] = 1
+        share_signs[self.CODE_IDS[Transaction.SELL]] = -1
+        cash_signs = -share_signs
+        cash_signs[self.CODE_IDS[Transaction.DEPOSIT]] = 1
+        cash_signs[self.CODE_IDS[Transaction.DIVIDEND]] = 1
+        cash_signs[self.CODE_IDS[Transaction.FEE]] = -1
+
+        ids = self.column(self.ids)
+        codes = self.column(self.codes, numpy.int8)
+        share_exponents = self.column(self.share_exponents, numpy.int32)
+        value_exponents = self.column(self.value_exponents, numpy.int32)
+        shares, share_exponent = self.scaled(
+            self.column(self.shares), share_exponents, share_signs[codes])
+        values, value_exponent = self.scaled(
+            self.column(self.values), value_exponents, cash_signs[codes])
+
+        # only BUY & SELL create or touch positions
+        trades = share_signs[codes] != 0
+        deltas = numpy.zeros(len(self.symbols), dtype=numpy.int64)
+        numpy.add.at(deltas, ids[trades], shares[trades])
+        traded = numpy.bincount(ids[trades], minlength=len(self.symbols)) > 0
+        exponents = numpy.full(len(self.symbols), self.NO_EXPONENT)
+        numpy.minimum.at(exponents, ids[trades], share_exponents[trades])
+
+        diff = Portfolio()
+        cash = FixedPoint.add(self.cash, (int(values.sum()), value_exponent))
+        closing_cash = FixedPoint.add(self.closing_cash, (-cash[0], cash[1]))
+        diff.cash = Cash(FixedPoint.to_decimal(*closing_cash))
+
+        positions = {}
+        for symbol, symbol_id in self.symbol_ids.items():
+            if traded[symbol_id]:
+                # new positions start from PortfolioItem(symbol, 0)
+                position = self.positions.get(symbol, (0, 0))
+                positions[symbol] = FixedPoint.add(
+                    position, (int(deltas[symbol_id]), share_exponent),
+                    min(position[1], int(exponents[symbol_id])))
+        symbol_id = self.symbol_ids.get(Cash.SYMBOL)
+        if symbol_id is not None and traded[symbol_id]:
+            # Transaction never looks a 'Cash' position up: the last BUY
+            # or SELL replaces it with a fresh PortfolioItem
+            last = numpy.nonzero(trades & (ids == symbol_id))[0][-1]
+            positions[Cash.SYMBOL] = FixedPoint.add((0, 0), (
+                self.shares[last] * int(share_signs[codes[last]]),
+                int(share_exponents[last])))
+
+        for symbol in set(self.positions).union(
+                positions, self.closing_positions):
+            position = positions.get(symbol) or \
+                self.positions.get(symbol, (0, 0))
+            closing = self.closing_positions.get(symbol, (0, 0))
+            mantissa, exponent = FixedPoint.add(
+                closing, (-position[0], position[1]))
+            diff.items[symbol] = PortfolioItem(
+                symbol, FixedPoint.to_decimal(mantissa, exponent))
+        return diff
+
+
+class ColumnarReconciliation(Reconciliation):
+    """
+    Reconciliation on int64 fixed-point columns, aggregated with NumPy
+
+    1. transactions are parsed into TradeColumns once, without building
+       a Transaction, PortfolioItem or Decimal per trade
+    2. per-symbol share deltas & the cash delta are vectorized group-bys
+       (numpy.add.at), then diffed against the D1 positions per symbol
+    3. exponents are tracked as Decimal would, so the output is the same,
+       digit for digit
+
+    falls back to the Decimal engine without NumPy, or for values that
+    do not fit int64 fixed point (non-finite, or over 18 digits)
+    """
+
+    def reconcile(self):
+        if numpy is None:
+            return super(ColumnarReconciliation, self).reconcile()
+
+        try:
+            columns = TradeColumns.from_records(self.records())
+            self.reconciled_portfolio = columns.difference()
+        except FixedPointError:
+            return super(ColumnarReconciliation, self).reconcile()
+        self.process_invalid_positions()
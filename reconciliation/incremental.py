@@ -0,0 +1,95 @@
+from portfolio import Portfolio, PortfolioItem, Transaction
+from parser import ReconciliationInputParser
+from reconciliation import Reconciliation
+
+
+class IncrementalReconciliation(Reconciliation):
+    """
+    long-lived reconciliation, updated as trades & reports arrive
+
+    1. open_position (D0), trade (D1-TRN) and report_position (D1-POS)
+       update the running portfolio & the reported closing portfolio in
+       place, and mark what they touched as dirty
+    2. process_invalid_positions re-diffs only the dirty symbols (and
+       cash), with the same PortfolioItem arithmetic as Portfolio.__sub__,
+       and keeps the set of failing symbols up to date
+
+    a break check costs O(changes since the last check), rather than
+    O(book size); reconcile() replays a whole input through the same path
+    """
+
+    def __init__(self, input_path=None, output_path=None, streaming=True):
+        super(IncrementalReconciliation, self).__init__(
+            input_path, output_path, streaming)
+        self.reset()
+
+    def reset(self):
+        self.portfolio = Portfolio()
+        self.closing_portfolio = Portfolio()
+        self.reconciled_portfolio = Portfolio()
+        self.dirty = set()
+        self.cash_dirty = True
+        self.failing = set()
+        self.invalid_positions = []
+
+    def open_position(self, position):
+        """a Day-0 position line"""
+        self.update_position(self.portfolio, position)
+
+    def report_position(self, position):
+        """a reported position line"""
+        self.update_position(self.closing_portfolio, position)
+
+    def update_position(self, portfolio, position):
+        portfolio.initialize_position((position,))
+        symbol = position.split(None, 1)[0]
+        if symbol == portfolio.cash.SYMBOL:
+            self.cash_dirty = True
+        else:
+            self.dirty.add(symbol)
+
+    def trade(self, symbol, transaction_code, shares, value):
+        self.portfolio.trade(symbol, transaction_code, shares, value)
+        self.cash_dirty = True
+        if transaction_code in (Transaction.BUY, Transaction.SELL):
+            self.dirty.add(symbol)
+
+    def feed(self, records):
+        """apply (section, line) records, as from stream_records"""
+        for section, line in records:
+            if section == ReconciliationInputParser.D1_TRN:
+                self.trade(*line.split())
+            elif section == ReconciliationInputParser.D0_POS:
+                self.open_position(line)
+            else:
+                self.report_position(line)
+
+    def reconcile(self):
+        self.reset()
+        self.feed(self.records())
+        self.process_invalid_positions()
+
+    def process_invalid_positions(self):
+        """re-check what changed since the last call"""
+        diff = self.reconciled_portfolio
+        if self.cash_dirty:
+            diff.cash = self.closing_portfolio.cash - self.portfolio.cash
+            self.cash_dirty = False
+
+        for symbol in self.dirty:
+            closing = self.closing_portfolio.items.get(
+                symbol, PortfolioItem(symbol, 0))
+            position = self.portfolio.items.get(
+                symbol, PortfolioItem(symbol, 0))
+            diff.items[symbol] = closing - position
+            if self.fails_reconciliation(diff.items[symbol]):
+                self.failing.add(symbol)
+            else:
+                self.failing.discard(symbol)
+        self.dirty.clear()
+
+        self.invalid_positions = []
+        if self.fails_reconciliation(diff.cash):
+            self.invalid_positions.append(str(diff.cash))
+        self.invalid_positions.extend(
+            str(diff.items[symbol]) for symbol in sorted(self.failing))
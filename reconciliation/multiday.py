@@ -0,0 +1,100 @@
+import argparse
+import sys
+from checkpoint import Checkpoint
+from portfolio import Portfolio
+from parser import ReconciliationInputParser
+from reconciliation import Reconciliation
+
+
+class MultiDayReconciliation(Reconciliation):
+    """
+    reconciles chained days: D0-POS, D1-TRN, D1-POS, D2-TRN, D2-POS, ...
+
+    1. day N's trades apply to the portfolio carried over from day N-1,
+       and the result is diffed against the reported DN-POS
+    2. with checkpoint_path (a pattern such as 'D{}.checkpoint'), the
+       carried portfolio is checkpointed at the end of every day
+    3. start resumes from a checkpoint file: days up to its day are
+       skipped, so re-running day N costs day N's transactions only;
+       until stops after that day
+
+    failures of every day are listed as 'Dn failure' lines, per day in
+    self.days; reconciled_portfolio is the last day's diff
+    """
+
+    def __init__(self, input_path=None, output_path=None,
+                 checkpoint_path=None, start=None, until=None):
+        super(MultiDayReconciliation, self).__init__(input_path, output_path)
+        self.checkpoint_path = checkpoint_path
+        self.start = start
+        self.until = until
+        self.days = {}
+
+    def records(self):
+        return ReconciliationInputParser.stream_records(self.input_path,
+                                                        days=True)
+
+    def reconcile(self):
+        self.days = {}
+        first, portfolio = Checkpoint.load(self.start) if self.start \
+            else (None, Portfolio())
+        current = closing_portfolio = None
+        for section, line in self.records():
+            day, kind = ReconciliationInputParser.day(section)
+            if first is not None and day <= first:
+                continue
+            if self.until is not None and day > self.until:
+                break
+
+            if day != current:
+                assert current is None or day > current
+                self.close_day(current, portfolio, closing_portfolio)
+                current, closing_portfolio = day, Portfolio()
+
+            if kind == ReconciliationInputParser.TRN:
+                portfolio.trade(*line.split())
+            elif day == 0:
+                portfolio.initialize_position((line,))
+            else:
+                closing_portfolio.initialize_position((line,))
+        self.close_day(current, portfolio, closing_portfolio)
+
+        self.invalid_positions = [
+            'D{} {}'.format(day, failure) for day in sorted(self.days)
+            for failure in self.days[day]]
+
+    def close_day(self, day, portfolio, closing_portfolio):
+        """reconcile, then checkpoint, a finished day"""
+        if day is None:
+            return
+
+        if day > 0:
+            self.reconciled_portfolio = closing_portfolio - portfolio
+            self.process_invalid_positions()
+            self.days[day] = self.invalid_positions
+        if self.checkpoint_path:
+            Checkpoint.dump(portfolio, day, self.checkpoint_path.format(day))
+
+
+def main(arguments=None):
+    parser = argparse.ArgumentParser(
+        description='reconcile chained days, with portfolio checkpoints')
+    parser.add_argument('input')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--checkpoints', default=None,
+                        help="checkpoint path pattern, e.g. 'D{}.checkpoint'")
+    parser.add_argument('--start', default=None,
+                        help='checkpoint to resume from')
+    parser.add_argument('--until', type=int, default=None,
+                        help='last day to reconcile')
+    options = parser.parse_args(arguments)
+
+    reconcile = MultiDayReconciliation(
+        options.input, options.output, options.checkpoints, options.start,
+        options.until)
+    reconcile(write=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
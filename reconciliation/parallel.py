@@ -0,0 +1,113 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from decimal import Decimal
+from portfolio import Cash, Portfolio, Transaction
+from parser import ReconciliationInputParser
+from reconciliation import Reconciliation
+
+
+def apply_trades(trades):
+    """
+    (shares per symbol, cash) deltas of transaction lines; runs in the
+    worker processes
+
+    a share delta is the plain sum of the traded Decimals: a position
+    opened at 0 would add exponent 0 to it (0 + 1E+2 is 100), and only
+    merge knows whether the position is new. other transactions go
+    through Portfolio.trade
+    """
+    portfolio = Portfolio()
+    shares = {}
+    for trade in trades:
+        symbol, transaction_code, quantity, value = trade.split()
+        if transaction_code == Transaction.BUY:
+            delta = Decimal(quantity)
+            portfolio.cash.value -= Decimal(value)
+        elif transaction_code == Transaction.SELL:
+            delta = -Decimal(quantity)
+            portfolio.cash.value += Decimal(value)
+        else:
+            portfolio.trade(symbol, transaction_code, quantity, value)
+            continue
+
+        if symbol in shares and symbol != Cash.SYMBOL:
+            shares[symbol] += delta
+        else:
+            # a 'Cash' position starts anew on every trade
+            shares[symbol] = delta
+    return shares, portfolio.cash.value
+
+
+class ParallelReconciliation(Reconciliation):
+    """
+    Reconciliation with D1 transactions traded across a process pool
+
+    1. transactions are cut into chunks of CHUNK consecutive lines, and
+       every chunk is traded by a worker with Portfolio.trade, returning
+       the share delta of each symbol it bought or sold, and the cash delta
+    2. deltas are merged into the D0 portfolio in submission order; at
+       most MAX_PENDING chunks per worker are in flight, so memory stays
+       bounded as the input streams through
+
+    positions only ever add up (cash included), so merging chunk deltas
+    in order equals trading serially; chunks are cut by position rather
+    than by symbol, which would cost the parent a split & hash per line
+
+    executor reuses a pool across reconciliations, else one of workers
+    processes is started per reconcile()
+    """
+    CHUNK = 20000
+    MAX_PENDING = 2
+
+    def __init__(self, input_path=None, output_path=None, streaming=True,
+                 workers=None, executor=None):
+        super(ParallelReconciliation, self).__init__(
+            input_path, output_path, streaming)
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = executor
+
+    def reconcile(self):
+        if self.executor is not None:
+            return self.reconcile_with(self.executor)
+
+        with ProcessPoolExecutor(self.workers) as executor:
+            self.reconcile_with(executor)
+
+    def reconcile_with(self, executor):
+        """as Reconciliation.reconcile, with trades applied by executor"""
+        portfolio = Portfolio()
+        closing_portfolio = Portfolio()
+        chunk = []
+        pending = deque()
+        for section, line in self.records():
+            if section == ReconciliationInputParser.D1_TRN:
+                chunk.append(line)
+                if len(chunk) < self.CHUNK:
+                    continue
+                pending.append(executor.submit(apply_trades, chunk))
+                chunk = []
+                while len(pending) > self.MAX_PENDING * self.workers:
+                    self.merge(portfolio, pending.popleft().result())
+            elif section == ReconciliationInputParser.D0_POS:
+                portfolio.initialize_position((line,))
+            else:
+                closing_portfolio.initialize_position((line,))
+
+        if chunk:
+            pending.append(executor.submit(apply_trades, chunk))
+        while pending:
+            self.merge(portfolio, pending.popleft().result())
+
+        self.reconciled_portfolio = closing_portfolio - portfolio
+        self.process_invalid_positions()
+
+    @staticmethod
+    def merge(portfolio, deltas):
+        """add the (shares, cash) deltas of a chunk to portfolio"""
+        shares, cash = deltas
+        portfolio.cash.value += cash
+        for symbol, delta in shares.items():
+            # new positions open at 0 here, as when trading serially, and
+            # a 'Cash' position is replaced rather than updated
+            portfolio.position(symbol).shares += delta
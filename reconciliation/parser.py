@@ -1,12 +1,25 @@
+import io
+import re
 
 
 class ReconciliationInputParser(object):
     """
     parses recon.in / stream of data
+        - eagerly into three lists of lines (d0_position, d1_transactions,
+          d1_position), or
+        - lazily with stream_records: (section, line) pairs in file order,
+          holding one line in memory at a time
+
+    stream_records(days=True) also reads chained days: D0-POS, D1-TRN,
+    D1-POS, D2-TRN, D2-POS, ...
     """
     D0_POS = 'D0-POS'
     D1_TRN = 'D1-TRN'
     D1_POS = 'D1-POS'
+    SECTIONS = (D0_POS, D1_TRN, D1_POS)
+    POS = 'POS'
+    TRN = 'TRN'
+    DAY_SECTION = re.compile(r'D(\d+)-(POS|TRN)$')
 
     def __init__(self, path=None, stream=None):
         """reads path or stream"""
@@ -28,21 +41,66 @@ class ReconciliationInputParser(object):
             lines = stream.splitlines()
         return lines
 
-    def parse_input(self):
-        assert self.lines[0] == self.D0_POS
-        bucket = self.d0_position
-        for line in self.lines[1:]:
+    @staticmethod
+    def iter_lines(path=None, stream=None):
+        """lazily read path or stream, line by line"""
+        assert bool(path) != bool(stream)
+        if path:
+            with open(path, 'r') as input_stream:
+                for line in input_stream:
+                    yield line
+        else:
+            for line in io.StringIO(stream):
+                yield line
+
+    @classmethod
+    def records(cls, lines, days=False):
+        """
+        tag every non-empty line with the section it belongs to; days
+        accepts any Dn-POS / Dn-TRN section, and any of them first
+        """
+        section = None
+        for line in lines:
+            line = line.rstrip('\r\n')
+            if section is None:
+                assert line == cls.D0_POS or \
+                    days and cls.DAY_SECTION.match(line)
             if not len(line):
                 continue
 
-            if line == self.D1_TRN:
-                bucket = self.d1_transactions
-                continue
-            elif line == self.D1_POS:
-                bucket = self.d1_position
+            if line in cls.SECTIONS or days and cls.DAY_SECTION.match(line):
+                section = line
                 continue
 
-            bucket.append(line)
+            yield section, line
+
+    @classmethod
+    def stream_records(cls, path=None, stream=None, days=False):
+        """constant memory alternative to parsing: (section, line) pairs"""
+        return cls.records(cls.iter_lines(path, stream), days)
+
+    @classmethod
+    def day(cls, section):
+        """(day, POS or TRN) of a section"""
+        day, kind = cls.DAY_SECTION.match(section).groups()
+        return int(day), kind
+
+    def parse_input(self):
+        buckets = {
+            self.D0_POS: self.d0_position,
+            self.D1_TRN: self.d1_transactions,
+            self.D1_POS: self.d1_position,
+        }
+        for section, line in self.records(self.lines):
+            buckets[section].append(line)
+
+    def __iter__(self):
+        """parsed lines as (section, line) pairs, as stream_records"""
+        for section, lines in ((self.D0_POS, self.d0_position),
+                               (self.D1_TRN, self.d1_transactions),
+                               (self.D1_POS, self.d1_position)):
+            for line in lines:
+                yield section, line
 
 
 class OutputStream(object):
@@ -1,7 +1,37 @@
+import sys
 from decimal import Decimal
 
 
+def buy(portfolio, symbol, shares, value):
+    item = portfolio.position(symbol)
+    item.shares += Decimal(shares)
+    portfolio.cash.value -= Decimal(value)
+    return item
+
+
+def sell(portfolio, symbol, shares, value):
+    item = portfolio.position(symbol)
+    item.shares -= Decimal(shares)
+    portfolio.cash.value += Decimal(value)
+    return item
+
+
+def credit(portfolio, symbol, shares, value):
+    portfolio.cash.value += Decimal(value)
+
+
+def debit(portfolio, symbol, shares, value):
+    portfolio.cash.value -= Decimal(value)
+
+
 class Transaction(object):
+    """
+    applies a transaction code to a portfolio, through TRADES: a dispatch
+    table from code to function(portfolio, symbol, shares, value), which
+    returns the position for BUY & SELL, else None
+
+    positions are updated in place, and only BUY & SELL parse shares
+    """
     BUY = 'BUY'
     SELL = 'SELL'
     FEE = 'FEE'
@@ -10,39 +40,27 @@ class Transaction(object):
     TRANSACTION_CODES = (
         BUY, SELL, FEE, DEPOSIT, DIVIDEND
     )
+    TRADES = {
+        sys.intern(BUY): buy,
+        sys.intern(SELL): sell,
+        sys.intern(FEE): debit,
+        sys.intern(DEPOSIT): credit,
+        sys.intern(DIVIDEND): credit,
+    }
 
     def __init__(self, portfolio):
         self.portfolio = portfolio
 
     def __call__(self, symbol, transaction_code, shares, value):
-        assert transaction_code in Transaction.TRANSACTION_CODES
-        shares = Decimal(shares)
-        value = Decimal(value)
-        item = PortfolioItem(symbol, 0)
-        if not symbol == self.portfolio.cash.SYMBOL:
-            item = self.portfolio.items.get(symbol, item)
-
-        if transaction_code == Transaction.SELL:
-            item.shares -= shares
-            self.portfolio.cash.value += value
-
-        elif transaction_code == Transaction.BUY:
-            item.shares += shares
-            self.portfolio.cash.value -= value
-
-        elif transaction_code in (Transaction.DEPOSIT, Transaction.DIVIDEND):
-            self.portfolio.cash.value += value
-
-        elif transaction_code == Transaction.FEE:
-            self.portfolio.cash.value -= value
-
-        return item if transaction_code in (Transaction.SELL, Transaction.BUY) \
-            else None
+        trade = self.TRADES.get(transaction_code)
+        assert trade is not None
+        return trade(self.portfolio, symbol, shares, value)
 
 
 class PortfolioItem(object):
     """ position in the account
     """
+    __slots__ = ('symbol', 'shares')
 
     def __init__(self, symbol, shares):
         self.symbol = symbol
@@ -69,6 +87,7 @@ class PortfolioItem(object):
 
 class Cash(object):
     SYMBOL = 'Cash'
+    __slots__ = ('value',)
 
     def __init__(self, value):
         self.value = Decimal(value)
@@ -111,10 +130,17 @@ class Portfolio(object):
 
     def trade(self, symbol, transaction_code, shares, value):
         """apply transaction to cash and positions"""
-        transaction = Transaction(portfolio=self)
-        item = transaction(symbol, transaction_code, shares, value)
-        if item is not None:
-            self.items[symbol] = item
+        trade = Transaction.TRADES.get(transaction_code)
+        assert trade is not None
+        trade(self, symbol, shares, value)
+
+    def position(self, symbol):
+        """position of symbol, opened at 0 shares if new"""
+        item = self.items.get(symbol)
+        if item is None or symbol == self.cash.SYMBOL:
+            # a 'Cash' position is never looked up, each trade starts anew
+            item = self.items[symbol] = PortfolioItem(symbol, 0)
+        return item
 
     def initialize_position(self, positions):
         """load cash and positions"""
@@ -12,10 +12,16 @@ class Reconciliation(object):
     DEFAULT_INPUT = 'recon.in'
     DEFAULT_OUTPUT = 'recon.out'
 
-    def __init__(self, input_path=None, output_path=None):
+    def __init__(self, input_path=None, output_path=None, streaming=True):
+        """
+        streaming reads the input lazily while reconciling, so memory
+        scales with the number of symbols rather than transactions;
+        otherwise it is parsed up front (self.parser)
+        """
         self.input_path = input_path or self.DEFAULT_INPUT
         self.output_path = output_path or self.DEFAULT_OUTPUT
-        self.parser = ReconciliationInputParser(self.input_path)
+        self.parser = None if streaming else \
+            ReconciliationInputParser(self.input_path)
         self.output = OutputStream(self.output_path)
         self.reconciled_portfolio = None
         self.invalid_positions = []
@@ -25,17 +31,30 @@ class Reconciliation(object):
         if write:
             self.write()
 
+    def records(self):
+        """(section, line) pairs of the input"""
+        if self.parser is None:
+            return ReconciliationInputParser.stream_records(self.input_path)
+        return iter(self.parser)
+
     def reconcile(self):
         """
         1. initialize portfolio from Day-0 position
         2. take portfolio through day trades
         3. compare to reported portfolio position
+
+        applied record by record, in a single pass over the input
         """
-        portfolio = Portfolio(positions=self.parser.d0_position)
-        for trade in self.parser.d1_transactions:
-            portfolio.trade(*trade.split())
+        portfolio = Portfolio()
+        closing_portfolio = Portfolio()
+        for section, line in self.records():
+            if section == ReconciliationInputParser.D1_TRN:
+                portfolio.trade(*line.split())
+            elif section == ReconciliationInputParser.D0_POS:
+                portfolio.initialize_position((line,))
+            else:
+                closing_portfolio.initialize_position((line,))
 
-        closing_portfolio = Portfolio(positions=self.parser.d1_position)
         self.reconciled_portfolio = closing_portfolio - portfolio
         self.process_invalid_positions()
 
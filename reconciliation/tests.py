@@ -2,8 +2,20 @@ from unittest import TestCase
 from parser import ReconciliationInputParser, OutputStream
 from portfolio import Portfolio, PortfolioItem, Cash, Transaction
 from reconciliation import Reconciliation
+from columnar import ColumnarReconciliation, FixedPoint, FixedPointError, numpy
+from batch import BatchReconciliation, reconcile_account
+from checkpoint import Checkpoint
+from multiday import MultiDayReconciliation
+from benchmarks import TradeBenchmark, legacy_trade
+from incremental import IncrementalReconciliation
+from parallel import ParallelReconciliation, apply_trades
+from concurrent.futures import ProcessPoolExecutor
+from unittest import skipIf
 from decimal import Decimal
+import io
 import os
+import shutil
+import tempfile
 
 
 class PortfolioItemTestCase(TestCase):
@@ -20,6 +32,12 @@ class PortfolioItemTestCase(TestCase):
         item = PortfolioItem('TEST', 1000)
         self.assertEqual(str(item), 'TEST 1000')
 
+    def test_slots(self):
+        with self.assertRaises(AttributeError):
+            PortfolioItem('TEST', 1000).price = 1
+        with self.assertRaises(AttributeError):
+            Cash(1000).currency = 'USD'
+
 
 class CashTestCase(TestCase):
 
@@ -66,6 +84,26 @@ class PortfolioTestCase(TestCase):
         self.assertIn('TEST', portfolio)
         self.assertEqual(portfolio.items['TEST'].shares, Decimal(50))
 
+    def test__trade_in_place(self):
+        portfolio = Portfolio(positions=["TEST 100"])
+        item = portfolio.items['TEST']
+        portfolio.trade('TEST', Transaction.BUY, '10', '1')
+        self.assertIs(portfolio.items['TEST'], item)
+        self.assertEqual(item.shares, 110)
+        with self.assertRaises(AssertionError):
+            portfolio.trade('TEST', 'SPLIT', '2', '0')
+
+    def test__trade_matches_legacy(self):
+        for code in Transaction.TRANSACTION_CODES:
+            for symbol in ('TEST', 'NEW', Cash.SYMBOL):
+                portfolio = Portfolio(positions=["TEST 100", "Cash 1.5"])
+                legacy = Portfolio(positions=["TEST 100", "Cash 1.5"])
+                portfolio.trade(symbol, code, '2.50', '10')
+                legacy_trade(legacy, symbol, code, '2.50', '10')
+                self.assertEqual([str(item) for item in portfolio],
+                                 [str(item) for item in legacy])
+                self.assertEqual(str(portfolio.cash), str(legacy.cash))
+
 
 class TransactionTestCase(TestCase):
 
@@ -152,6 +190,39 @@ class InputParserTestCase(FixtureIOTestCase):
         self.assertEqual(len(parser.d1_transactions), 1)
         self.assertIn('TEST SELL 50 1000', parser.d1_transactions)
 
+    def test_stream_records(self):
+        records = list(ReconciliationInputParser.stream_records(
+            self.TEST_PATH))
+        self.assertEqual(records, list(ReconciliationInputParser(
+            self.TEST_PATH)))
+        self.assertEqual(records[2], ('D1-TRN', 'TEST SELL 50 1000'))
+        self.assertEqual(records[-1], ('D1-POS', 'Cash 223.12'))
+
+    def test_records_are_lazy(self):
+        """records are yielded as lines are read, not after the whole input"""
+        def lines():
+            yield 'D0-POS\n'
+            yield 'TEST 100\n'
+            raise AssertionError('read past the first record')
+
+        records = ReconciliationInputParser.records(lines())
+        self.assertEqual(next(records), ('D0-POS', 'TEST 100'))
+
+    def test_stream_records_days(self):
+        records = list(ReconciliationInputParser.stream_records(
+            stream='D2-TRN\nA BUY 1 1\nD2-POS\nA 1\nD10-TRN\n'
+                   'D10-TRN 1 1 1\n', days=True))
+        self.assertEqual(records, [('D2-TRN', 'A BUY 1 1'),
+                                   ('D2-POS', 'A 1'),
+                                   ('D10-TRN', 'D10-TRN 1 1 1')])
+        self.assertEqual(ReconciliationInputParser.day('D10-TRN'),
+                         (10, 'TRN'))
+
+    def test_stream_records_requires_day_0_position(self):
+        with self.assertRaises(AssertionError):
+            list(ReconciliationInputParser.stream_records(
+                stream='D1-TRN\nTEST SELL 50 1000'))
+
 
 class OutputStreamTest(TestCase):
     OUTPUT_PATH = 'test.out'
@@ -188,6 +259,12 @@ class ReconciliationTestCase(FixtureIOTestCase):
         self.assertIn('TEST 150', reconcile.invalid_positions)
         self.assertIn('Cash -900.00', reconcile.invalid_positions)
 
+    def test_reconciliation_not_streaming(self):
+        reconcile = Reconciliation(input_path=self.TEST_PATH, streaming=False)
+        reconcile()
+        self.assertEqual(['Cash -900.00', 'TEST 150'],
+                         reconcile.invalid_positions)
+
     def test_write(self):
         """ensure writing IO creates file"""
         reconcile = Reconciliation(input_path=self.TEST_PATH,
@@ -209,3 +286,298 @@ class ReconciliationTestCase(FixtureIOTestCase):
         os.remove(self.OUTPUT_PATH)
 
 
+class FixedPointTestCase(TestCase):
+
+    def test_parse(self):
+        self.assertEqual(FixedPoint.parse('123.12'), (12312, -2))
+        self.assertEqual(FixedPoint.parse('-0.5'), (-5, -1))
+        self.assertEqual(FixedPoint.parse('100'), (100, 0))
+        self.assertEqual(FixedPoint.parse('1E+2'), (1, 2))
+        self.assertEqual(FixedPoint.parse('1_000.0'), (10000, -1))
+        with self.assertRaises(FixedPointError):
+            FixedPoint.parse('NaN')
+
+    def test_add_keeps_decimal_exponent(self):
+        amount = FixedPoint.add(FixedPoint.parse('1.50'), (2, 0))
+        self.assertEqual(FixedPoint.to_decimal(*amount),
+                         Decimal('1.50') + Decimal('2'))
+        self.assertEqual(str(FixedPoint.to_decimal(*amount)), '3.50')
+
+    def test_rescale_overflow(self):
+        with self.assertRaises(FixedPointError):
+            FixedPoint.rescale(1, 18, 0)
+
+
+@skipIf(numpy is None, 'numpy is not installed')
+class ColumnarReconciliationTestCase(FixtureIOTestCase):
+    INPUT = '\n'.join((
+        'D0-POS', 'AAPL 10', 'GOOG 1.5', 'Cash 1000',
+        'D1-TRN',
+        'AAPL SELL 10 6000', 'GOOG BUY 2.25 1000.50', 'MSFT BUY 5 100',
+        'Cash DIVIDEND 0 12.345', 'IBM FEE 0 1', 'Cash BUY 3 0',
+        'D1-POS', 'AAPL 0', 'GOOG 4', 'IBM 1E+1', 'Cash 7000')) + '\n'
+
+    def reconcile(self, reconciliation_class, text):
+        with open(self.TEST_PATH, 'w') as test_file:
+            test_file.write(text)
+        reconcile = reconciliation_class(input_path=self.TEST_PATH)
+        reconcile()
+        return reconcile.invalid_positions
+
+    def test_matches_decimal_engine(self):
+        for text in (self.INPUT, self.INPUT.replace('Cash BUY 3 0', ''),
+                     'D0-POS\nD1-TRN\nD1-POS\n'):
+            self.assertEqual(self.reconcile(ColumnarReconciliation, text),
+                             self.reconcile(Reconciliation, text))
+
+    def test_fixture(self):
+        reconcile = ColumnarReconciliation(input_path=self.TEST_PATH)
+        reconcile()
+        self.assertEqual(['Cash -900.00', 'TEST 150'],
+                         reconcile.invalid_positions)
+
+    def test_overflow_falls_back_to_decimal(self):
+        text = 'D0-POS\nD1-TRN\nX BUY {0} 0\nX BUY {0} 0\nD1-POS\n' \
+            .format(9 * 10 ** 17)
+        self.assertEqual(self.reconcile(ColumnarReconciliation, text),
+                         ['X -1800000000000000000'])
+
+
+class ParallelReconciliationTestCase(FixtureIOTestCase):
+
+    def test_apply_trades(self):
+        shares, cash = apply_trades(['A BUY 10 100', 'A SELL 4 50.5',
+                                     'B DIVIDEND 0 1'])
+        self.assertEqual(shares, {'A': Decimal('6')})
+        self.assertEqual(cash, Decimal('-48.5'))
+
+    def test_merge_replaces_cash_item(self):
+        portfolio = Portfolio(positions=['A 1', 'Cash 5'])
+        ParallelReconciliation.merge(portfolio, ({'A': Decimal(2)},
+                                                 Decimal('1.5')))
+        ParallelReconciliation.merge(portfolio, ({'Cash': Decimal(3)}, 0))
+        ParallelReconciliation.merge(portfolio, ({'Cash': Decimal(-1)}, 0))
+        self.assertEqual(portfolio['A'].shares, 3)
+        self.assertEqual(portfolio['Cash'].shares, -1)
+        self.assertEqual(portfolio.cash, Decimal('6.5'))
+
+    def test_matches_serial(self):
+        """chunks smaller than the input are merged back in order"""
+        lines = ['D0-POS', 'A 10', 'Cash 100', 'D1-TRN']
+        lines += ['{} {} {} {}'.format(symbol, code, index, index / 4.0)
+                  for index in range(60)
+                  for symbol, code in (('A', 'BUY'), ('B', 'SELL'),
+                                       ('Cash', 'BUY'), ('C', 'FEE'))]
+        lines += ['D1-POS', 'A 20', 'B -3', 'Cash 7']
+        with open(self.TEST_PATH, 'w') as test_file:
+            test_file.write('\n'.join(lines))
+
+        serial = Reconciliation(input_path=self.TEST_PATH)
+        serial()
+        with ProcessPoolExecutor(2) as executor:
+            parallel = ParallelReconciliation(
+                input_path=self.TEST_PATH, workers=2, executor=executor)
+            parallel.CHUNK = 7
+            parallel()
+        self.assertEqual(serial.invalid_positions,
+                         parallel.invalid_positions)
+
+    def test_exponent_matches_serial(self):
+        """a new position opens at 0 on merge, not in every worker"""
+        with open(self.TEST_PATH, 'w') as test_file:
+            test_file.write('D0-POS\nA 1E+2\nD1-TRN\nA BUY 1E+2 5\n'
+                            'B SELL 2E+1 5\nD1-POS\nA 3E+2\n')
+        serial = Reconciliation(input_path=self.TEST_PATH)
+        serial()
+        parallel = ParallelReconciliation(input_path=self.TEST_PATH,
+                                          workers=1)
+        parallel()
+        self.assertEqual(['A 1E+2', 'B 20'], serial.invalid_positions)
+        self.assertEqual(serial.invalid_positions, parallel.invalid_positions)
+
+    def test_fixture(self):
+        reconcile = ParallelReconciliation(input_path=self.TEST_PATH,
+                                           workers=1)
+        reconcile()
+        self.assertEqual(['Cash -900.00', 'TEST 150'],
+                         reconcile.invalid_positions)
+
+
+class BatchReconciliationTestCase(TestCase):
+    ACCOUNTS = {
+        'a1.in': 'D0-POS\nTEST 100\nD1-TRN\nTEST SELL 50 1000\n'
+                 'D1-POS\nTEST 50\nCash 900\n',
+        'a2.in': 'D0-POS\nTEST 100\nD1-TRN\nD1-POS\nTEST 100\n',
+        'a3.in': 'D1-TRN\nTEST SELL 50 1000\n',
+        'a4.in': 'D0-POS\nD1-TRN\nTEST SELL 50\nD1-POS\n',
+        'notes.txt': 'not an account',
+    }
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        for name, text in self.ACCOUNTS.items():
+            with open(os.path.join(self.directory, name), 'w') as account:
+                account.write(text)
+        self.output_path = os.path.join(self.directory, 'batch.out')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_input_paths(self):
+        paths = BatchReconciliation.input_paths([
+            self.directory, os.path.join(self.directory, 'a[12].in')])
+        self.assertEqual([BatchReconciliation.account(path)
+                          for path in paths], ['a1', 'a2', 'a3', 'a4'])
+
+    def test_reconcile_account_error(self):
+        path, failures, error = reconcile_account(
+            os.path.join(self.directory, 'missing.in'))
+        self.assertEqual(failures, [])
+        self.assertTrue(error.startswith('FileNotFoundError'))
+
+    def test_batch(self):
+        """failures are combined, bad files are skipped and summarized"""
+        batch = BatchReconciliation([self.directory], self.output_path,
+                                    workers=2)
+        summary = io.StringIO()
+        batch(summary)
+        with open(self.output_path) as output:
+            self.assertEqual(output.read(), 'a1 Cash -100\n')
+        self.assertEqual(batch.failing, ['a1'])
+        self.assertEqual([account for account, _ in batch.errors],
+                         ['a3', 'a4'])
+        self.assertTrue(summary.getvalue().startswith(
+            'reconciled 4 accounts in'))
+        self.assertIn('failing: a1', summary.getvalue())
+
+
+class IncrementalReconciliationTestCase(FixtureIOTestCase):
+
+    def test_fixture(self):
+        reconcile = IncrementalReconciliation(input_path=self.TEST_PATH)
+        reconcile()
+        self.assertEqual(['Cash -900.00', 'TEST 150'],
+                         reconcile.invalid_positions)
+
+    def test_matches_full_reconciliation(self):
+        for path in (self.TEST_PATH, 'recon.in'):
+            full = Reconciliation(input_path=path)
+            full()
+            incremental = IncrementalReconciliation(input_path=path)
+            incremental()
+            self.assertEqual(full.invalid_positions,
+                             incremental.invalid_positions)
+
+    def test_updates(self):
+        """only symbols changed since the last check are re-diffed"""
+        reconcile = IncrementalReconciliation()
+        for position in ('A 10', 'B 5', 'Cash 100'):
+            reconcile.open_position(position)
+        for position in ('A 10', 'B 5', 'Cash 100'):
+            reconcile.report_position(position)
+        reconcile.process_invalid_positions()
+        self.assertEqual(reconcile.invalid_positions, [])
+
+        reconcile.trade('A', 'BUY', '2', '20')
+        reconcile.trade('C', 'DIVIDEND', '0', '1')
+        self.assertEqual(reconcile.dirty, {'A'})
+        reconcile.process_invalid_positions()
+        self.assertEqual(reconcile.invalid_positions, ['Cash 19', 'A -2'])
+        self.assertEqual(reconcile.dirty, set())
+
+        reconcile.report_position('A 12')
+        reconcile.report_position('Cash -19')
+        reconcile.process_invalid_positions()
+        self.assertEqual(reconcile.invalid_positions, [])
+
+
+class CheckpointTestCase(TestCase):
+    PATH = 'test.checkpoint'
+
+    def tearDown(self):
+        if os.path.isfile(self.PATH):
+            os.remove(self.PATH)
+
+    def test_round_trip(self):
+        """values come back digit for digit, 'Cash' items included"""
+        portfolio = Portfolio(positions=['A 1.50', 'B -2', 'C 1E+2',
+                                         'Cash 10.000'])
+        portfolio.trade('Cash', Transaction.BUY, '3', '0')
+        Checkpoint.dump(portfolio, 4, self.PATH)
+        day, restored = Checkpoint.load(self.PATH)
+        self.assertEqual(day, 4)
+        self.assertEqual(str(restored.cash), 'Cash 10.000')
+        self.assertEqual([str(item) for item in restored],
+                         ['A 1.50', 'B -2', 'C 1E+2', 'Cash 3'])
+
+    def test_load_invalid(self):
+        with open(self.PATH, 'w') as checkpoint:
+            checkpoint.write('D0-POS\nA 1\n')
+        with self.assertRaises(ValueError):
+            Checkpoint.load(self.PATH)
+
+
+class MultiDayReconciliationTestCase(FixtureIOTestCase):
+    MONTH = '\n'.join((
+        'D0-POS', 'AAPL 10', 'Cash 1000',
+        'D1-TRN', 'AAPL SELL 5 500', 'GOOG BUY 2 200.50',
+        'D1-POS', 'AAPL 5', 'GOOG 2', 'Cash 1299.50',
+        'D2-TRN', 'AAPL SELL 5 600',
+        'D2-POS', 'GOOG 2', 'Cash 1800',
+        'D3-TRN', 'GOOG SELL 2 300',
+        'D3-POS', 'Cash 2199.50'))
+    CHECKPOINT_PATH = 'test_D{}.checkpoint'
+
+    def setUp(self):
+        with open(self.TEST_PATH, 'w') as test_file:
+            test_file.write(self.MONTH)
+
+    def tearDown(self):
+        super(MultiDayReconciliationTestCase, self).tearDown()
+        for day in range(4):
+            if os.path.isfile(self.CHECKPOINT_PATH.format(day)):
+                os.remove(self.CHECKPOINT_PATH.format(day))
+
+    def test_days(self):
+        reconcile = MultiDayReconciliation(input_path=self.TEST_PATH)
+        reconcile()
+        self.assertEqual(reconcile.days, {1: [], 2: ['Cash -99.50'], 3: []})
+        self.assertEqual(reconcile.invalid_positions, ['D2 Cash -99.50'])
+
+    def test_single_day_matches_reconciliation(self):
+        with open(self.TEST_PATH, 'w') as test_file:
+            test_file.write(self.TEST_INPUT)
+        reconcile = MultiDayReconciliation(input_path=self.TEST_PATH)
+        reconcile()
+        self.assertEqual(reconcile.days, {1: ['Cash -900.00', 'TEST 150']})
+
+    def test_resume_from_checkpoint(self):
+        """re-running a day from the previous day's checkpoint"""
+        MultiDayReconciliation(input_path=self.TEST_PATH,
+                               checkpoint_path=self.CHECKPOINT_PATH)()
+        day, portfolio = Checkpoint.load(self.CHECKPOINT_PATH.format(1))
+        self.assertEqual(day, 1)
+        self.assertEqual(str(portfolio.cash), 'Cash 1299.50')
+
+        reconcile = MultiDayReconciliation(
+            input_path=self.TEST_PATH, start=self.CHECKPOINT_PATH.format(1),
+            until=2)
+        reconcile()
+        self.assertEqual(reconcile.days, {2: ['Cash -99.50']})
+
+        with open(self.TEST_PATH, 'w') as test_file:
+            test_file.write('D3-TRN\nGOOG SELL 2 300\nD3-POS\nCash 2199.50')
+        reconcile = MultiDayReconciliation(
+            input_path=self.TEST_PATH, start=self.CHECKPOINT_PATH.format(2))
+        reconcile()
+        self.assertEqual(reconcile.days, {3: []})
+
+
+class TradeBenchmarkTestCase(TestCase):
+
+    def test_report(self):
+        benchmark = TradeBenchmark(num_trades=100)
+        benchmark.REPEAT = 1
+        report = benchmark.report()
+        self.assertIn('legacy', report)
+        self.assertIn('speedup', report)